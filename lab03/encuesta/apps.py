@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class EncuestaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'encuesta'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,219 @@
+"""
+Caché de lectura para las encuestas.
+
+Guarda la lista de últimas preguntas, cada pregunta con sus opciones y el
+fragmento HTML de resultados. Las claves llevan un número de versión: al
+votar o al editar una Pregunta/Opcion se cambia la versión y las entradas
+anteriores dejan de usarse (expiran solas). El backend es el alias
+ENCUESTA_CACHE de CACHES (memoria local por defecto).
+
+Con memoria local las versiones son de cada proceso: un voto atendido por un
+worker no invalida lo que tienen los demás, que siguen mostrando resultados
+viejos hasta ENCUESTA_CACHE_TIMEOUT, y procesar_votos no invalida a ninguno.
+Solo sirve con un proceso; por eso el perfil produccion exige una caché
+compartida (LAB03_CACHE_URL) o declarar LAB03_UN_PROCESO. Con el buffer de
+votos activo los resultados no se guardan: incluyen los votos pendientes de
+este proceso, que una caché compartida mostraría a todos.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+
+from .models import Pregunta
+
+_contadores = Counter()
+_contadores_lock = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'ENCUESTA_CACHE', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'ENCUESTA_CACHE_TIMEOUT', 300)
+
+
+def _registrar(nombre, acierto):
+    with _contadores_lock:
+        _contadores[(nombre, acierto)] += 1
+
+
+def estadisticas():
+    """Aciertos y fallos de caché por tipo de entrada, en este proceso"""
+    with _contadores_lock:
+        datos = dict(_contadores)
+    resultado = {}
+    for nombre in sorted({nombre for nombre, _ in datos}):
+        aciertos = datos.get((nombre, True), 0)
+        fallos = datos.get((nombre, False), 0)
+        resultado[nombre] = {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa_aciertos': round(aciertos / (aciertos + fallos), 4) if aciertos + fallos else None,
+        }
+    return resultado
+
+
+def reiniciar_estadisticas():
+    with _contadores_lock:
+        _contadores.clear()
+
+
+def _version(clave):
+    """
+    Versión actual de un grupo de claves. Se inicializa con la hora en
+    nanosegundos para que, si la versión es desalojada, la nueva nunca
+    coincida con entradas antiguas.
+    """
+    cache = _cache()
+    version = cache.get(clave)
+    if version is None:
+        version = time.time_ns()
+        cache.add(clave, version, None)
+        version = cache.get(clave, version)
+    return version
+
+
+async def _aversion(clave):
+    """_version para vistas asíncronas, con los métodos a* del backend"""
+    cache = _cache()
+    version = await cache.aget(clave)
+    if version is None:
+        version = time.time_ns()
+        await cache.aadd(clave, version, None)
+        version = await cache.aget(clave, version)
+    return version
+
+
+def _cambiar_version(clave):
+    _cache().set(clave, time.time_ns(), None)
+
+
+async def _acambiar_version(clave):
+    await _cache().aset(clave, time.time_ns(), None)
+
+
+def _obtener(nombre, clave, calcular):
+    cache = _cache()
+    valor = cache.get(clave)
+    if valor is not None:
+        _registrar(nombre, True)
+        return valor
+    _registrar(nombre, False)
+    valor = calcular()
+    cache.set(clave, valor, _timeout())
+    return valor
+
+
+async def _aobtener(nombre, clave, acalcular):
+    """Versión para vistas asíncronas: ``acalcular`` es una corrutina"""
+    cache = _cache()
+    valor = await cache.aget(clave)
+    if valor is not None:
+        _registrar(nombre, True)
+        return valor
+    _registrar(nombre, False)
+    valor = await acalcular()
+    await cache.aset(clave, valor, _timeout())
+    return valor
+
+
+def invalidar_lista():
+    _cambiar_version('encuesta:version:lista')
+
+
+def invalidar_resultados(pregunta_id):
+    """Se llama al registrar votos: solo cambian los conteos"""
+    _cambiar_version(f'encuesta:version:resultados:{pregunta_id}')
+
+
+async def ainvalidar_resultados(pregunta_id):
+    await _acambiar_version(f'encuesta:version:resultados:{pregunta_id}')
+
+
+def invalidar_pregunta(pregunta_id):
+    """Se llama al editar la pregunta o sus opciones"""
+    _cambiar_version(f'encuesta:version:pregunta:{pregunta_id}')
+    invalidar_resultados(pregunta_id)
+
+
+def ultimas_preguntas(cantidad=5):
+    """Las preguntas más recientes (la vista index)"""
+    version = _version('encuesta:version:lista')
+    return _obtener(
+        'ultimas_preguntas',
+        f'encuesta:lista:{cantidad}:v{version}',
+        lambda: list(Pregunta.objects.order_by('-pub_date')[:cantidad]),
+    )
+
+
+def pregunta_con_opciones(pregunta_id):
+    """
+    Tupla (pregunta, opciones). Lanza Pregunta.DoesNotExist igual que
+    Pregunta.objects.get; las preguntas inexistentes no se guardan.
+    """
+    version = _version(f'encuesta:version:pregunta:{pregunta_id}')
+
+    def calcular():
+        pregunta = Pregunta.objects.get(pk=pregunta_id)
+        return pregunta, list(pregunta.opcion_set.all())
+
+    return _obtener('pregunta', f'encuesta:pregunta:{pregunta_id}:v{version}', calcular)
+
+
+def _resultados_cacheables():
+    # La cola tiene prioridad sobre el buffer: con ella los conteos están en la base
+    return getattr(settings, 'ENCUESTA_VOTOS_COLA', False) or not getattr(settings, 'ENCUESTA_VOTOS_BUFFER', False)
+
+
+def _renderizar_resultados(opciones):
+    return render_to_string('encuesta/_opciones_resultados.html', {'opciones': opciones})
+
+
+def fragmento_resultados(pregunta_id, opciones):
+    """
+    HTML de la lista de resultados. ``opciones`` es una función que devuelve
+    las opciones con sus votos; solo se llama cuando el fragmento no está.
+    """
+    if not _resultados_cacheables():
+        return _renderizar_resultados(opciones())
+    version = _version(f'encuesta:version:resultados:{pregunta_id}')
+    return _obtener(
+        'resultados',
+        f'encuesta:resultados:{pregunta_id}:v{version}',
+        lambda: _renderizar_resultados(opciones()),
+    )
+
+
+async def aultimas_preguntas(cantidad=5):
+    version = await _aversion('encuesta:version:lista')
+
+    async def calcular():
+        return [pregunta async for pregunta in Pregunta.objects.order_by('-pub_date')[:cantidad]]
+
+    return await _aobtener('ultimas_preguntas', f'encuesta:lista:{cantidad}:v{version}', calcular)
+
+
+async def apregunta_con_opciones(pregunta_id):
+    version = await _aversion(f'encuesta:version:pregunta:{pregunta_id}')
+
+    async def calcular():
+        pregunta = await Pregunta.objects.aget(pk=pregunta_id)
+        return pregunta, [opcion async for opcion in pregunta.opcion_set.all()]
+
+    return await _aobtener('pregunta', f'encuesta:pregunta:{pregunta_id}:v{version}', calcular)
+
+
+async def afragmento_resultados(pregunta_id, aopciones):
+    if not _resultados_cacheables():
+        return _renderizar_resultados(await aopciones())
+    version = await _aversion(f'encuesta:version:resultados:{pregunta_id}')
+
+    async def calcular():
+        return _renderizar_resultados(await aopciones())
+
+    return await _aobtener('resultados', f'encuesta:resultados:{pregunta_id}:v{version}', calcular)
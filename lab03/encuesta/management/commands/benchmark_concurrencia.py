@@ -0,0 +1,109 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from encuesta.models import Pregunta, Opcion
+
+
+class Command(BaseCommand):
+    help = (
+        'Comparar escrituras concurrentes en SQLite con la configuración por defecto '
+        'y con la del perfil de producción (WAL, BEGIN IMMEDIATE, busy timeout)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, default=8, help='Hilos que votan')
+        parser.add_argument('--lectores', type=int, default=4, help='Hilos que leen resultados')
+        parser.add_argument('--operaciones', type=int, default=200, help='Operaciones por hilo')
+
+    def handle(self, *args, **options):
+        perfiles = {
+            'defecto': {},
+            'produccion': settings.SQLITE_OPCIONES_PRODUCCION,
+        }
+        directorio = tempfile.mkdtemp(prefix='lab03-concurrencia-')
+        try:
+            for nombre, opciones in perfiles.items():
+                alias = f'benchmark_{nombre}'
+                self.registrar_base(alias, os.path.join(directorio, f'{nombre}.sqlite3'), opciones)
+                try:
+                    self.medir(nombre, alias, options)
+                finally:
+                    connections[alias].close()
+                    del connections.settings[alias]
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+    def registrar_base(self, alias, ruta, opciones):
+        """Agrega un alias de base de datos temporal con las tablas de encuesta"""
+        configuracion = connections.configure_settings({
+            DEFAULT_DB_ALIAS: {},
+            alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ruta, 'OPTIONS': dict(opciones)},
+        })
+        connections.settings[alias] = configuracion[alias]
+        with connections[alias].schema_editor() as editor:
+            editor.create_model(Pregunta)
+            editor.create_model(Opcion)
+
+    def medir(self, nombre, alias, options):
+        pregunta = Pregunta.objects.using(alias).create(pregunta_texto='Concurrencia', pub_date=timezone.now())
+        ids = [
+            Opcion.objects.using(alias).create(pregunta=pregunta, opcion_texto=f'Opción {i}').pk
+            for i in range(4)
+        ]
+
+        def escribir(_):
+            # Lectura seguida de escritura en la misma transacción, como votar
+            latencias, errores = [], 0
+            for _ in range(options['operaciones']):
+                inicio = time.perf_counter()
+                try:
+                    with transaction.atomic(using=alias):
+                        list(Opcion.objects.using(alias).filter(pregunta=pregunta))
+                        Opcion.objects.using(alias).filter(pk=random.choice(ids)).update(votos=F('votos') + 1)
+                    latencias.append(time.perf_counter() - inicio)
+                except Exception:
+                    errores += 1
+            connections[alias].close()
+            return latencias, errores
+
+        def leer(_):
+            latencias, errores = [], 0
+            for _ in range(options['operaciones']):
+                inicio = time.perf_counter()
+                try:
+                    sum(Opcion.objects.using(alias).filter(pregunta=pregunta).values_list('votos', flat=True))
+                    latencias.append(time.perf_counter() - inicio)
+                except Exception:
+                    errores += 1
+            connections[alias].close()
+            return latencias, errores
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['escritores'] + options['lectores']) as executor:
+            escrituras = [executor.submit(escribir, i) for i in range(options['escritores'])]
+            lecturas = [executor.submit(leer, i) for i in range(options['lectores'])]
+            escrituras = [futuro.result() for futuro in escrituras]
+            lecturas = [futuro.result() for futuro in lecturas]
+        duracion = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Perfil {nombre}'))
+        for tipo, resultados in (('escrituras', escrituras), ('lecturas', lecturas)):
+            latencias = [latencia for parcial, _ in resultados for latencia in parcial]
+            errores = sum(errores for _, errores in resultados)
+            p95 = statistics.quantiles(latencias, n=20)[-1] * 1000 if len(latencias) > 1 else 0
+            self.stdout.write(
+                f'  {tipo:11} {len(latencias):6} ok, {errores:5} errores, '
+                f'{len(latencias) / duracion:8,.0f} op/s, p95 {p95:7.2f} ms'
+            )
+        votos = sum(Opcion.objects.using(alias).values_list('votos', flat=True))
+        self.stdout.write(f'  votos guardados: {votos} en {duracion:.2f}s')
@@ -0,0 +1,111 @@
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+import asyncio
+import random
+import statistics
+import time
+
+from encuesta.models import Pregunta, Opcion
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de las vistas de encuesta: compara las vistas síncronas (WSGI) '
+        'con las asíncronas (ASGI) en throughput y latencia'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=1000, help='Peticiones por cada modo')
+        parser.add_argument('--concurrencia', type=int, default=32, help='Peticiones simultáneas')
+        parser.add_argument(
+            '--url-wsgi',
+            help='URL base de un servidor WSGI real (p. ej. http://127.0.0.1:8000); sin ella se usa el handler en proceso',
+        )
+        parser.add_argument('--url-asgi', help='URL base de un servidor ASGI real (p. ej. http://127.0.0.1:8001)')
+
+    def handle(self, *args, **options):
+        pregunta = Pregunta.objects.create(pregunta_texto='Prueba de carga ASGI', pub_date=timezone.now())
+        opciones = [
+            Opcion.objects.create(pregunta=pregunta, opcion_texto=f'Opción {i + 1}').pk
+            for i in range(3)
+        ]
+        try:
+            for modo in ('wsgi', 'asgi'):
+                base = options[f'url_{modo}']
+                peticiones = self.peticiones(modo, pregunta.pk, opciones, options['peticiones'], http=bool(base))
+                inicio = time.perf_counter()
+                if base:
+                    latencias = self.cargar_http(base, peticiones, options['concurrencia'])
+                else:
+                    # Los clientes en proceso envían Host: testserver
+                    with override_settings(ALLOWED_HOSTS=['testserver']):
+                        if modo == 'wsgi':
+                            latencias = self.cargar_wsgi(peticiones, options['concurrencia'])
+                        else:
+                            latencias = asyncio.run(self.cargar_asgi(peticiones, options['concurrencia']))
+                self.reportar(modo, latencias, time.perf_counter() - inicio)
+        finally:
+            pregunta.delete()
+
+    def peticiones(self, modo, pregunta_id, opciones, cantidad, http=False):
+        """Mezcla de lecturas y votos (los votos necesitan CSRF, así que en HTTP solo hay lecturas)"""
+        prefijo = 'a' if modo == 'asgi' else ''
+        rutas = [
+            ('get', reverse(f'encuesta:{prefijo}index'), None),
+            ('get', reverse(f'encuesta:{prefijo}detalle', args=(pregunta_id,)), None),
+            ('get', reverse(f'encuesta:{prefijo}resultados', args=(pregunta_id,)), None),
+        ]
+        votar = reverse(f'encuesta:{prefijo}votar', args=(pregunta_id,))
+        resultado = []
+        for _ in range(cantidad):
+            if not http and random.random() < 0.25:
+                resultado.append(('post', votar, {'opcion': random.choice(opciones)}))
+            else:
+                resultado.append(random.choice(rutas))
+        return resultado
+
+    def cargar_wsgi(self, peticiones, concurrencia):
+        def ejecutar(peticion):
+            metodo, ruta, datos = peticion
+            inicio = time.perf_counter()
+            getattr(Client(), metodo)(ruta, datos)
+            return time.perf_counter() - inicio
+
+        with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+            return list(executor.map(ejecutar, peticiones))
+
+    async def cargar_asgi(self, peticiones, concurrencia):
+        cliente = AsyncClient()
+        semaforo = asyncio.Semaphore(concurrencia)
+
+        async def ejecutar(peticion):
+            metodo, ruta, datos = peticion
+            async with semaforo:
+                inicio = time.perf_counter()
+                await getattr(cliente, metodo)(ruta, datos)
+                return time.perf_counter() - inicio
+
+        return await asyncio.gather(*[ejecutar(peticion) for peticion in peticiones])
+
+    def cargar_http(self, base, peticiones, concurrencia):
+        def ejecutar(peticion):
+            _, ruta, _ = peticion
+            inicio = time.perf_counter()
+            with urlopen(base.rstrip('/') + ruta) as respuesta:
+                respuesta.read()
+            return time.perf_counter() - inicio
+
+        with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+            return list(executor.map(ejecutar, peticiones))
+
+    def reportar(self, modo, latencias, duracion):
+        percentiles = statistics.quantiles(latencias, n=100)
+        self.stdout.write(
+            f'{modo.upper():5} {len(latencias)} peticiones en {duracion:.2f}s '
+            f'({len(latencias) / duracion:,.0f} req/s)  '
+            f'p50 {percentiles[49] * 1000:.1f} ms  p95 {percentiles[94] * 1000:.1f} ms  '
+            f'p99 {percentiles[98] * 1000:.1f} ms'
+        )
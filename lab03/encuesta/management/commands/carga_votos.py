@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor
+import random
+import time
+
+from encuesta.models import Pregunta, Opcion, VotoPendiente
+from encuesta.votos import BufferVotos, procesar_cola, registrar_voto_atomico
+
+
+class Command(BaseCommand):
+    help = 'Prueba de carga de votos concurrentes: compara el conteo original, el atómico, el buffer y la cola'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Cantidad de hilos votando a la vez')
+        parser.add_argument('--votos', type=int, default=500, help='Votos emitidos por cada hilo')
+        parser.add_argument(
+            '--modos',
+            nargs='+',
+            choices=['legado', 'atomico', 'buffer', 'cola'],
+            default=['legado', 'atomico', 'buffer', 'cola'],
+            help='Modos de conteo a medir',
+        )
+
+    def handle(self, *args, **options):
+        hilos = options['hilos']
+        votos = options['votos']
+
+        for modo in options['modos']:
+            pregunta = Pregunta.objects.create(
+                pregunta_texto=f'Prueba de carga ({modo})',
+                pub_date=timezone.now(),
+            )
+            opciones = [
+                Opcion.objects.create(pregunta=pregunta, opcion_texto=f'Opción {i + 1}')
+                for i in range(3)
+            ]
+            try:
+                self.medir(modo, pregunta, opciones, hilos, votos)
+            finally:
+                pregunta.delete()
+
+    def medir(self, modo, pregunta, opciones, hilos, votos):
+        """Lanza los hilos de votación y compara lo esperado con lo guardado"""
+        buffer = BufferVotos(intervalo=0) if modo == 'buffer' else None
+        ids = [opcion.pk for opcion in opciones]
+
+        def votar(_):
+            errores = 0
+            for _ in range(votos):
+                opcion_id = random.choice(ids)
+                try:
+                    if modo == 'legado':
+                        # Lectura-modificación-escritura como la vista original
+                        opcion = pregunta.opcion_set.get(pk=opcion_id)
+                        opcion.votos += 1
+                        opcion.save()
+                    elif modo == 'atomico':
+                        registrar_voto_atomico(pregunta.pk, opcion_id)
+                    elif modo == 'cola':
+                        VotoPendiente.objects.create(opcion_id=opcion_id)
+                    else:
+                        buffer.agregar(opcion_id)
+                except Exception:
+                    errores += 1
+            connection.close()
+            return errores
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as executor:
+            errores = sum(executor.map(votar, range(hilos)))
+        if buffer is not None:
+            buffer.vaciar()
+        duracion = time.perf_counter() - inicio
+        if modo == 'cola':
+            # Los votos ya son durables; el proceso de la cola se mide aparte
+            inicio = time.perf_counter()
+            while procesar_cola():
+                pass
+            self.stdout.write(f'cola     procesada en {time.perf_counter() - inicio:.2f}s')
+
+        emitidos = hilos * votos - errores
+        guardados = sum(Opcion.objects.filter(pk__in=ids).values_list('votos', flat=True))
+        perdidos = emitidos - guardados
+        estilo = self.style.SUCCESS if perdidos == 0 else self.style.ERROR
+        self.stdout.write(estilo(
+            f'{modo:8} {emitidos} votos en {duracion:.2f}s '
+            f'({emitidos / duracion:,.0f} votos/s), errores: {errores}, perdidos: {perdidos}'
+        ))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+import time
+
+from encuesta.models import VotoPendiente
+from encuesta.votos import procesar_cola
+
+
+class Command(BaseCommand):
+    help = 'Sumar a Opcion.votos los votos de la cola (modo ENCUESTA_VOTOS_COLA) por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=1000, help='Votos procesados por transacción')
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help='Seguir revisando la cola cada --intervalo segundos hasta interrumpir con Ctrl+C',
+        )
+        parser.add_argument('--intervalo', type=float, default=1.0, help='Espera entre revisiones con --continuo')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                inicio = time.perf_counter()
+                total = self.vaciar(options['lote'])
+                if total:
+                    self.stdout.write(
+                        f'{total:,} votos procesados en {time.perf_counter() - inicio:.2f}s '
+                        f'({VotoPendiente.objects.count():,} en cola)'
+                    )
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            self.stdout.write('Interrumpido; los votos no procesados siguen en la cola')
+
+    def vaciar(self, lote):
+        total = 0
+        while True:
+            procesados = procesar_cola(lote)
+            total += procesados
+            if procesados < lote:
+                return total
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encuesta', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VotoPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('opcion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='encuesta.opcion')),
+            ],
+        ),
+    ]
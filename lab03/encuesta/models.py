@@ -19,4 +19,15 @@ class Opcion(models.Model):
     votos = models.IntegerField(default=0)
     
     def __str__(self):
-        return self.opcion_texto
\ No newline at end of file
+        return self.opcion_texto
+
+class VotoPendiente(models.Model):
+    """
+    Voto en cola (modo ENCUESTA_VOTOS_COLA): se inserta al votar y el comando
+    procesar_votos lo suma a Opcion.votos y lo borra en la misma transacción.
+    """
+    opcion = models.ForeignKey(Opcion, on_delete=models.CASCADE)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Voto pendiente para {self.opcion_id}'
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import cache
+from .models import Opcion, Pregunta
+
+
+@receiver([post_save, post_delete], sender=Pregunta)
+def invalidar_pregunta(sender, instance, **kwargs):
+    """Una pregunta editada o borrada cambia la lista y su propia entrada"""
+    cache.invalidar_lista()
+    cache.invalidar_pregunta(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Opcion)
+def invalidar_opcion(sender, instance, **kwargs):
+    cache.invalidar_pregunta(instance.pregunta_id)
@@ -1,3 +1,191 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
 
-# Create your tests here.
+from .models import Pregunta, Opcion, VotoPendiente
+from . import cache, votos
+from .votos import BufferVotos, registrar_voto_atomico
+
+
+class EncuestaTestCase(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        cache.reiniciar_estadisticas()
+        self.pregunta = Pregunta.objects.create(pregunta_texto='¿Lenguaje favorito?', pub_date=timezone.now())
+        self.python = Opcion.objects.create(pregunta=self.pregunta, opcion_texto='Python')
+        self.rust = Opcion.objects.create(pregunta=self.pregunta, opcion_texto='Rust')
+
+
+class ConteoVotosTests(EncuestaTestCase):
+    def test_voto_atomico(self):
+        registrar_voto_atomico(self.pregunta.pk, self.python.pk)
+        registrar_voto_atomico(self.pregunta.pk, self.python.pk)
+        self.python.refresh_from_db()
+        self.assertEqual(self.python.votos, 2)
+
+    def test_voto_atomico_opcion_de_otra_pregunta(self):
+        otra = Pregunta.objects.create(pregunta_texto='Otra', pub_date=timezone.now())
+        with self.assertRaises(Opcion.DoesNotExist):
+            registrar_voto_atomico(otra.pk, self.python.pk)
+
+    def test_buffer_concurrente_no_pierde_votos(self):
+        buffer = BufferVotos(max_pendientes=100, intervalo=0)
+        ids = [self.python.pk, self.rust.pk]
+
+        def votar(hilo):
+            for i in range(250):
+                buffer.agregar(ids[(hilo + i) % 2])
+
+        # Los hilos solo acumulan en memoria; la escritura ocurre al vaciar
+        buffer.max_pendientes = 10 ** 9
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(votar, range(8)))
+        self.assertEqual(sum(buffer.pendientes().values()), 2000)
+        self.assertEqual(buffer.vaciar(), 2000)
+
+        self.python.refresh_from_db()
+        self.rust.refresh_from_db()
+        self.assertEqual(self.python.votos + self.rust.votos, 2000)
+        self.assertEqual(buffer.pendientes(), {})
+
+    def test_buffer_vacia_al_llenarse(self):
+        buffer = BufferVotos(max_pendientes=3, intervalo=0)
+        for _ in range(3):
+            buffer.agregar(self.rust.pk)
+        self.rust.refresh_from_db()
+        self.assertEqual(self.rust.votos, 3)
+
+
+class VotarViewTests(EncuestaTestCase):
+    def test_votar_muestra_resultados(self):
+        url = reverse('encuesta:votar', args=(self.pregunta.pk,))
+        response = self.client.post(url, {'opcion': self.python.pk})
+        self.assertContains(response, 'Python -- 1 voto')
+        self.python.refresh_from_db()
+        self.assertEqual(self.python.votos, 1)
+
+    @override_settings(ENCUESTA_VOTOS_BUFFER=True)
+    def test_votar_con_buffer_incluye_pendientes(self):
+        votos._buffer = BufferVotos(max_pendientes=100, intervalo=0)
+        self.addCleanup(setattr, votos, '_buffer', None)
+        url = reverse('encuesta:votar', args=(self.pregunta.pk,))
+        self.client.post(url, {'opcion': self.rust.pk})
+        response = self.client.post(url, {'opcion': self.rust.pk})
+        self.assertContains(response, 'Rust -- 2 votos')
+        self.rust.refresh_from_db()
+        self.assertEqual(self.rust.votos, 0)
+        # Los pendientes son de este proceso: el fragmento no se guarda en la caché
+        self.assertNotIn('resultados', cache.estadisticas())
+
+
+@override_settings(ENCUESTA_VOTOS_COLA=True)
+class ColaVotosTests(EncuestaTestCase):
+    def test_votar_encola_y_muestra_pendientes(self):
+        url = reverse('encuesta:votar', args=(self.pregunta.pk,))
+        self.client.post(url, {'opcion': self.rust.pk})
+        response = self.client.post(url, {'opcion': self.rust.pk})
+        self.assertContains(response, 'Rust -- 2 votos')
+        self.rust.refresh_from_db()
+        self.assertEqual(self.rust.votos, 0)
+        self.assertEqual(VotoPendiente.objects.count(), 2)
+
+    def test_opcion_de_otra_pregunta(self):
+        otra = Pregunta.objects.create(pregunta_texto='Otra', pub_date=timezone.now())
+        ajena = Opcion.objects.create(pregunta=otra, opcion_texto='Ajena')
+        with self.assertRaises(Opcion.DoesNotExist):
+            votos.registrar_voto(self.pregunta, ajena.pk)
+        self.assertFalse(VotoPendiente.objects.exists())
+
+    def test_procesar_por_lotes(self):
+        for opcion in [self.python] * 5 + [self.rust] * 2:
+            votos.registrar_voto(self.pregunta, opcion.pk)
+        self.assertEqual(votos.procesar_cola(lote=4), 4)
+        self.python.refresh_from_db()
+        self.assertEqual(self.python.votos, 4)
+        # Los conteos mostrados no cambian a mitad del proceso
+        # Guardados y en cola en una sola consulta: una sola foto de las dos tablas
+        with self.assertNumQueries(1):
+            conteos = {opcion.pk: opcion.votos for opcion in votos.opciones_con_votos(self.pregunta)}
+        self.assertEqual(conteos, {self.python.pk: 5, self.rust.pk: 2})
+
+        salida = StringIO()
+        call_command('procesar_votos', lote=2, stdout=salida)
+        self.assertIn('3 votos procesados', salida.getvalue())
+        self.assertFalse(VotoPendiente.objects.exists())
+        self.assertEqual(
+            dict(Opcion.objects.values_list('pk', 'votos')), {self.python.pk: 5, self.rust.pk: 2}
+        )
+
+    async def test_votar_asincrono_con_cola(self):
+        url = reverse('encuesta:avotar', args=(self.pregunta.pk,))
+        response = await self.async_client.post(url, {'opcion': self.python.pk})
+        self.assertContains(response, 'Python -- 1 voto')
+        self.assertEqual(await VotoPendiente.objects.acount(), 1)
+
+
+class CacheEncuestaTests(EncuestaTestCase):
+    def test_index_cacheado(self):
+        self.client.get(reverse('encuesta:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('encuesta:index'))
+        self.assertContains(response, '¿Lenguaje favorito?')
+        self.assertEqual(cache.estadisticas()['ultimas_preguntas'], {'aciertos': 1, 'fallos': 1, 'tasa_aciertos': 0.5})
+
+    def test_editar_pregunta_invalida_lista_y_detalle(self):
+        self.client.get(reverse('encuesta:index'))
+        self.client.get(reverse('encuesta:detalle', args=(self.pregunta.pk,)))
+        self.pregunta.pregunta_texto = '¿Editor favorito?'
+        self.pregunta.save()
+        self.assertContains(self.client.get(reverse('encuesta:index')), '¿Editor favorito?')
+        self.assertContains(self.client.get(reverse('encuesta:detalle', args=(self.pregunta.pk,))), '¿Editor favorito?')
+
+    def test_nueva_opcion_invalida_detalle(self):
+        self.client.get(reverse('encuesta:detalle', args=(self.pregunta.pk,)))
+        Opcion.objects.create(pregunta=self.pregunta, opcion_texto='Go')
+        self.assertContains(self.client.get(reverse('encuesta:detalle', args=(self.pregunta.pk,))), 'Go')
+
+    def test_voto_invalida_resultados(self):
+        url = reverse('encuesta:resultados', args=(self.pregunta.pk,))
+        self.assertContains(self.client.get(url), 'Python -- 0 votos')
+        with self.assertNumQueries(0):
+            self.client.get(url)
+        self.client.post(reverse('encuesta:votar', args=(self.pregunta.pk,)), {'opcion': self.python.pk})
+        self.assertContains(self.client.get(url), 'Python -- 1 voto')
+
+    def test_estadisticas_solo_staff(self):
+        url = reverse('encuesta:estadisticas_cache')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(User.objects.create_user('staff', password='x', is_staff=True))
+        self.client.get(reverse('encuesta:index'))
+        self.assertIn('ultimas_preguntas', self.client.get(url).json())
+
+
+class VistasAsincronasTests(EncuestaTestCase):
+    async def test_index_enlaza_a_vistas_asincronas(self):
+        response = await self.async_client.get(reverse('encuesta:aindex'))
+        self.assertContains(response, reverse('encuesta:adetalle', args=(self.pregunta.pk,)))
+
+    async def test_detalle_muestra_opciones(self):
+        response = await self.async_client.get(reverse('encuesta:adetalle', args=(self.pregunta.pk,)))
+        self.assertContains(response, 'Rust')
+        self.assertContains(response, reverse('encuesta:avotar', args=(self.pregunta.pk,)))
+
+    async def test_votar_asincrono(self):
+        url = reverse('encuesta:avotar', args=(self.pregunta.pk,))
+        await self.async_client.post(url, {'opcion': self.python.pk})
+        response = await self.async_client.post(url, {'opcion': self.python.pk})
+        self.assertContains(response, 'Python -- 2 votos')
+        await self.python.arefresh_from_db()
+        self.assertEqual(self.python.votos, 2)
+
+    async def test_versiones_asincronas_compartidas_con_las_sincronas(self):
+        version = await cache._aversion('encuesta:version:prueba')
+        self.assertEqual(cache._version('encuesta:version:prueba'), version)
+        await cache.ainvalidar_resultados(self.pregunta.pk)
+        clave = f'encuesta:version:resultados:{self.pregunta.pk}'
+        self.assertEqual(cache._version(clave), await cache._aversion(clave))
@@ -7,5 +7,12 @@ app_name = 'encuesta'
 urlpatterns = [
     path('', views.index,name='index'),
     path('<int:pregunta_id>/',views.detalle,name='detalle'),
-    path('<int:pregunta_id>/votar',views.votar,name='votar')
+    path('<int:pregunta_id>/resultados/',views.resultados,name='resultados'),
+    path('<int:pregunta_id>/votar',views.votar,name='votar'),
+    path('cache/',views.estadisticas_cache,name='estadisticas_cache'),
+    # Vistas asíncronas (ASGI)
+    path('async/', views.aindex,name='aindex'),
+    path('async/<int:pregunta_id>/',views.adetalle,name='adetalle'),
+    path('async/<int:pregunta_id>/resultados/',views.aresultados,name='aresultados'),
+    path('async/<int:pregunta_id>/votar',views.avotar,name='avotar')
 ]
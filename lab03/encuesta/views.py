@@ -1,27 +1,73 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
-from .models import Opcion,Pregunta
+from . import cache
+from .votos import aopciones_con_votos, aregistrar_voto, opciones_con_votos, registrar_voto
 
 # Create your views here.
 def index(request):
-    latest_question_list = Pregunta.objects.order_by('-pub_date')[:5]
+    latest_question_list = cache.ultimas_preguntas()
     context = {
         'latest_question_list':latest_question_list
     }
     return render(request,'encuesta/index.html',context)
 
 def detalle(request,pregunta_id):
-    pregunta = Pregunta.objects.get(pk=pregunta_id)
+    pregunta, opciones = cache.pregunta_con_opciones(pregunta_id)
     context = {
-        'pregunta':pregunta
+        'pregunta':pregunta,
+        'opciones':opciones
     }
     
     return render(request,'encuesta/detalle.html',context)
+
+def resultados(request,pregunta_id):
+    pregunta, _ = cache.pregunta_con_opciones(pregunta_id)
+    context = {
+        'pregunta':pregunta,
+        'resultados':cache.fragmento_resultados(pregunta.pk, lambda: opciones_con_votos(pregunta))
+    }
+    return render(request,'encuesta/resultados.html',context)
+
 def votar(request,pregunta_id):
-    pregunta = Pregunta.objects.get(pk=pregunta_id)
-    opcionSeleccionada = pregunta.opcion_set.get(pk=request.POST['opcion'])
-    opcionSeleccionada.votos += 1
-    opcionSeleccionada.save()
+    pregunta, _ = cache.pregunta_con_opciones(pregunta_id)
+    registrar_voto(pregunta, request.POST['opcion'])
+    return resultados(request,pregunta_id)
+
+# Versiones asíncronas para servir con ASGI: usan el ORM asíncrono y no
+# ocupan un hilo por petición mientras esperan a la base de datos.
+async def aindex(request):
+    context = {
+        'latest_question_list':await cache.aultimas_preguntas(),
+        'detalle_url':'encuesta:adetalle'
+    }
+    return render(request,'encuesta/index.html',context)
+
+async def adetalle(request,pregunta_id):
+    pregunta, opciones = await cache.apregunta_con_opciones(pregunta_id)
+    context = {
+        'pregunta':pregunta,
+        'opciones':opciones,
+        'votar_url':'encuesta:avotar',
+        'index_url':'encuesta:aindex'
+    }
+    return render(request,'encuesta/detalle.html',context)
+
+async def aresultados(request,pregunta_id):
+    pregunta, _ = await cache.apregunta_con_opciones(pregunta_id)
     context = {
-        'pregunta':pregunta
+        'pregunta':pregunta,
+        'resultados':await cache.afragmento_resultados(pregunta.pk, lambda: aopciones_con_votos(pregunta)),
+        'detalle_url':'encuesta:adetalle',
+        'index_url':'encuesta:aindex'
     }
     return render(request,'encuesta/resultados.html',context)
+
+async def avotar(request,pregunta_id):
+    pregunta, _ = await cache.apregunta_con_opciones(pregunta_id)
+    await aregistrar_voto(pregunta, request.POST['opcion'])
+    return await aresultados(request,pregunta_id)
+
+@staff_member_required
+def estadisticas_cache(request):
+    return JsonResponse(cache.estadisticas())
@@ -0,0 +1,236 @@
+"""
+Conteo de votos para las encuestas.
+
+El conteo directo empuja cada incremento a la base de datos como una expresión
+atómica (``votos = votos + 1``), por lo que no se pierden votos aunque varias
+peticiones voten a la vez. El modo con buffer acumula los incrementos en
+memoria por ``Opcion`` y los escribe en lotes, de modo que miles de votos por
+segundo se traducen en unas pocas sentencias UPDATE.
+
+El modo con cola (ENCUESTA_VOTOS_COLA) es como el buffer pero durable: cada
+voto es un INSERT en VotoPendiente, sin leer ni bloquear la fila de la
+opción, y el comando procesar_votos los suma a Opcion.votos por lotes. Los
+resultados muestran los votos guardados más los que siguen en la cola, de
+cualquier proceso.
+"""
+import atexit
+import threading
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+
+from . import cache
+from .models import Opcion, VotoPendiente
+
+
+def registrar_voto_atomico(pregunta_id, opcion_id):
+    """Suma un voto con un UPDATE atómico, sin leer la fila antes"""
+    actualizadas = Opcion.objects.filter(
+        pk=opcion_id, pregunta_id=pregunta_id
+    ).update(votos=F('votos') + 1)
+    if not actualizadas:
+        raise Opcion.DoesNotExist('La opción no pertenece a la pregunta')
+
+
+def aplicar_incrementos(incrementos, tamano_lote=500):
+    """
+    Aplica un diccionario {opcion_id: cantidad} con un UPDATE por lote.
+    Cada lote usa CASE/WHEN para sumar a cada opción su propio incremento.
+    """
+    ids = list(incrementos)
+    for inicio in range(0, len(ids), tamano_lote):
+        lote = ids[inicio:inicio + tamano_lote]
+        suma = Case(
+            *[When(pk=opcion_id, then=Value(incrementos[opcion_id])) for opcion_id in lote],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        Opcion.objects.filter(pk__in=lote).update(votos=F('votos') + suma)
+    preguntas = Opcion.objects.filter(pk__in=ids).values_list('pregunta_id', flat=True).distinct()
+    for pregunta_id in preguntas:
+        cache.invalidar_resultados(pregunta_id)
+
+
+class BufferVotos:
+    """
+    Acumula votos en memoria y los escribe en lotes.
+
+    Los votos se vacían a la base de datos cuando se alcanzan ``max_pendientes``
+    votos o cuando pasan ``intervalo`` segundos desde el primer voto pendiente.
+    Si la escritura falla, los incrementos vuelven al buffer para no perderlos.
+    """
+
+    def __init__(self, max_pendientes=500, intervalo=1.0):
+        self.max_pendientes = max_pendientes
+        self.intervalo = intervalo
+        self._pendientes = Counter()
+        self._total = 0
+        self._lock = threading.Lock()
+        self._temporizador = None
+
+    def agregar(self, opcion_id, cantidad=1):
+        """Registra votos pendientes para una opción"""
+        with self._lock:
+            self._pendientes[opcion_id] += cantidad
+            self._total += cantidad
+            lleno = self._total >= self.max_pendientes
+            if not lleno and self._temporizador is None and self.intervalo:
+                self._temporizador = threading.Timer(self.intervalo, self.vaciar)
+                self._temporizador.daemon = True
+                self._temporizador.start()
+        if lleno:
+            self.vaciar()
+
+    def pendientes(self):
+        """Copia de los votos aún no escritos, por opción"""
+        with self._lock:
+            return dict(self._pendientes)
+
+    def vaciar(self):
+        """Escribe los votos pendientes en la base de datos"""
+        with self._lock:
+            incrementos = self._pendientes
+            self._pendientes = Counter()
+            self._total = 0
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+        if not incrementos:
+            return 0
+        try:
+            aplicar_incrementos(incrementos)
+        except Exception:
+            with self._lock:
+                self._pendientes.update(incrementos)
+                self._total += sum(incrementos.values())
+            raise
+        return sum(incrementos.values())
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def obtener_buffer():
+    """Buffer compartido por el proceso, configurado desde settings"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = BufferVotos(
+                max_pendientes=getattr(settings, 'ENCUESTA_VOTOS_BUFFER_MAX', 500),
+                intervalo=getattr(settings, 'ENCUESTA_VOTOS_BUFFER_INTERVALO', 1.0),
+            )
+            atexit.register(_buffer.vaciar)
+        return _buffer
+
+
+def buffer_activo():
+    return getattr(settings, 'ENCUESTA_VOTOS_BUFFER', False)
+
+
+def cola_activa():
+    return getattr(settings, 'ENCUESTA_VOTOS_COLA', False)
+
+
+def procesar_cola(lote=1000):
+    """
+    Suma a Opcion.votos hasta ``lote`` votos de la cola (los más antiguos) y
+    los borra, todo en una transacción. Devuelve cuántos votos procesó.
+    """
+    with transaction.atomic():
+        # skip_locked: varios procesadores no toman los mismos votos (en
+        # SQLite se ignora; la transacción ya es exclusiva)
+        ids = list(
+            VotoPendiente.objects.select_for_update(skip_locked=True)
+            .order_by('pk').values_list('pk', flat=True)[:lote]
+        )
+        if not ids:
+            return 0
+        incrementos = dict(
+            VotoPendiente.objects.filter(pk__in=ids).values('opcion_id')
+            .annotate(votos=Count('pk')).values_list('opcion_id', 'votos')
+        )
+        aplicar_incrementos(incrementos)
+        VotoPendiente.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def _validar_opcion(opciones, opcion_id):
+    # La opción se valida contra las opciones en caché, sin consultar la base
+    if str(opcion_id) not in {str(opcion.pk) for opcion in opciones}:
+        raise Opcion.DoesNotExist('La opción no pertenece a la pregunta')
+
+
+def registrar_voto(pregunta, opcion_id):
+    """Registra un voto usando el modo configurado e invalida los resultados en caché"""
+    if cola_activa():
+        _validar_opcion(cache.pregunta_con_opciones(pregunta.pk)[1], opcion_id)
+        VotoPendiente.objects.create(opcion_id=int(opcion_id))
+    elif buffer_activo():
+        _validar_opcion(cache.pregunta_con_opciones(pregunta.pk)[1], opcion_id)
+        obtener_buffer().agregar(int(opcion_id))
+    else:
+        registrar_voto_atomico(pregunta.pk, opcion_id)
+    cache.invalidar_resultados(pregunta.pk)
+
+
+async def aregistrar_voto(pregunta, opcion_id):
+    """Versión asíncrona de registrar_voto (UPDATE atómico con aupdate)"""
+    if cola_activa():
+        _validar_opcion((await cache.apregunta_con_opciones(pregunta.pk))[1], opcion_id)
+        await VotoPendiente.objects.acreate(opcion_id=int(opcion_id))
+        await cache.ainvalidar_resultados(pregunta.pk)
+        return
+    if buffer_activo():
+        # El buffer puede escribir un lote en la base: se ejecuta en un hilo
+        await sync_to_async(registrar_voto)(pregunta, opcion_id)
+        return
+    actualizadas = await Opcion.objects.filter(
+        pk=opcion_id, pregunta_id=pregunta.pk
+    ).aupdate(votos=F('votos') + 1)
+    if not actualizadas:
+        raise Opcion.DoesNotExist('La opción no pertenece a la pregunta')
+    await cache.ainvalidar_resultados(pregunta.pk)
+
+
+def _opciones_con_cola(pregunta):
+    # Una sola consulta: los votos guardados y los de la cola salen de la misma
+    # foto aunque procesar_cola pase votos de una tabla a la otra a la vez
+    return pregunta.opcion_set.annotate(en_cola=Count('votopendiente'))
+
+
+def _sumar_pendientes(opciones, pendientes):
+    for opcion in opciones:
+        opcion.votos += pendientes.get(opcion.pk, 0)
+    return opciones
+
+
+def _sumar_cola(opciones):
+    for opcion in opciones:
+        opcion.votos += opcion.en_cola
+    return opciones
+
+
+def opciones_con_votos(pregunta):
+    """
+    Opciones de la pregunta con el conteo que verá el usuario: los votos
+    guardados más los que siguen en la cola o en el buffer de este proceso.
+    """
+    if cola_activa():
+        return _sumar_cola(list(_opciones_con_cola(pregunta)))
+    opciones = list(pregunta.opcion_set.all())
+    if buffer_activo():
+        _sumar_pendientes(opciones, obtener_buffer().pendientes())
+    return opciones
+
+
+async def aopciones_con_votos(pregunta):
+    if cola_activa():
+        return _sumar_cola([opcion async for opcion in _opciones_con_cola(pregunta)])
+    opciones = [opcion async for opcion in pregunta.opcion_set.all()]
+    if buffer_activo():
+        _sumar_pendientes(opciones, obtener_buffer().pendientes())
+    return opciones
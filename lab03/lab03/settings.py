@@ -10,11 +10,21 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Perfil de ejecución: LAB03_PERFIL=produccion activa la configuración de
+# producción (DEBUG desactivado, base de datos afinada y caché compartida,
+# ver DATABASES y CACHES).
+PERFIL = os.environ.get('LAB03_PERFIL', 'desarrollo')
+
+PRODUCCION = PERFIL == 'produccion'
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -27,12 +37,20 @@ DEBUG = True
 
 ALLOWED_HOSTS = []
 
+if PRODUCCION:
+    SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', '')
+    if not SECRET_KEY:
+        raise ImproperlyConfigured('El perfil produccion requiere la variable DJANGO_SECRET_KEY')
+    DEBUG = False
+    ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
+
 
 # Application definition
 
 INSTALLED_APPS = [
     'encuesta',
     'ventas',
+    'rendimiento',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -42,6 +60,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para que la medición incluya a los demás middleware
+    'rendimiento.middleware.RendimientoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +101,110 @@ DATABASES = {
     }
 }
 
+# SQLite en producción: WAL permite lecturas concurrentes con un escritor,
+# BEGIN IMMEDIATE evita los "database is locked" al pasar de lectura a
+# escritura dentro de una transacción, y timeout espera el bloqueo en vez de
+# fallar. Los PRAGMA se aplican al abrir cada conexión.
+SQLITE_OPCIONES_PRODUCCION = {
+    'timeout': 20,
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=268435456;'
+        'PRAGMA cache_size=-20000;'
+        'PRAGMA temp_store=MEMORY'
+    ),
+}
+
+if PRODUCCION:
+    # LAB03_DB elige el motor: sqlite (por defecto) o postgresql
+    if os.environ.get('LAB03_DB', 'sqlite') == 'postgresql':
+        DATABASES['default'] = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('LAB03_DB_NAME', 'lab03'),
+            'USER': os.environ.get('LAB03_DB_USER', 'lab03'),
+            'PASSWORD': os.environ.get('LAB03_DB_PASSWORD', ''),
+            'HOST': os.environ.get('LAB03_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('LAB03_DB_PORT', '5432'),
+            'OPTIONS': {},
+        }
+        if os.environ.get('LAB03_DB_POOL'):
+            # Pool de conexiones de psycopg 3 (requiere psycopg[pool]); no se
+            # puede combinar con conexiones persistentes
+            DATABASES['default']['OPTIONS']['pool'] = {
+                'min_size': int(os.environ.get('LAB03_DB_POOL_MIN', 2)),
+                'max_size': int(os.environ.get('LAB03_DB_POOL_MAX', 20)),
+                'timeout': 10,
+            }
+        else:
+            DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('LAB03_DB_CONN_MAX_AGE', 600))
+            DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    else:
+        DATABASES['default'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('LAB03_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('LAB03_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': SQLITE_OPCIONES_PRODUCCION,
+        }
+
+
+# Archivo de ventas antiguas (ver ventas.archivo). Con LAB03_ARCHIVO_DB las
+# ventas archivadas van a un SQLite aparte; si no, a tablas de la base principal.
+
+if os.environ.get('LAB03_ARCHIVO_DB'):
+    DATABASES['archivo'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['LAB03_ARCHIVO_DB'],
+    }
+
+VENTAS_ARCHIVO_DB = 'archivo' if 'archivo' in DATABASES else 'default'
+
+DATABASE_ROUTERS = ['ventas.routers.ArchivoRouter']
+
+# Las ventas anteriores al inicio del mes de hace tantos meses se archivan
+
+VENTAS_ARCHIVO_MESES = 24
+
+
+# Instrumentación de peticiones (ver rendimiento.middleware): fracción de
+# peticiones medidas (0 la desactiva), mediciones por URL para los
+# percentiles y sentencias lentas guardadas por URL
+
+RENDIMIENTO_MUESTREO = float(os.environ.get('LAB03_RENDIMIENTO_MUESTREO', 0))
+
+RENDIMIENTO_VENTANA = 1000
+
+RENDIMIENTO_SENTENCIAS_LENTAS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'lab03',
+    }
+}
+
+if PRODUCCION:
+    # Las versiones de la caché de encuesta (ver encuesta.cache) deben ser las
+    # mismas para todos los workers y para procesar_votos: con LocMemCache
+    # cada proceso tendría las suyas y serviría resultados viejos
+    CACHE_URL = os.environ.get('LAB03_CACHE_URL', '')
+    if CACHE_URL.startswith(('redis://', 'rediss://')):
+        CACHES['default'] = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}
+    elif CACHE_URL:
+        # host:puerto de Memcached (requiere pymemcache)
+        CACHES['default'] = {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache', 'LOCATION': CACHE_URL}
+    elif not os.environ.get('LAB03_UN_PROCESO'):
+        raise ImproperlyConfigured(
+            'El perfil produccion requiere LAB03_CACHE_URL (Redis o Memcached compartido), '
+            'o LAB03_UN_PROCESO=1 si corre un solo proceso'
+        )
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,3 +246,38 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Conteo de votos de encuesta
+# Con el buffer activo los votos se acumulan en memoria y se escriben en lotes
+# cada ENCUESTA_VOTOS_BUFFER_MAX votos o ENCUESTA_VOTOS_BUFFER_INTERVALO segundos.
+
+ENCUESTA_VOTOS_BUFFER = False
+
+ENCUESTA_VOTOS_BUFFER_MAX = 500
+
+ENCUESTA_VOTOS_BUFFER_INTERVALO = 1.0
+
+# Con la cola activa (tiene prioridad sobre el buffer) cada voto se inserta en
+# VotoPendiente y el comando procesar_votos --continuo los suma por lotes.
+
+ENCUESTA_VOTOS_COLA = False
+
+
+# Caché de encuesta: alias de CACHES y duración (segundos) de cada entrada
+
+ENCUESTA_CACHE = 'default'
+
+ENCUESTA_CACHE_TIMEOUT = 300
+
+
+# Catálogo de productos en memoria: cada cuántos segundos se revisa si hubo
+# cambios en otros procesos
+
+VENTAS_CATALOGO_INTERVALO = 5.0
+
+
+# Búsqueda de productos, clientes y proveedores con el índice de texto
+# (FTS5 en SQLite, tsvector en PostgreSQL). Con False se usa icontains.
+
+VENTAS_BUSQUEDA_INDEXADA = True
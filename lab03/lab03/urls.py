@@ -3,5 +3,7 @@ from django.urls import include, path
 
 urlpatterns = [
     path('encuesta/', include('encuesta.urls')),
+    path('ventas/', include('ventas.urls')),
+    path('rendimiento/', include('rendimiento.urls')),
     path('admin/', admin.site.urls),
 ]
\ No newline at end of file
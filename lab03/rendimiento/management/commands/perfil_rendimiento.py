@@ -0,0 +1,75 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+import json
+
+from rendimiento.registro import obtener_registro
+
+# Páginas medidas si no se indican rutas
+RUTAS = [
+    '/encuesta/',
+    '/admin/ventas/venta/',
+    '/admin/ventas/detalleventa/',
+    '/admin/ventas/producto/',
+    '/admin/ventas/cliente/',
+    '/admin/ventas/proveedor/',
+    '/admin/encuesta/pregunta/',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Pedir una serie de páginas en proceso con la instrumentación activa y mostrar, por URL, '
+        'percentiles de latencia, consultas, tiempo de SQL, consultas duplicadas y sentencias más lentas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('rutas', nargs='*', help='Rutas a pedir (por defecto encuesta y listados del admin)')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Peticiones por ruta')
+        parser.add_argument('--usuario', help='Usuario staff con el que se inicia sesión (necesario para el admin)')
+        parser.add_argument('--json', action='store_true', help='Escribir el resumen completo en JSON')
+
+    def handle(self, *args, **options):
+        client = Client()
+        if options['usuario']:
+            try:
+                client.force_login(User.objects.get(username=options['usuario']))
+            except User.DoesNotExist:
+                raise CommandError(f"No existe el usuario {options['usuario']}")
+
+        registro = obtener_registro()
+        registro.reiniciar()
+        # El cliente en proceso envía Host: testserver
+        with override_settings(RENDIMIENTO_MUESTREO=1.0, ALLOWED_HOSTS=['testserver']):
+            for ruta in options['rutas'] or RUTAS:
+                for _ in range(options['repeticiones']):
+                    client.get(ruta)
+        resumen = registro.resumen()
+
+        if options['json']:
+            self.stdout.write(json.dumps(resumen, ensure_ascii=False, indent=2))
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{'URL':45} {'pet.':>5} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'consultas':>9} {'SQL ms':>7} {'dup.':>5}"
+        ))
+        for url, datos in resumen.items():
+            # Las vistas asíncronas no tienen datos de consultas (None)
+            columnas = [
+                (datos['ms']['p50'], 8), (datos['ms']['p90'], 8), (datos['ms']['p99'], 8),
+                (datos['consultas']['p90'], 9), (datos['sql_ms']['p90'], 7),
+            ]
+            self.stdout.write(
+                f"{url[:45]:45} {datos['peticiones']:5} "
+                + ' '.join(f'{"-" if valor is None else valor:>{ancho}}' for valor, ancho in columnas)
+                + f" {datos['duplicadas']:5}"
+            )
+        for url, datos in resumen.items():
+            if datos['n_mas_1']:
+                self.stdout.write(self.style.WARNING(f'Posible N+1 en {url}:'))
+                for sentencia in datos['n_mas_1']:
+                    self.stdout.write(f"  {sentencia['veces']}x {sentencia['sql'][:150]}")
+        for url, datos in resumen.items():
+            if datos['lentas']:
+                self.stdout.write(self.style.MIGRATE_LABEL(f'Sentencias más lentas de {url}:'))
+                for sentencia in datos['lentas'][:3]:
+                    self.stdout.write(f"  {sentencia['ms']:8.2f} ms  {sentencia['sql'][:150]}")
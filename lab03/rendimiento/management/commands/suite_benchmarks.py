@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+import json
+
+from rendimiento import suite
+
+
+class Command(BaseCommand):
+    help = (
+        'Suite de benchmarks en una base temporal: poblado, listados del admin de ventas, '
+        'cálculo de montos, vistas de encuesta y votos concurrentes; compara con una referencia'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escalas', type=int, nargs='+', default=[1, 5], help='Escalas de poblar_datos a medir')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones por caso (se guarda la mediana)')
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos que votan a la vez')
+        parser.add_argument('--votos', type=int, default=50, help='Votos por hilo')
+        parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados')
+        parser.add_argument('--referencia', help='Resultados anteriores (JSON) contra los que comparar')
+        parser.add_argument(
+            '--umbral', type=float, default=0.25,
+            help='Aumento de la mediana que cuenta como regresión (0.25 = 25%%)',
+        )
+
+    def handle(self, *args, **options):
+        referencia = None
+        if options['referencia']:
+            try:
+                with open(options['referencia'], encoding='utf-8') as archivo:
+                    referencia = json.load(archivo)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"No se pudo leer la referencia: {error}")
+
+        actual = suite.ejecutar(
+            options['escalas'], options['repeticiones'], options['hilos'], options['votos'],
+            progreso=lambda texto: self.stdout.write(f'Midiendo {texto}...'),
+        )
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                json.dump(actual, archivo, ensure_ascii=False, indent=2)
+
+        anteriores = (referencia or {}).get('resultados', {})
+        for caso, medicion in actual['resultados'].items():
+            linea = f"{caso:45} {medicion['mediana'] * 1000:10.2f} ms"
+            if caso in anteriores:
+                linea += f"  (referencia {anteriores[caso]['mediana'] * 1000:.2f} ms)"
+            if 'votos_por_segundo' in medicion:
+                linea += f"  {medicion['votos_por_segundo']:,} votos/s, {medicion['errores']} errores"
+            if 'bytes' in medicion:
+                linea += f"  {medicion['bytes'] / 1024 / 1024:.1f} MB"
+            if 'memoria_mb' in medicion:
+                linea += f"  pico {medicion['memoria_mb']} MB"
+            self.stdout.write(linea)
+
+        if referencia is not None:
+            regresiones = suite.comparar(actual, referencia, options['umbral'])
+            if regresiones:
+                for caso, antes, ahora, variacion in regresiones:
+                    self.stderr.write(f'{caso}: {antes * 1000:.2f} ms -> {ahora * 1000:.2f} ms (+{variacion:.0%})')
+                raise CommandError(f'{len(regresiones)} casos empeoraron más de {options["umbral"]:.0%}')
+            self.stdout.write(self.style.SUCCESS('Sin regresiones respecto de la referencia'))
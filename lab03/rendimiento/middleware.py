@@ -0,0 +1,88 @@
+"""
+Middleware de instrumentación de peticiones.
+
+Mide una fracción RENDIMIENTO_MUESTREO (0 a 1) de las peticiones. Con 0, que
+es el valor por defecto, cada petición solo paga una comparación. En las
+peticiones medidas se agrega un encabezado Server-Timing con el tiempo total
+y el de SQL.
+
+Bajo ASGI el middleware corre siempre en ``__acall__``, también para vistas
+síncronas. Las consultas de la petición corren en su hilo de sync_to_async
+(thread_sensitive), que tiene sus propias conexiones; el wrapper se instala
+y se quita en ese mismo hilo, así que se miden tanto las vistas síncronas
+como el ORM asíncrono (aget, acount...). Las consultas hechas con
+sync_to_async(thread_sensitive=False) corren en otro hilo y no se cuentan.
+"""
+import random
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .registro import Medicion, obtener_registro
+
+SIN_RUTA = '(sin ruta)'
+
+
+def _muestrear():
+    muestreo = getattr(settings, 'RENDIMIENTO_MUESTREO', 0)
+    return muestreo > 0 and (muestreo >= 1 or random.random() < muestreo)
+
+
+def _url(request):
+    coincidencia = getattr(request, 'resolver_match', None)
+    return coincidencia.view_name if coincidencia is not None else SIN_RUTA
+
+
+def _registrar(request, response, medicion):
+    medicion.terminar()
+    obtener_registro().agregar(_url(request), medicion)
+    tiempos = f'app;dur={medicion.duracion_ms:.1f}'
+    if medicion.consultas is not None:
+        tiempos += f', db;dur={medicion.sql_ms:.1f};desc="{medicion.consultas} consultas"'
+    response['Server-Timing'] = tiempos
+
+
+class RendimientoMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _medicion(self):
+        return Medicion(getattr(settings, 'RENDIMIENTO_SENTENCIAS_LENTAS', 5))
+
+    @staticmethod
+    def _instalar(pila, medicion):
+        for alias in connections:
+            pila.enter_context(connections[alias].execute_wrapper(medicion))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not _muestrear():
+            return self.get_response(request)
+        medicion = self._medicion()
+        with ExitStack() as pila:
+            self._instalar(pila, medicion)
+            response = self.get_response(request)
+        _registrar(request, response, medicion)
+        return response
+
+    async def __acall__(self, request):
+        if not _muestrear():
+            return await self.get_response(request)
+        medicion = self._medicion()
+        pila = ExitStack()
+        # En el hilo de la petición, donde corren la vista síncrona y el ORM asíncrono
+        await sync_to_async(self._instalar)(pila, medicion)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pila.close)()
+        _registrar(request, response, medicion)
+        return response
@@ -0,0 +1,165 @@
+"""
+Mediciones de rendimiento por petición y su agregación por URL.
+
+``Medicion`` se instala como execute wrapper de la conexión durante una
+petición: cuenta las consultas, suma su tiempo, detecta consultas repetidas
+(misma sentencia con los mismos parámetros) y patrones N+1 (misma sentencia
+con distintos parámetros) y guarda las sentencias más lentas.
+
+``Registro`` guarda, por nombre de URL, las últimas RENDIMIENTO_VENTANA
+mediciones y calcula percentiles sobre esa ventana. Es propio de cada
+proceso y no escribe en la base de datos.
+"""
+import heapq
+import math
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+
+# Una sentencia repetida más de esta cantidad de veces en una petición se
+# informa como posible N+1
+UMBRAL_N1 = 5
+
+
+def percentil(ordenados, p):
+    """Percentil ``p`` (0-100) por rango más cercano de una lista ordenada"""
+    if not ordenados:
+        return None
+    indice = max(0, min(len(ordenados) - 1, math.ceil(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+class Medicion:
+    """Consultas de una petición; se usa con connection.execute_wrapper"""
+
+    def __init__(self, sentencias_lentas=5):
+        self.sentencias_lentas = sentencias_lentas
+        self.consultas = 0
+        self.sql_ms = 0.0
+        self.lentas = []
+        self.plantillas = Counter()
+        self.exactas = Counter()
+        self.inicio = time.perf_counter()
+        self.duracion_ms = None
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = (time.perf_counter() - inicio) * 1000
+            self.consultas += 1
+            self.sql_ms += duracion
+            self.plantillas[sql] += 1
+            self.exactas[(sql, repr(params))] += 1
+            entrada = (duracion, sql)
+            if len(self.lentas) < self.sentencias_lentas:
+                heapq.heappush(self.lentas, entrada)
+            else:
+                heapq.heappushpop(self.lentas, entrada)
+
+    def terminar(self):
+        self.duracion_ms = (time.perf_counter() - self.inicio) * 1000
+        return self
+
+    @property
+    def duplicadas(self):
+        """Ejecuciones idénticas a una anterior de la misma petición"""
+        return sum(veces - 1 for veces in self.exactas.values())
+
+    @property
+    def n_mas_1(self):
+        """(sentencia, veces) de la más repetida si supera UMBRAL_N1, o None"""
+        if not self.plantillas:
+            return None
+        sql, veces = self.plantillas.most_common(1)[0]
+        return (sql, veces) if veces > UMBRAL_N1 else None
+
+
+class EstadisticasUrl:
+    def __init__(self, ventana, sentencias_lentas):
+        self.peticiones = 0
+        self.duraciones = deque(maxlen=ventana)
+        self.consultas = deque(maxlen=ventana)
+        self.sql_ms = deque(maxlen=ventana)
+        self.duplicadas = 0
+        self.n_mas_1 = Counter()
+        self.sentencias_lentas = sentencias_lentas
+        self.lentas = {}
+
+    def agregar(self, medicion):
+        self.peticiones += 1
+        self.duraciones.append(medicion.duracion_ms)
+        if medicion.consultas is not None:
+            self.consultas.append(medicion.consultas)
+            self.sql_ms.append(medicion.sql_ms)
+            self.duplicadas += medicion.duplicadas
+            repetida = medicion.n_mas_1
+            if repetida is not None:
+                sql, veces = repetida
+                self.n_mas_1[sql] = max(self.n_mas_1[sql], veces)
+            # Sentencias distintas, cada una con su peor tiempo
+            for ms, sql in medicion.lentas:
+                if ms > self.lentas.get(sql, 0):
+                    self.lentas[sql] = ms
+            if len(self.lentas) > self.sentencias_lentas:
+                self.lentas = dict(heapq.nlargest(self.sentencias_lentas, self.lentas.items(), key=lambda item: item[1]))
+
+    def resumen(self):
+        duraciones = sorted(self.duraciones)
+        consultas = sorted(self.consultas)
+        sql_ms = sorted(self.sql_ms)
+        return {
+            'peticiones': self.peticiones,
+            'ms': {f'p{p}': _redondear(percentil(duraciones, p)) for p in (50, 90, 99)},
+            'ms_max': _redondear(duraciones[-1] if duraciones else None),
+            'consultas': {'p50': percentil(consultas, 50), 'p90': percentil(consultas, 90), 'max': max(consultas, default=None)},
+            'sql_ms': {'p50': _redondear(percentil(sql_ms, 50)), 'p90': _redondear(percentil(sql_ms, 90))},
+            'duplicadas': self.duplicadas,
+            'n_mas_1': [{'sql': sql, 'veces': veces} for sql, veces in self.n_mas_1.most_common(3)],
+            'lentas': [
+                {'sql': sql, 'ms': _redondear(ms)}
+                for sql, ms in sorted(self.lentas.items(), key=lambda item: -item[1])
+            ],
+        }
+
+
+def _redondear(valor):
+    return None if valor is None else round(valor, 2)
+
+
+class Registro:
+    def __init__(self, ventana=None, sentencias_lentas=None):
+        self.ventana = ventana or getattr(settings, 'RENDIMIENTO_VENTANA', 1000)
+        self.sentencias_lentas = sentencias_lentas or getattr(settings, 'RENDIMIENTO_SENTENCIAS_LENTAS', 5)
+        self._lock = threading.Lock()
+        self._por_url = defaultdict(lambda: EstadisticasUrl(self.ventana, self.sentencias_lentas))
+
+    def agregar(self, url, medicion):
+        with self._lock:
+            self._por_url[url].agregar(medicion)
+
+    def resumen(self):
+        """{url: estadísticas}, de la URL más lenta (p90) a la más rápida"""
+        with self._lock:
+            resumenes = {url: estadisticas.resumen() for url, estadisticas in self._por_url.items()}
+        return dict(sorted(resumenes.items(), key=lambda item: -(item[1]['ms']['p90'] or 0)))
+
+    def reiniciar(self):
+        with self._lock:
+            self._por_url.clear()
+
+
+_registro = None
+_registro_lock = threading.Lock()
+
+
+def obtener_registro():
+    """Registro compartido por el proceso"""
+    global _registro
+    with _registro_lock:
+        if _registro is None:
+            _registro = Registro()
+        return _registro
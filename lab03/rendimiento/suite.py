@@ -0,0 +1,247 @@
+"""
+Suite de benchmarks de los caminos críticos de ventas y encuesta.
+
+Todo corre sobre una base temporal creada como la de los tests (migraciones
+incluidas), así que no toca los datos reales. Cada caso se mide varias veces
+y se guarda la mediana y el mínimo en segundos; ``comparar`` revisa un
+resultado contra uno anterior (la referencia) con un umbral de regresión.
+"""
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import StringIO
+from itertools import cycle, islice
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from encuesta.models import Opcion, Pregunta
+from ventas import catalogo, snapshot
+from ventas.models import Venta
+
+# Diferencias menores a esto (segundos) se consideran ruido al comparar
+PISO = 0.001
+
+
+@contextmanager
+def base_temporal():
+    """Base de datos de prueba migrada en un directorio temporal (SQLite) o con el nombre de test"""
+    directorio = tempfile.mkdtemp(prefix='lab03-benchmarks-')
+    test = connection.settings_dict.setdefault('TEST', {})
+    nombre_test = test.get('NAME')
+    if connection.vendor == 'sqlite':
+        # En archivo y no en memoria, para que los hilos compartan la base
+        test['NAME'] = os.path.join(directorio, 'benchmarks.sqlite3')
+    nombre = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nombre, verbosity=0)
+        test['NAME'] = nombre_test
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def medir(funcion, repeticiones=5, preparar=None):
+    """Mediana y mínimo de ``repeticiones`` ejecuciones; ``preparar`` corre antes de cada una, sin medir"""
+    duraciones = []
+    for _ in range(repeticiones):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcion()
+        duraciones.append(time.perf_counter() - inicio)
+    return {'mediana': statistics.median(duraciones), 'minimo': min(duraciones), 'repeticiones': repeticiones}
+
+
+def pico_memoria(funcion, preparar=None):
+    """Máximo de memoria de Python (MB) durante una ejecución; va aparte de medir porque tracemalloc la hace más lenta"""
+    if preparar is not None:
+        preparar()
+    tracemalloc.start()
+    try:
+        funcion()
+        return round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def entorno():
+    return {
+        'fecha': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'base': connection.vendor,
+        'plataforma': platform.platform(),
+    }
+
+
+def _cliente_admin():
+    usuario = User.objects.filter(username='benchmark').first() or User.objects.create_superuser(
+        'benchmark', 'benchmark@example.com', 'benchmark'
+    )
+    client = Client()
+    client.force_login(usuario)
+    return client
+
+
+def _get(client, url):
+    response = client.get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f'{url} respondió {response.status_code}')
+
+
+def casos_ventas(escala, repeticiones=5):
+    """Poblado, listados del admin y cálculo de montos a una escala de datos"""
+    resultados = {}
+    # Una sola vez: cada poblado deja los datos que usan los demás casos
+    resultados['poblar_datos'] = medir(
+        lambda: call_command('poblar_datos', escala=escala, limpiar=True, semilla=7, stdout=StringIO()), 1
+    )
+    catalogo.reiniciar()
+
+    client = _cliente_admin()
+    for nombre, url in (
+        ('admin_venta', '/admin/ventas/venta/'),
+        ('admin_venta_busqueda', '/admin/ventas/venta/?q=FAC0001'),
+        ('admin_detalleventa', '/admin/ventas/detalleventa/'),
+    ):
+        resultados[nombre] = medir(lambda: _get(client, url), repeticiones)
+
+    # Siempre 100 llamadas, aunque haya menos ventas
+    ventas = list(islice(cycle(Venta.objects.order_by('pk')[:100]), 100))
+    resultados['calcular_monto_total_x100'] = medir(
+        lambda: [venta.calcular_monto_total() for venta in ventas], repeticiones
+    )
+    return resultados
+
+
+def casos_snapshot():
+    """
+    Volcado y restauración de los datos ya poblados: dumpdata/loaddata en
+    JSON contra volcar/restaurar del snapshot columnar (ver ventas.snapshot).
+    restaurar además reconstruye el índice de búsqueda y ResumenCliente.
+    """
+    resultados = {}
+    directorio = tempfile.mkdtemp(prefix='lab03-snapshot-')
+    json_ruta = os.path.join(directorio, 'ventas.json')
+    snapshot_ruta = os.path.join(directorio, 'ventas.snap')
+    # La tabla intermedia de proveedores va dentro de cada producto en JSON
+    modelos = [modelo._meta.label_lower for modelo in snapshot.MODELOS if not modelo._meta.auto_created]
+
+    def vaciar():
+        with transaction.atomic():
+            snapshot.vaciar()
+
+    casos = (
+        ('dumpdata', lambda: call_command('dumpdata', *modelos, output=json_ruta, verbosity=0), None, json_ruta),
+        ('volcar_snapshot', lambda: snapshot.volcar(snapshot_ruta), None, snapshot_ruta),
+        ('loaddata', lambda: call_command('loaddata', json_ruta, verbosity=0), vaciar, None),
+        ('restaurar_snapshot', lambda: snapshot.restaurar(snapshot_ruta, limpiar=True), None, None),
+    )
+    try:
+        for nombre, funcion, preparar, ruta in casos:
+            resultados[nombre] = medir(funcion, 1, preparar=preparar)
+            if ruta is not None:
+                resultados[nombre]['bytes'] = os.path.getsize(ruta)
+            resultados[nombre]['memoria_mb'] = pico_memoria(funcion, preparar)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+    return resultados
+
+
+def casos_encuesta(repeticiones=5, hilos=8, votos=50):
+    """Las tres vistas de encuesta (sin caché) y votos desde varios hilos"""
+    resultados = {}
+    pregunta = Pregunta.objects.create(pregunta_texto='Benchmark', pub_date=timezone.now())
+    opciones = [Opcion.objects.create(pregunta=pregunta, opcion_texto=f'Opción {i}').pk for i in range(4)]
+    client = Client()
+    limpiar = caches['default'].clear
+    for nombre, url in (
+        ('index', reverse('encuesta:index')),
+        ('detalle', reverse('encuesta:detalle', args=(pregunta.pk,))),
+        ('resultados', reverse('encuesta:resultados', args=(pregunta.pk,))),
+    ):
+        resultados[nombre] = medir(lambda: _get(client, url), repeticiones, preparar=limpiar)
+
+    url = reverse('encuesta:votar', args=(pregunta.pk,))
+    errores = []
+    lock = threading.Lock()
+
+    def votar(numero):
+        client = Client()
+        try:
+            for i in range(votos):
+                try:
+                    client.post(url, {'opcion': opciones[(numero + i) % len(opciones)]})
+                except Exception as error:
+                    with lock:
+                        errores.append(repr(error))
+        finally:
+            connections[DEFAULT_DB_ALIAS].close()
+
+    def concurrentes():
+        with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+            list(ejecutor.map(votar, range(hilos)))
+
+    resultados['votos_concurrentes'] = medir(concurrentes, 1)
+    total = hilos * votos
+    resultados['votos_concurrentes'].update({
+        'votos': total,
+        'errores': len(errores),
+        'votos_por_segundo': round(total / resultados['votos_concurrentes']['mediana'], 1),
+    })
+    return resultados
+
+
+def ejecutar(escalas=(1, 5), repeticiones=5, hilos=8, votos=50, progreso=None):
+    """Corre la suite completa en una base temporal; devuelve {'entorno': ..., 'resultados': {caso: medición}}"""
+    resultados = {}
+    # Los clientes en proceso envían Host: testserver
+    with base_temporal(), override_settings(ALLOWED_HOSTS=['testserver']):
+        for escala in escalas:
+            if progreso:
+                progreso(f'ventas, escala {escala}')
+            for caso, medicion in casos_ventas(escala, repeticiones).items():
+                resultados[f'ventas.escala_{escala}.{caso}'] = medicion
+        # Con los datos de la mayor escala, que quedaron en la base
+        if escalas:
+            if progreso:
+                progreso(f'snapshot, escala {escalas[-1]}')
+            for caso, medicion in casos_snapshot().items():
+                resultados[f'snapshot.escala_{escalas[-1]}.{caso}'] = medicion
+        if progreso:
+            progreso('encuesta')
+        for caso, medicion in casos_encuesta(repeticiones, hilos, votos).items():
+            resultados[f'encuesta.{caso}'] = medicion
+        caches['default'].clear()
+        catalogo.reiniciar()
+    return {'entorno': entorno(), 'resultados': resultados}
+
+
+def comparar(actual, referencia, umbral=0.25):
+    """
+    Casos cuya mediana empeoró más que ``umbral`` (fracción) respecto de la
+    referencia. Devuelve tuplas (caso, referencia, actual, variación).
+    """
+    regresiones = []
+    for caso, medicion in actual['resultados'].items():
+        anterior = referencia.get('resultados', {}).get(caso)
+        if anterior is None:
+            continue
+        antes, ahora = anterior['mediana'], medicion['mediana']
+        if ahora - antes > PISO and ahora > antes * (1 + umbral):
+            regresiones.append((caso, antes, ahora, ahora / antes - 1))
+    return regresiones
@@ -0,0 +1,131 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from io import StringIO
+import json
+
+from encuesta.models import Pregunta
+from . import suite
+from .middleware import RendimientoMiddleware
+from .registro import Medicion, Registro, obtener_registro, percentil
+
+
+class RegistroTests(TestCase):
+    def test_percentiles(self):
+        valores = list(range(1, 101))
+        self.assertEqual(percentil(valores, 50), 50)
+        self.assertEqual(percentil(valores, 90), 90)
+        self.assertEqual(percentil(valores, 99), 99)
+        self.assertEqual(percentil([7], 99), 7)
+        self.assertIsNone(percentil([], 50))
+
+    def test_medicion_detecta_duplicadas_y_n_mas_1(self):
+        for i in range(3):
+            Pregunta.objects.create(pregunta_texto=f'P{i}', pub_date=timezone.now())
+        medicion = Medicion(sentencias_lentas=2)
+        with connection.execute_wrapper(medicion):
+            list(Pregunta.objects.all())
+            list(Pregunta.objects.all())
+            for pregunta in Pregunta.objects.all():
+                list(pregunta.opcion_set.all())
+            for pregunta in Pregunta.objects.all():
+                list(pregunta.opcion_set.all())
+        self.assertEqual(medicion.consultas, 10)
+        # Tres repeticiones de la lista de preguntas y tres de las opciones
+        self.assertEqual(medicion.duplicadas, 3 + 3)
+        sql, veces = medicion.n_mas_1
+        self.assertIn('encuesta_opcion', sql)
+        self.assertEqual(veces, 6)
+        self.assertEqual(len(medicion.lentas), 2)
+
+    def test_ventana_acotada(self):
+        registro = Registro(ventana=3)
+        for duracion in (100, 1, 2, 3):
+            medicion = Medicion()
+            medicion.duracion_ms = duracion
+            registro.agregar('encuesta:index', medicion)
+        datos = registro.resumen()['encuesta:index']
+        self.assertEqual(datos['peticiones'], 4)
+        self.assertEqual(datos['ms_max'], 3)
+
+
+class MiddlewareTests(TestCase):
+    def setUp(self):
+        # Sin la página de encuesta en caché, para que haga consultas
+        caches['default'].clear()
+        obtener_registro().reiniciar()
+
+    def test_sin_muestreo_no_mide(self):
+        with override_settings(RENDIMIENTO_MUESTREO=0):
+            response = self.client.get('/encuesta/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(obtener_registro().resumen(), {})
+
+    @override_settings(RENDIMIENTO_MUESTREO=1.0)
+    def test_mide_por_nombre_de_url(self):
+        for _ in range(3):
+            response = self.client.get('/encuesta/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.client.get('/no-existe/')
+        resumen = obtener_registro().resumen()
+        self.assertEqual(resumen['encuesta:index']['peticiones'], 3)
+        self.assertGreaterEqual(resumen['encuesta:index']['consultas']['max'], 1)
+        self.assertIn('(sin ruta)', resumen)
+
+    @override_settings(RENDIMIENTO_MUESTREO=1.0)
+    async def test_asgi_mide_consultas_de_vistas_sincronas_y_asincronas(self):
+        async def vista(request):
+            await Pregunta.objects.acount()
+            await sync_to_async(lambda: list(Pregunta.objects.all()))()
+            return HttpResponse()
+
+        response = await RendimientoMiddleware(vista)(RequestFactory().get('/x/'))
+        self.assertIn('desc="2 consultas"', response['Server-Timing'])
+
+        # Bajo ASGI una vista síncrona también pasa por __acall__
+        response = await self.async_client.get('/encuesta/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    @override_settings(RENDIMIENTO_MUESTREO=1.0)
+    def test_endpoint_y_comando(self):
+        self.assertEqual(self.client.get('/rendimiento/').status_code, 302)
+        staff = User.objects.create_user('staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+        self.client.get('/encuesta/')
+        datos = self.client.get('/rendimiento/').json()
+        self.assertIn('encuesta:index', datos)
+
+        salida = StringIO()
+        call_command('perfil_rendimiento', '/encuesta/', '/encuesta/async/', repeticiones=2, json=True, stdout=salida)
+        resumen = json.loads(salida.getvalue())
+        self.assertEqual(resumen['encuesta:index']['peticiones'], 2)
+        self.assertEqual(resumen['encuesta:aindex']['peticiones'], 2)
+
+
+class SuiteBenchmarksTests(SimpleTestCase):
+    def resultados(self, **medianas):
+        return {'resultados': {caso: {'mediana': mediana} for caso, mediana in medianas.items()}}
+
+    def test_comparar_con_umbral_y_piso(self):
+        referencia = self.resultados(lento=0.100, estable=0.100, ruido=0.0001, nuevo_no=0.1)
+        actual = self.resultados(lento=0.150, estable=0.110, ruido=0.0005, nuevo=5.0)
+        regresiones = suite.comparar(actual, referencia, umbral=0.25)
+        self.assertEqual([caso for caso, *_ in regresiones], ['lento'])
+        caso, antes, ahora, variacion = regresiones[0]
+        self.assertAlmostEqual(variacion, 0.5)
+
+    def test_medir(self):
+        llamadas = []
+        medicion = suite.medir(lambda: llamadas.append('f'), 3, preparar=lambda: llamadas.append('p'))
+        self.assertEqual(llamadas, ['p', 'f'] * 3)
+        self.assertEqual(medicion['repeticiones'], 3)
+        self.assertLessEqual(medicion['minimo'], medicion['mediana'])
+
+    def test_referencia_invalida(self):
+        with self.assertRaises(CommandError):
+            call_command('suite_benchmarks', referencia='/no/existe.json', stdout=StringIO())
@@ -0,0 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from .registro import obtener_registro
+
+
+@staff_member_required
+def estadisticas(request):
+    """Percentiles por URL de las peticiones medidas en este proceso"""
+    return JsonResponse(obtener_registro().resumen())
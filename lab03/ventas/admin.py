@@ -1,16 +1,119 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.db.models import Case, IntegerField, Q, Value, When
 from .models import (
+    Ciudad,
+    Comuna,
     Direccion,
     TelefonoCliente,
     Categoria,
     Proveedor,
     Cliente,
     Producto,
+    HistorialPrecio,
     Venta,
-    DetalleVenta
+    DetalleVenta,
+    ResumenVentaProducto,
+    ResumenVentaCategoria,
+    ResumenVentaCliente,
+    ReservaStock,
+    VentaArchivada,
+    ResumenMensualArchivo,
+    ResumenCliente
 )
+from .filtros import (
+    CantidadFilter,
+    ClienteCodigoFilter,
+    FacturaFilter,
+    MontoLineaFilter,
+    MontoVentaFilter,
+    ProveedorCodigoFilter
+)
+from .paginacion import PaginadorConteoEstimado, PaginadorKeyset
+from . import busqueda, direcciones
+from .utils import normalizar_espacios
 
 # Configuración personalizada del Admin
+# Los listados usan list_select_related para que cada página se resuelva en un
+# número constante de consultas, y los filtros por clave foránea se reemplazan
+# por filtros de texto o rangos para no cargar tablas completas.
+
+# Búsqueda con el índice de texto (ver ventas.busqueda): prefijos sin acentos,
+# ordenados por relevancia salvo que se elija otro orden en el listado
+class ChangeListBusqueda(ChangeList):
+    def get_ordering(self, request, queryset):
+        ordering = super().get_ordering(request, queryset)
+        if ORDER_VAR not in self.params and 'relevancia' in queryset.query.annotations:
+            return ['-relevancia', *ordering]
+        return ordering
+
+class BusquedaIndexadaMixin:
+    tipo_busqueda = None  # 'producto', 'cliente' o 'proveedor'
+    campo_busqueda = 'pk'  # campo del modelo que apunta al objeto indexado
+    max_relevancia = 100  # resultados que se ordenan por relevancia
+
+    def get_changelist(self, request, **kwargs):
+        return ChangeListBusqueda
+
+    def filtro_busqueda_extra(self, search_term):
+        """Condición adicional unida con OR a la del índice (o None)"""
+        return None
+
+    def get_search_results(self, request, queryset, search_term):
+        indice = busqueda.backend(queryset.db) if self.tipo_busqueda else None
+        if indice is None or not busqueda.terminos(search_term):
+            return super().get_search_results(request, queryset, search_term)
+        filtro = Q(**{f'{self.campo_busqueda}__in': indice.subconsulta(self.tipo_busqueda, search_term)})
+        extra = self.filtro_busqueda_extra(search_term)
+        if extra is not None:
+            filtro |= extra
+        ranking = indice.buscar(self.tipo_busqueda, search_term, self.max_relevancia)
+        relevancia = Case(
+            *[When(**{self.campo_busqueda: pk}, then=Value(len(ranking) - i)) for i, pk in enumerate(ranking)],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        return queryset.filter(filtro).annotate(relevancia=relevancia), False
+
+# Paginación por clave (ver ventas.paginacion.PaginadorKeyset) para los
+# listados grandes: con el orden por defecto y sin búsqueda, las páginas se
+# piden con ?cursor=... y no usan OFFSET
+CURSOR_VAR = 'cursor'
+
+class ChangeListKeyset(ChangeListBusqueda):
+    def get_results(self, request):
+        super().get_results(request)
+        self.keyset = None
+        campos = list(self.model_admin.campos_keyset)
+        if self.query or self.show_all or ORDER_VAR in self.params or self.page_num > 1:
+            return
+        if list(self.model_admin.get_ordering(request)) != campos:
+            return
+        paginador = PaginadorKeyset(self.queryset, campos, self.list_per_page)
+        try:
+            pagina = paginador.pagina(getattr(request, 'cursor_keyset', None))
+        except ValueError:
+            pagina = paginador.pagina()
+        self.keyset = pagina
+        self.result_list = pagina.objetos
+        self.multi_page = bool(pagina.siguiente or pagina.anterior)
+        self.url_primera = self.get_query_string()
+        self.url_siguiente = self.get_query_string({CURSOR_VAR: pagina.siguiente})
+        self.url_anterior = self.get_query_string({CURSOR_VAR: pagina.anterior})
+
+class KeysetAdminMixin(BusquedaIndexadaMixin):
+    campos_keyset = ()  # debe coincidir con ``ordering``
+
+    def get_changelist(self, request, **kwargs):
+        return ChangeListKeyset
+
+    def changelist_view(self, request, extra_context=None):
+        # El cursor no es un filtro: se saca de GET antes de armar el listado
+        if CURSOR_VAR in request.GET:
+            request.GET = request.GET.copy()
+            request.cursor_keyset = request.GET.pop(CURSOR_VAR)[-1]
+        return super().changelist_view(request, extra_context)
 
 # Inlines para edición relacionada
 class TelefonoClienteInline(admin.TabularInline):
@@ -26,21 +129,111 @@ class DetalleVentaInline(admin.TabularInline):
     extra = 1  # Mostrar 1 formulario vacío adicional
     max_num = 20  # Máximo 20 productos por venta
     fields = ('producto', 'precio_momento', 'cantidad', 'monto_total')
+    autocomplete_fields = ('producto',)
     readonly_fields = ('monto_total',)  # Campo calculado automáticamente
     verbose_name = "Detalle de Venta"
     verbose_name_plural = "Detalles de Venta"
 
+class HistorialPrecioInline(admin.TabularInline):
+    model = HistorialPrecio
+    extra = 0
+    fields = ('vigente_desde', 'precio')
+    readonly_fields = ('vigente_desde', 'precio')  # Se registra al cambiar el precio
+    ordering = ('-vigente_desde',)
+    can_delete = False
+    verbose_name = "Precio anterior"
+    verbose_name_plural = "Historial de precios"
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+@admin.register(Ciudad)
+class CiudadAdmin(admin.ModelAdmin):
+    list_display = ('nombre',)
+    search_fields = ('nombre',)
+
+@admin.register(Comuna)
+class ComunaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'ciudad')
+    list_select_related = ('ciudad',)
+    search_fields = ('nombre',)
+    list_filter = ('ciudad',)
+
+class DireccionForm(forms.ModelForm):
+    """
+    Los datos se internan al guardar (ver DireccionAdmin.save_model), así
+    que repetir una dirección existente no es un error: se reutiliza.
+    """
+    class Meta:
+        model = Direccion
+        fields = ('calle', 'numero', 'comuna')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Fila que se está editando (None al agregar); save_model decide qué hacer con ella
+        self.original = self.instance.pk
+
+    def clean(self):
+        datos = super().clean()
+        if {'calle', 'numero', 'comuna'} <= datos.keys():
+            existente = Direccion.objects.filter(
+                calle=normalizar_espacios(datos['calle']),
+                numero=normalizar_espacios(datos['numero']),
+                comuna=datos['comuna'],
+            ).values_list('pk', flat=True).first()
+            if existente is not None:
+                # Se valida como esa fila (también al agregar): la restricción
+                # única, que full_clean sigue comprobando, no la cuenta como repetida
+                self.instance.pk = existente
+                self.instance._state.adding = False
+        return datos
+
 @admin.register(Direccion)
 class DireccionAdmin(admin.ModelAdmin):
+    form = DireccionForm
     list_display = ('calle', 'numero', 'comuna', 'ciudad')
-    search_fields = ('calle', 'comuna', 'ciudad')
-    list_filter = ('comuna', 'ciudad')
+    list_select_related = ('comuna__ciudad',)
+    search_fields = ('calle', 'comuna__nombre', 'comuna__ciudad__nombre')
+    # Filtros por clave entera: ciudades y comunas son tablas pequeñas
+    list_filter = ('comuna__ciudad', 'comuna')
+    ordering = ('calle', 'numero')  # sigue el índice de la restricción única
+    autocomplete_fields = ('comuna',)
     fieldsets = (
         ('Información de Dirección', {
-            'fields': ('calle', 'numero', 'comuna', 'ciudad')
+            'fields': ('calle', 'numero', 'comuna')
         }),
     )
 
+    @admin.display(description='Ciudad', ordering='comuna__ciudad__nombre')
+    def ciudad(self, obj):
+        return obj.comuna.ciudad
+
+    def get_queryset(self, request):
+        # El autocompletado de clientes y proveedores muestra __str__ (comuna y ciudad)
+        return super().get_queryset(request).select_related('comuna__ciudad')
+
+    def save_model(self, request, obj, form, change):
+        """
+        La fila puede ser compartida por varios clientes y proveedores:
+        editarla los movería a todos. Se interna la dirección escrita (se
+        reutiliza o se crea otra fila) y la original queda como estaba, o se
+        borra si nadie la usa.
+        """
+        anterior = form.original
+        obj.pk = direcciones.internar(obj.calle, obj.numero, obj.comuna.nombre, obj.comuna.ciudad.nombre)
+        obj.refresh_from_db()
+        if not change or anterior == obj.pk:
+            return
+        if Cliente.objects.filter(direccion_id=anterior).exists() or Proveedor.objects.filter(direccion_id=anterior).exists():
+            self.message_user(
+                request,
+                'La dirección original está en uso y no se modificó: para mudar a un cliente o proveedor, '
+                'elija esta dirección en su ficha.',
+                messages.WARNING,
+            )
+        else:
+            Direccion.objects.filter(pk=anterior).delete()
+
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'descripcion')
@@ -52,10 +245,13 @@ class CategoriaAdmin(admin.ModelAdmin):
     )
 
 @admin.register(Proveedor)
-class ProveedorAdmin(admin.ModelAdmin):
+class ProveedorAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
     list_display = ('codigo', 'nombre', 'telefono', 'direccion')
+    list_select_related = ('direccion__comuna__ciudad',)
     search_fields = ('codigo', 'nombre', 'telefono')
-    list_filter = ('direccion__ciudad',)
+    autocomplete_fields = ('direccion',)  # un select con todas las direcciones haría una consulta por opción
+    tipo_busqueda = 'proveedor'
+    list_filter = ('direccion__comuna__ciudad',)
     fieldsets = (
         ('Información Básica', {
             'fields': ('codigo', 'nombre')
@@ -65,11 +261,19 @@ class ProveedorAdmin(admin.ModelAdmin):
         }),
     )
 
+    def filtro_busqueda_extra(self, search_term):
+        # El teléfono no está en el índice de texto
+        return Q(telefono__startswith=search_term.strip())
+
 @admin.register(Cliente)
-class ClienteAdmin(admin.ModelAdmin):
-    list_display = ('codigo', 'nombre', 'direccion')
+class ClienteAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
+    list_display = ('codigo', 'nombre', 'direccion', 'ventas', 'monto_total', 'ultima_compra', 'categoria_favorita')
+    # Los totales vienen de ResumenCliente (un LEFT JOIN), no de agregar las ventas
+    list_select_related = ('direccion__comuna__ciudad', 'resumen', 'resumen__categoria_favorita')
     search_fields = ('codigo', 'nombre')
-    list_filter = ('direccion__ciudad',)
+    tipo_busqueda = 'cliente'
+    list_filter = ('direccion__comuna__ciudad',)
+    autocomplete_fields = ('direccion',)
     inlines = [TelefonoClienteInline]  # Agregar inline para teléfonos
     fieldsets = (
         ('Información del Cliente', {
@@ -77,11 +281,36 @@ class ClienteAdmin(admin.ModelAdmin):
         }),
     )
 
+    def _resumen(self, obj):
+        return getattr(obj, 'resumen', None)
+
+    @admin.display(description='Ventas', ordering='resumen__ventas')
+    def ventas(self, obj):
+        resumen = self._resumen(obj)
+        return resumen.ventas if resumen else 0
+
+    @admin.display(description='Monto total', ordering='resumen__monto_total')
+    def monto_total(self, obj):
+        resumen = self._resumen(obj)
+        return resumen.monto_total if resumen else 0
+
+    @admin.display(description='Última compra', ordering='resumen__ultima_compra', empty_value='-')
+    def ultima_compra(self, obj):
+        resumen = self._resumen(obj)
+        return resumen.ultima_compra if resumen else None
+
+    @admin.display(description='Categoría favorita', ordering='resumen__categoria_favorita__nombre', empty_value='-')
+    def categoria_favorita(self, obj):
+        resumen = self._resumen(obj)
+        return resumen.categoria_favorita if resumen else None
+
 @admin.register(TelefonoCliente)
 class TelefonoClienteAdmin(admin.ModelAdmin):
     list_display = ('cliente', 'numero')
+    list_select_related = ('cliente',)
     search_fields = ('cliente__nombre', 'numero')
-    list_filter = ('cliente',)
+    list_filter = (ClienteCodigoFilter,)
+    autocomplete_fields = ('cliente',)
     fieldsets = (
         ('Información de Teléfono', {
             'fields': ('cliente', 'numero')
@@ -89,11 +318,15 @@ class TelefonoClienteAdmin(admin.ModelAdmin):
     )
 
 @admin.register(Producto)
-class ProductoAdmin(admin.ModelAdmin):
+class ProductoAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
     list_display = ('nombre', 'precio', 'stock', 'categoria')
+    list_select_related = ('categoria',)
     search_fields = ('nombre',)
-    list_filter = ('categoria', 'proveedores')
-    filter_horizontal = ('proveedores',)
+    tipo_busqueda = 'producto'
+    ordering = ('nombre',)  # orden estable para el autocompletado de las líneas de venta
+    list_filter = ('categoria', ProveedorCodigoFilter)
+    autocomplete_fields = ('proveedores',)
+    inlines = [HistorialPrecioInline]
     fieldsets = (
         ('Información del Producto', {
             'fields': ('nombre', 'categoria')
@@ -107,11 +340,19 @@ class ProductoAdmin(admin.ModelAdmin):
     )
 
 @admin.register(Venta)
-class VentaAdmin(admin.ModelAdmin):
+class VentaAdmin(KeysetAdminMixin, admin.ModelAdmin):
     list_display = ('numero_factura', 'fecha', 'cliente', 'descuento', 'monto')
+    list_select_related = ('cliente',)
     search_fields = ('numero_factura', 'cliente__nombre')
-    list_filter = ('fecha', 'cliente')
+    tipo_busqueda = 'cliente'
+    campo_busqueda = 'cliente'
+    list_filter = ('fecha', ClienteCodigoFilter, MontoVentaFilter)
     date_hierarchy = 'fecha'
+    autocomplete_fields = ('cliente',)
+    paginator = PaginadorConteoEstimado
+    show_full_result_count = False
+    ordering = ('-fecha', '-id')
+    campos_keyset = ordering
     inlines = [DetalleVentaInline]  # Agregar inline para detalles de venta
     fieldsets = (
         ('Información de Venta', {
@@ -122,11 +363,21 @@ class VentaAdmin(admin.ModelAdmin):
         }),
     )
 
+    def filtro_busqueda_extra(self, search_term):
+        # Número de factura por prefijo (usa el índice único de numero_factura)
+        return Q(numero_factura__startswith=search_term.strip())
+
 @admin.register(DetalleVenta)
-class DetalleVentaAdmin(admin.ModelAdmin):
+class DetalleVentaAdmin(KeysetAdminMixin, admin.ModelAdmin):
     list_display = ('venta', 'producto', 'precio_momento', 'cantidad', 'monto_total')
+    list_select_related = ('venta__cliente', 'producto')
     search_fields = ('venta__numero_factura', 'producto__nombre')
-    list_filter = ('venta', 'producto')
+    list_filter = (FacturaFilter, 'producto__categoria', CantidadFilter, MontoLineaFilter)
+    autocomplete_fields = ('venta', 'producto')
+    paginator = PaginadorConteoEstimado
+    show_full_result_count = False
+    ordering = ('-venta_id', '-id')
+    campos_keyset = ordering
     fieldsets = (
         ('Información del Detalle', {
             'fields': ('venta', 'producto')
@@ -135,3 +386,76 @@ class DetalleVentaAdmin(admin.ModelAdmin):
             'fields': ('precio_momento', 'cantidad', 'monto_total')
         }),
     )
+
+# Resúmenes diarios (se actualizan con el comando refrescar_resumenes)
+@admin.register(ResumenVentaProducto)
+class ResumenVentaProductoAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'producto', 'cantidad', 'lineas', 'monto')
+    list_select_related = ('producto',)
+    list_filter = ('producto__categoria',)
+    date_hierarchy = 'fecha'
+
+@admin.register(ResumenVentaCategoria)
+class ResumenVentaCategoriaAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'categoria', 'cantidad', 'lineas', 'monto')
+    list_select_related = ('categoria',)
+    list_filter = ('categoria',)
+    date_hierarchy = 'fecha'
+
+@admin.register(ResumenVentaCliente)
+class ResumenVentaClienteAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'cliente', 'ventas', 'monto')
+    list_select_related = ('cliente',)
+    search_fields = ('cliente__codigo',)
+    date_hierarchy = 'fecha'
+
+# Se mantiene solo (ver ventas.resumen_clientes)
+@admin.register(ResumenCliente)
+class ResumenClienteAdmin(admin.ModelAdmin):
+    list_display = ('cliente', 'ventas', 'monto_total', 'primera_compra', 'ultima_compra', 'categoria_favorita', 'actualizado')
+    list_select_related = ('cliente', 'categoria_favorita')
+    search_fields = ('cliente__codigo',)
+    ordering = ('-monto_total',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# Reservas de stock (ver ventas.reservas)
+@admin.register(ReservaStock)
+class ReservaStockAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'producto', 'cantidad', 'estado', 'creada', 'expira')
+    list_select_related = ('producto',)
+    list_filter = ('estado',)
+    search_fields = ('producto__nombre',)
+    date_hierarchy = 'creada'
+    readonly_fields = ('producto', 'cantidad', 'estado', 'creada', 'expira')
+
+    def has_add_permission(self, request):
+        # Las reservas se crean con ventas.reservas.reservar, que descuenta el stock
+        return False
+
+# Archivo de ventas antiguas (se llena con el comando archivar_ventas)
+@admin.register(VentaArchivada)
+class VentaArchivadaAdmin(admin.ModelAdmin):
+    list_display = ('numero_factura', 'fecha', 'cliente_id', 'descuento', 'monto', 'archivada')
+    date_hierarchy = 'mes'
+    search_fields = ('=numero_factura',)
+    ordering = ('-mes', '-id')
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ResumenMensualArchivo)
+class ResumenMensualArchivoAdmin(admin.ModelAdmin):
+    list_display = ('mes', 'ventas', 'lineas', 'unidades', 'bruto', 'monto', 'actualizado')
+    ordering = ('-mes',)
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,160 @@
+"""
+Archivo de ventas antiguas.
+
+Las ventas anteriores a una fecha de corte (por defecto el inicio del mes de
+hace VENTAS_ARCHIVO_MESES meses) se mueven por lotes de ids a VentaArchivada
+y DetalleVentaArchivada, que pueden vivir en otra base (VENTAS_ARCHIVO_DB,
+ver ventas.routers). El mes de cada venta queda en la columna ``mes``, que
+hace de partición: los listados y borrados del archivo filtran por ella.
+
+Por cada lote, en la base principal se borran las ventas y se suman sus
+totales a ResumenMensualArchivo en la misma transacción. El archivo se
+escribe antes y omite los ids que ya tiene, para que un lote interrumpido
+entre las dos bases se pueda repetir sin perder ni duplicar ventas. Una
+venta cuyo ``numero_factura`` ya está archivado con otro id no se mueve: se
+informa y sigue vigente.
+
+``buscar_factura`` busca primero en las ventas vigentes y luego en el archivo.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import resumen_clientes
+from .models import DetalleVenta, DetalleVentaArchivada, ResumenMensualArchivo, Venta, VentaArchivada
+from .routers import alias_archivo
+from .utils import inicio_del_dia
+
+CAMPOS_VENTA = ('id', 'numero_factura', 'fecha', 'cliente_id', 'descuento', 'monto')
+
+CAMPOS_DETALLE = ('id', 'venta_id', 'producto_id', 'precio_momento', 'cantidad', 'monto_total')
+
+
+def fecha_corte(meses=None):
+    """Inicio del mes de hace ``meses`` meses (VENTAS_ARCHIVO_MESES por defecto)"""
+    if meses is None:
+        meses = getattr(settings, 'VENTAS_ARCHIVO_MESES', 24)
+    hoy = timezone.localdate()
+    indice = hoy.year * 12 + hoy.month - 1 - meses
+    return inicio_del_dia(date(indice // 12, indice % 12 + 1, 1))
+
+
+def mes_de(fecha):
+    return timezone.localtime(fecha).date().replace(day=1)
+
+
+def _sumar_resumenes(totales):
+    """Suma los totales {mes: {campo: valor}} a ResumenMensualArchivo"""
+    existentes = {
+        resumen.mes: resumen
+        for resumen in ResumenMensualArchivo.objects.select_for_update().filter(mes__in=totales)
+    }
+    nuevos = []
+    for mes, valores in totales.items():
+        resumen = existentes.get(mes)
+        if resumen is None:
+            nuevos.append(ResumenMensualArchivo(mes=mes, **valores))
+        else:
+            for campo, valor in valores.items():
+                setattr(resumen, campo, getattr(resumen, campo) + valor)
+    campos = ['ventas', 'lineas', 'unidades', 'bruto', 'monto', 'actualizado']
+    for resumen in existentes.values():
+        resumen.actualizado = timezone.now()
+    ResumenMensualArchivo.objects.bulk_update(existentes.values(), campos)
+    ResumenMensualArchivo.objects.bulk_create(nuevos)
+
+
+def archivar_lote(venta_ids):
+    """
+    Mueve las ventas ``venta_ids`` (con sus líneas) al archivo. Devuelve la
+    cantidad de ventas y de líneas movidas y los números de factura que no
+    se movieron porque ya estaban archivados con otro id.
+    """
+    archivo = alias_archivo()
+    ventas = list(Venta.objects.filter(pk__in=venta_ids).values_list(*CAMPOS_VENTA))
+    archivadas = dict(VentaArchivada.objects.using(archivo).filter(
+        numero_factura__in=[venta[1] for venta in ventas]
+    ).values_list('numero_factura', 'id'))
+    rechazadas = [numero for venta_id, numero, *_ in ventas if archivadas.get(numero, venta_id) != venta_id]
+    if rechazadas:
+        ventas = [venta for venta in ventas if venta[1] not in rechazadas]
+        venta_ids = [venta[0] for venta in ventas]
+    detalles = list(DetalleVenta.objects.filter(venta_id__in=venta_ids).values_list(*CAMPOS_DETALLE))
+    meses = {venta[0]: mes_de(venta[2]) for venta in ventas}
+
+    totales = defaultdict(lambda: {'ventas': 0, 'lineas': 0, 'unidades': 0, 'bruto': Decimal('0'), 'monto': Decimal('0')})
+    for venta_id, _, _, _, _, monto in ventas:
+        totales[meses[venta_id]]['ventas'] += 1
+        totales[meses[venta_id]]['monto'] += monto
+    for _, venta_id, _, _, cantidad, monto_total in detalles:
+        totales[meses[venta_id]]['lineas'] += 1
+        totales[meses[venta_id]]['unidades'] += cantidad
+        totales[meses[venta_id]]['bruto'] += monto_total
+
+    with transaction.atomic():
+        # Con un archivo en otra base, este bloque confirma antes que el borrado
+        with transaction.atomic(using=archivo):
+            # Solo se omiten los ids ya copiados por un intento anterior; otro
+            # conflicto (numero_factura) debe fallar en vez de perder la venta
+            copiadas = set(archivadas.values())
+            VentaArchivada.objects.using(archivo).bulk_create([
+                VentaArchivada(
+                    id=venta_id, numero_factura=numero_factura, fecha=fecha, mes=meses[venta_id],
+                    cliente_id=cliente_id, descuento=descuento, monto=monto,
+                )
+                for venta_id, numero_factura, fecha, cliente_id, descuento, monto in ventas
+                if venta_id not in copiadas
+            ])
+            lineas_copiadas = set(DetalleVentaArchivada.objects.using(archivo).filter(
+                venta_id__in=copiadas
+            ).values_list('id', flat=True)) if copiadas else set()
+            DetalleVentaArchivada.objects.using(archivo).bulk_create([
+                DetalleVentaArchivada(**dict(zip(CAMPOS_DETALLE, detalle)))
+                for detalle in detalles if detalle[0] not in lineas_copiadas
+            ])
+        # Las ventas archivadas siguen contando en ResumenCliente
+        with resumen_clientes.suspendido():
+            DetalleVenta.objects.filter(venta_id__in=venta_ids).delete()
+            Venta.objects.filter(pk__in=venta_ids).delete()
+        _sumar_resumenes(totales)
+    return len(ventas), len(detalles), rechazadas
+
+
+def archivar(corte=None, lote=1000):
+    """
+    Archiva por lotes de ``lote`` ventas todas las anteriores a ``corte``
+    (fecha_corte() por defecto). Devuelve {'ventas': n, 'lineas': n, 'lotes': n,
+    'rechazadas': [numero_factura ya archivado con otro id]}.
+    """
+    corte = corte or fecha_corte()
+    resultado = {'ventas': 0, 'lineas': 0, 'lotes': 0, 'rechazadas': []}
+    pendientes = Venta.objects.filter(fecha__lt=corte).order_by('pk').values_list('pk', flat=True)
+    ultimo = 0
+    while True:
+        # Por clave y no desde el principio: las rechazadas siguen vigentes
+        venta_ids = list(pendientes.filter(pk__gt=ultimo)[:lote])
+        if not venta_ids:
+            return resultado
+        ultimo = venta_ids[-1]
+        ventas, lineas, rechazadas = archivar_lote(venta_ids)
+        resultado['ventas'] += ventas
+        resultado['lineas'] += lineas
+        resultado['lotes'] += 1
+        resultado['rechazadas'].extend(rechazadas)
+
+
+def buscar_factura(numero_factura):
+    """
+    Venta con ese número, vigente o archivada (None si no existe). Ambas
+    tienen los mismos campos de venta y sus líneas en ``detalleventa_set``;
+    ``archivada`` es la fecha de archivado, o None si la venta está vigente.
+    """
+    venta = Venta.objects.select_related('cliente').filter(numero_factura=numero_factura).first()
+    if venta is not None:
+        venta.archivada = None
+        return venta
+    return VentaArchivada.objects.filter(numero_factura=numero_factura).first()
@@ -0,0 +1,222 @@
+"""
+Índice de búsqueda de texto para productos, clientes y proveedores.
+
+Las búsquedas del admin con ``icontains`` recorren la tabla completa y no
+encuentran "Pérez" al escribir "perez". Este módulo mantiene una tabla de
+índice (creada en la migración 0007) con el texto de cada objeto y busca
+por prefijo sin distinguir acentos ni mayúsculas, ordenando por relevancia:
+
+* SQLite: tabla virtual FTS5 con ``tokenize='unicode61 remove_diacritics 2'``.
+* PostgreSQL: tabla con columna ``tsvector`` e índice GIN (el texto se
+  guarda sin acentos, así no hace falta la extensión unaccent).
+* Otros motores, o SQLite sin FTS5: ``icontains`` como antes.
+
+El índice se actualiza con las señales de Producto, Cliente y Proveedor
+(ver ventas.signals). Las cargas masivas con bulk_create no envían señales;
+después de ellas hay que llamar a ``reindexar`` (poblar_datos ya lo hace).
+"""
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Cliente, Producto, Proveedor
+
+TABLA = 'ventas_indice_busqueda'
+
+# Código de cada tipo dentro del rowid de FTS5 (rowid = id * 4 + código)
+TIPOS = {'producto': 1, 'cliente': 2, 'proveedor': 3}
+
+MODELOS = {'producto': Producto, 'cliente': Cliente, 'proveedor': Proveedor}
+
+# Campos indexados de cada tipo
+CAMPOS = {'producto': ('nombre',), 'cliente': ('codigo', 'nombre'), 'proveedor': ('codigo', 'nombre')}
+
+
+def texto_indexado(*valores):
+    """Texto de un objeto a partir de los valores de sus CAMPOS"""
+    return ' '.join(valores)
+
+
+def sin_acentos(texto):
+    return ''.join(
+        caracter for caracter in unicodedata.normalize('NFKD', texto)
+        if not unicodedata.combining(caracter)
+    ).casefold()
+
+
+def terminos(consulta):
+    """Palabras de la consulta, sin acentos; cada una se busca como prefijo"""
+    return re.findall(r'\w+', sin_acentos(consulta))
+
+
+class BackendFTS5:
+    nombre = 'fts5'
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def _match(self, consulta):
+        return ' '.join(f'"{termino}"*' for termino in terminos(consulta))
+
+    def guardar(self, tipo, filas):
+        """``filas`` son pares (objeto_id, texto)"""
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {TABLA} WHERE rowid = %s',
+                [(objeto_id * 4 + TIPOS[tipo],) for objeto_id, _ in filas],
+            )
+            cursor.executemany(
+                f'INSERT INTO {TABLA} (rowid, tipo, objeto_id, texto) VALUES (%s, %s, %s, %s)',
+                [(objeto_id * 4 + TIPOS[tipo], tipo, objeto_id, texto) for objeto_id, texto in filas],
+            )
+
+    def quitar(self, tipo, objeto_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLA} WHERE rowid = %s', [objeto_id * 4 + TIPOS[tipo]])
+
+    def vaciar(self, tipo):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLA} WHERE tipo = %s', [tipo])
+
+    def buscar(self, tipo, consulta, limite):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT objeto_id FROM {TABLA} WHERE {TABLA} MATCH %s AND tipo = %s ORDER BY rank LIMIT %s',
+                [self._match(consulta), tipo, limite],
+            )
+            return [fila[0] for fila in cursor.fetchall()]
+
+    def subconsulta(self, tipo, consulta):
+        return RawSQL(
+            f'SELECT objeto_id FROM {TABLA} WHERE {TABLA} MATCH %s AND tipo = %s',
+            [self._match(consulta), tipo],
+        )
+
+
+class BackendPostgres(BackendFTS5):
+    nombre = 'postgresql'
+
+    def _match(self, consulta):
+        return ' & '.join(f'{termino}:*' for termino in terminos(consulta))
+
+    def guardar(self, tipo, filas):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {TABLA} (tipo, objeto_id, texto, documento) "
+                f"VALUES (%s, %s, %s, to_tsvector('simple', %s)) "
+                f"ON CONFLICT (tipo, objeto_id) DO UPDATE "
+                f"SET texto = EXCLUDED.texto, documento = EXCLUDED.documento",
+                [(tipo, objeto_id, texto, sin_acentos(texto)) for objeto_id, texto in filas],
+            )
+
+    def quitar(self, tipo, objeto_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLA} WHERE tipo = %s AND objeto_id = %s', [tipo, objeto_id])
+
+    def buscar(self, tipo, consulta, limite):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT objeto_id FROM {TABLA}, to_tsquery('simple', %s) consulta "
+                f"WHERE tipo = %s AND documento @@ consulta "
+                f"ORDER BY ts_rank(documento, consulta) DESC LIMIT %s",
+                [self._match(consulta), tipo, limite],
+            )
+            return [fila[0] for fila in cursor.fetchall()]
+
+    def subconsulta(self, tipo, consulta):
+        return RawSQL(
+            f"SELECT objeto_id FROM {TABLA} WHERE tipo = %s AND documento @@ to_tsquery('simple', %s)",
+            [tipo, self._match(consulta)],
+        )
+
+
+_tabla_existe = {}
+
+
+def backend(using=DEFAULT_DB_ALIAS):
+    """
+    Backend de índice para la base ``using``, o None si no hay índice
+    (motor sin soporte, SQLite sin FTS5 o VENTAS_BUSQUEDA_INDEXADA = False).
+    """
+    if not getattr(settings, 'VENTAS_BUSQUEDA_INDEXADA', True):
+        return None
+    connection = connections[using]
+    # Se revisa una vez por base (la migración crea la tabla solo si el motor lo permite)
+    clave = (using, connection.settings_dict['NAME'])
+    if clave not in _tabla_existe:
+        _tabla_existe[clave] = TABLA in connection.introspection.table_names()
+    if not _tabla_existe[clave]:
+        return None
+    if connection.vendor == 'sqlite':
+        return BackendFTS5(connection)
+    if connection.vendor == 'postgresql':
+        return BackendPostgres(connection)
+    return None
+
+
+def indexar(objeto, using=DEFAULT_DB_ALIAS):
+    indice = backend(using)
+    if indice is not None:
+        tipo = objeto._meta.model_name
+        texto = texto_indexado(*(getattr(objeto, campo) for campo in CAMPOS[tipo]))
+        indice.guardar(tipo, [(objeto.pk, texto)])
+
+
+def indexar_ids(tipo, ids, using=DEFAULT_DB_ALIAS):
+    """Indexa varios objetos por id (después de un bulk_create o bulk_update)"""
+    indice = backend(using)
+    if indice is not None:
+        valores = MODELOS[tipo].objects.using(using).filter(pk__in=list(ids)).values_list('pk', *CAMPOS[tipo])
+        indice.guardar(tipo, [(objeto_id, texto_indexado(*campos)) for objeto_id, *campos in valores])
+
+
+def quitar(tipo, objeto_id, using=DEFAULT_DB_ALIAS):
+    indice = backend(using)
+    if indice is not None:
+        indice.quitar(tipo, objeto_id)
+
+
+def buscar(tipo, consulta, limite=50, using=DEFAULT_DB_ALIAS):
+    """
+    Ids que coinciden con la consulta, los más relevantes primero. Sin índice
+    se usa icontains sobre el texto (sin orden por relevancia).
+    """
+    if not terminos(consulta):
+        return []
+    indice = backend(using)
+    if indice is not None:
+        return indice.buscar(tipo, consulta, limite)
+    queryset = MODELOS[tipo].objects.using(using)
+    for termino in consulta.split():
+        filtro = Q()
+        for campo in CAMPOS[tipo]:
+            filtro |= Q(**{f'{campo}__icontains': termino})
+        queryset = queryset.filter(filtro)
+    return list(queryset.values_list('pk', flat=True)[:limite])
+
+
+def reindexar(tipos=None, using=DEFAULT_DB_ALIAS, lote=2000):
+    """Reconstruye el índice de los tipos indicados (todos por defecto)"""
+    indice = backend(using)
+    if indice is None:
+        return 0
+    total = 0
+    for tipo in tipos or TIPOS:
+        indice.vaciar(tipo)
+        filas = []
+        valores = MODELOS[tipo].objects.using(using).values_list('pk', *CAMPOS[tipo])
+        for objeto_id, *campos in valores.iterator(chunk_size=lote):
+            filas.append((objeto_id, texto_indexado(*campos)))
+            if len(filas) >= lote:
+                indice.guardar(tipo, filas)
+                total += len(filas)
+                filas = []
+        if filas:
+            indice.guardar(tipo, filas)
+            total += len(filas)
+    return total
+
@@ -0,0 +1,298 @@
+"""
+Catálogo de productos en memoria para el ingreso de ventas.
+
+Carga en una sola consulta cada producto con su precio, stock, categoría e
+ids de proveedores, en tuplas compactas indexadas por id y por nombre. Las
+búsquedas no consultan la base de datos.
+
+El catálogo se mantiene al día de dos formas:
+
+* las señales de Producto (y de sus proveedores) lo actualizan en el mismo
+  proceso de inmediato;
+* cada VENTAS_CATALOGO_INTERVALO segundos se compara la versión guardada
+  (mayor ``Producto.modificado`` y cantidad de productos) con la de la base;
+  si cambió, se cargan solo los productos modificados desde entonces, o todo
+  el catálogo si hubo borrados.
+
+``modificado`` se fija al guardar, no al confirmar la transacción: un
+producto guardado antes que otro puede hacerse visible después, con una
+fecha menor que la marca ya leída. Por eso se relee con un MARGEN hacia
+atrás mientras la marca sea reciente (como los resúmenes diarios). Un
+snapshot restaurado trae fechas viejas y puede dejar igual la versión:
+``nueva_generacion`` lo anuncia en MarcaResumen y los catálogos de todos
+los procesos se recargan completos.
+
+El stock es una foto para mostrar: las ventas lo descuentan siempre con
+UPDATE condicionales (ver ventas.stock), nunca a partir de este valor.
+
+``precio_en`` responde el precio vigente en una fecha con búsqueda binaria
+sobre el historial de precios (HistorialPrecio). El historial de cada
+producto se lee (una consulta por el índice producto, vigente_desde) la
+primera vez que se pide un precio pasado de ese producto: en memoria queda
+solo el de los productos vendidos. Todo cambio de precio actualiza
+``Producto.modificado``, así que el de los productos modificados se
+descarta y se vuelve a leer cuando se necesite.
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import HistorialPrecio, MarcaResumen, Producto
+
+ProductoCatalogo = namedtuple(
+    'ProductoCatalogo',
+    ['id', 'nombre', 'precio', 'stock', 'categoria_id', 'categoria', 'proveedores'],
+)
+
+# Demora máxima esperada entre guardar un producto y confirmar su transacción
+MARGEN = timedelta(seconds=60)
+
+# Nombre de la MarcaResumen que cambia con cada restauración completa
+GENERACION = 'catalogo'
+
+CAMPOS = ('pk', 'nombre', 'precio', 'stock', 'categoria_id', 'categoria__nombre', 'proveedores', 'modificado')
+
+
+class Catalogo:
+    def __init__(self, intervalo=None):
+        self.intervalo = intervalo
+        self._por_id = {}
+        self._por_nombre = {}
+        self._historial = {}
+        self._marca = None
+        self._generacion = None
+        self._revisado = None
+        self._lock = threading.RLock()
+        self.metricas = Counter()
+
+    def _intervalo(self):
+        if self.intervalo is not None:
+            return self.intervalo
+        return getattr(settings, 'VENTAS_CATALOGO_INTERVALO', 5.0)
+
+    def _leer(self, queryset):
+        """Agrupa las filas (una por producto y proveedor) en ProductoCatalogo"""
+        self.metricas['consultas'] += 1
+        productos, marca = {}, None
+        for pk, nombre, precio, stock, categoria_id, categoria, proveedor, modificado in (
+            queryset.order_by('pk').values_list(*CAMPOS)
+        ):
+            if pk not in productos:
+                productos[pk] = ProductoCatalogo(pk, nombre, precio, stock, categoria_id, categoria, [])
+            if proveedor is not None:
+                productos[pk].proveedores.append(proveedor)
+            marca = modificado if marca is None else max(marca, modificado)
+        return {pk: p._replace(proveedores=tuple(p.proveedores)) for pk, p in productos.items()}, marca
+
+    def _leer_generacion(self):
+        self.metricas['consultas'] += 1
+        return MarcaResumen.objects.filter(nombre=GENERACION).values_list('actualizado', flat=True).first()
+
+    def _leer_historial(self, producto_id):
+        """(fechas, precios) del producto en orden de vigencia"""
+        self.metricas['consultas'] += 1
+        fechas, precios = [], []
+        for desde, precio in HistorialPrecio.objects.filter(producto_id=producto_id).order_by(
+            'vigente_desde'
+        ).values_list('vigente_desde', 'precio'):
+            fechas.append(desde)
+            precios.append(precio)
+        return fechas, precios
+
+    def _descartar_historial(self, producto_ids):
+        # Se vuelve a leer recién cuando se pida un precio pasado del producto
+        for producto_id in producto_ids:
+            self._historial.pop(producto_id, None)
+
+    def _guardar(self, producto):
+        anterior = self._por_id.get(producto.id)
+        if anterior is not None:
+            self._quitar_nombre(anterior)
+        self._por_id[producto.id] = producto
+        self._por_nombre.setdefault(producto.nombre.casefold(), set()).add(producto.id)
+
+    def _quitar_nombre(self, producto):
+        ids = self._por_nombre.get(producto.nombre.casefold())
+        if ids is not None:
+            ids.discard(producto.id)
+            if not ids:
+                del self._por_nombre[producto.nombre.casefold()]
+
+    def cargar(self):
+        """Carga completa del catálogo"""
+        with self._lock:
+            self._generacion = self._leer_generacion()
+            productos, marca = self._leer(Producto.objects.all())
+            self._por_id, self._por_nombre = {}, {}
+            # El historial se vuelve a leer recién cuando se pida un precio pasado
+            self._historial = {}
+            for producto in productos.values():
+                self._guardar(producto)
+            self._marca = marca
+            self._revisado = time.monotonic()
+            self.metricas['cargas'] += 1
+
+    def refrescar(self, forzar=False):
+        """
+        Revisa la versión de la base (dos consultas) si pasó el intervalo, o
+        siempre con ``forzar``, y trae solo lo que cambió.
+        """
+        with self._lock:
+            if self._revisado is None:
+                self.cargar()
+                return
+            if not forzar and time.monotonic() - self._revisado < self._intervalo():
+                return
+            if self._leer_generacion() != self._generacion:
+                # Se restauró un snapshot (en este u otro proceso)
+                self.cargar()
+                return
+            self.metricas['consultas'] += 1
+            version = Producto.objects.aggregate(marca=Max('modificado'), total=Count('pk'))
+            self._revisado = time.monotonic()
+            if self._marca is not None and version['marca'] is not None and (
+                version['marca'] > self._marca or timezone.now() - MARGEN <= self._marca
+            ):
+                # Con margen: un producto confirmado tarde puede tener un modificado anterior a la marca
+                productos, marca = self._leer(Producto.objects.filter(modificado__gte=self._marca - MARGEN))
+                for producto in productos.values():
+                    self._guardar(producto)
+                self._descartar_historial(productos)
+                if marca is not None:
+                    self._marca = max(self._marca, marca)
+                self.metricas['refrescos'] += 1
+            if version['total'] != len(self._por_id):
+                self.cargar()
+
+    def actualizar(self, producto_id):
+        """Vuelve a leer un producto (señal post_save o cambio de proveedores)"""
+        with self._lock:
+            if self._revisado is None:
+                return
+            productos, marca = self._leer(Producto.objects.filter(pk=producto_id))
+            self._descartar_historial([producto_id])
+            if producto_id in productos:
+                self._guardar(productos[producto_id])
+                self._marca = max(self._marca, marca) if self._marca else marca
+            else:
+                self.quitar(producto_id)
+
+    def quitar(self, producto_id):
+        """Elimina un producto borrado"""
+        with self._lock:
+            producto = self._por_id.pop(producto_id, None)
+            self._historial.pop(producto_id, None)
+            if producto is not None:
+                self._quitar_nombre(producto)
+
+    def obtener(self, producto_id):
+        """ProductoCatalogo por id, o None si no existe"""
+        self.refrescar()
+        producto = self._por_id.get(producto_id)
+        if producto is None:
+            # Puede ser un producto recién creado en otro proceso
+            self.metricas['fallos'] += 1
+            self.refrescar(forzar=True)
+            producto = self._por_id.get(producto_id)
+        else:
+            self.metricas['aciertos'] += 1
+        return producto
+
+    def obtener_varios(self, producto_ids):
+        """
+        Diccionario {id: ProductoCatalogo} de los ids que existen. Si falta
+        alguno se refresca una sola vez para todo el lote.
+        """
+        self.refrescar()
+        if any(pk not in self._por_id for pk in producto_ids):
+            self.metricas['fallos'] += 1
+            self.refrescar(forzar=True)
+        encontrados = {pk: self._por_id[pk] for pk in producto_ids if pk in self._por_id}
+        self.metricas['aciertos'] += len(encontrados)
+        return encontrados
+
+    def precio_en(self, producto_id, fecha=None):
+        """
+        Precio vigente del producto en ``fecha`` (el actual sin fecha), o
+        None si el producto no existe. Antes del primer cambio registrado se
+        usa el precio más antiguo conocido.
+        """
+        producto = self.obtener(producto_id)
+        if producto is None:
+            return None
+        if fecha is None:
+            return producto.precio
+        with self._lock:
+            if producto_id not in self._historial:
+                self._historial[producto_id] = self._leer_historial(producto_id)
+            fechas, precios = self._historial[producto_id]
+        posicion = bisect_right(fechas, fecha)
+        if posicion == len(fechas):
+            # Después del último cambio rige el precio actual
+            return producto.precio
+        return precios[max(posicion - 1, 0)]
+
+    def por_nombre(self, nombre):
+        """Productos con ese nombre (sin distinguir mayúsculas), ordenados por id"""
+        self.refrescar()
+        self.metricas['aciertos'] += 1
+        return [self._por_id[pk] for pk in sorted(self._por_nombre.get(nombre.casefold(), ()))]
+
+    def estadisticas(self):
+        return {'productos': len(self._por_id), **self.metricas}
+
+
+_catalogo = None
+_catalogo_lock = threading.Lock()
+
+
+def obtener_catalogo():
+    """Catálogo compartido por el proceso"""
+    global _catalogo
+    with _catalogo_lock:
+        if _catalogo is None:
+            _catalogo = Catalogo()
+        return _catalogo
+
+
+def reiniciar():
+    """Descarta el catálogo del proceso; se vuelve a cargar en el próximo uso"""
+    global _catalogo
+    with _catalogo_lock:
+        _catalogo = None
+
+
+def nueva_generacion(using=DEFAULT_DB_ALIAS):
+    """
+    Anuncia que los productos se reemplazaron sin pasar por las señales (por
+    ejemplo al restaurar un snapshot): el catálogo de cada proceso se recarga
+    completo en su próxima revisión.
+    """
+    marca, creada = MarcaResumen.objects.using(using).get_or_create(nombre=GENERACION)
+    if not creada:
+        # auto_now: guardarla cambia ``actualizado``
+        marca.save(using=using, update_fields=['actualizado'])
+
+
+def producto_modificado(producto_id):
+    """Aplica un cambio de producto al catálogo del proceso, si está cargado"""
+    if _catalogo is not None:
+        _catalogo.actualizar(producto_id)
+
+
+def productos_importados():
+    """Después de una carga masiva (sin señales): trae los productos modificados, si está cargado"""
+    if _catalogo is not None:
+        _catalogo.refrescar(forzar=True)
+
+
+def producto_borrado(producto_id):
+    if _catalogo is not None:
+        _catalogo.quitar(producto_id)
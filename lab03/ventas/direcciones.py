@@ -0,0 +1,127 @@
+"""
+Direcciones internadas: cada dirección se guarda una sola vez.
+
+Ciudades y comunas viven en sus propias tablas (Ciudad, Comuna) y Direccion
+guarda solo calle, número y la clave entera de su comuna, con una
+restricción única en (calle, numero, comuna). Filtrar por ciudad compara
+enteros (``direccion__comuna__ciudad``) en vez de textos repetidos en cada
+fila, y clientes y proveedores en la misma dirección comparten la fila.
+
+Quien escribe direcciones no las crea directamente sino que las interna:
+``internar_varias`` recibe tuplas (calle, numero, comuna, ciudad), crea en
+bloque las ciudades, comunas y direcciones que falten y devuelve sus ids
+con unas pocas consultas. Los textos se normalizan antes
+(``normalizar_espacios``) para que variantes con espacios de más no
+cuenten como distintas.
+
+``fusionar_duplicadas`` deja una sola fila por dirección normalizada en
+datos que ya existen (la usa el comando normalizar_direcciones; la
+migración 0012 tiene su propia copia).
+"""
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, Q, Value, When
+
+from .models import Ciudad, Comuna, Direccion
+from .utils import en_lotes, normalizar_espacios
+
+# Tres parámetros por dirección: 300 quedan bajo el límite de 999 de SQLite
+LOTE_CONSULTA = 300
+
+
+def clave(calle, numero, comuna, ciudad):
+    return tuple(map(normalizar_espacios, (calle, numero, comuna, ciudad)))
+
+
+def comunas(pares, using=DEFAULT_DB_ALIAS):
+    """{(comuna, ciudad): comuna_id} de los pares (ya normalizados), creando los que falten"""
+    pares = set(pares)
+    if not pares:
+        return {}
+    nombres = {ciudad for _, ciudad in pares}
+    Ciudad.objects.using(using).bulk_create([Ciudad(nombre=nombre) for nombre in nombres], ignore_conflicts=True)
+    ciudades = dict(Ciudad.objects.using(using).filter(nombre__in=nombres).values_list('nombre', 'pk'))
+    Comuna.objects.using(using).bulk_create(
+        [Comuna(nombre=comuna, ciudad_id=ciudades[ciudad]) for comuna, ciudad in pares],
+        ignore_conflicts=True,
+    )
+    return {
+        (comuna, ciudad): pk
+        for pk, comuna, ciudad in Comuna.objects.using(using).filter(
+            ciudad_id__in=ciudades.values(), nombre__in={comuna for comuna, _ in pares}
+        ).values_list('pk', 'nombre', 'ciudad__nombre')
+        if (comuna, ciudad) in pares
+    }
+
+
+def internar_varias(direcciones, using=DEFAULT_DB_ALIAS):
+    """
+    {(calle, numero, comuna, ciudad): direccion_id} de las tuplas dadas. Las
+    que no existen se crean con bulk_create; las repetidas (también después
+    de normalizar) reciben el mismo id.
+    """
+    originales = set(direcciones)
+    claves = {original: clave(*original) for original in originales}
+    comuna_ids = comunas({(comuna, ciudad) for _, _, comuna, ciudad in claves.values()}, using)
+    filas = {(calle, numero, comuna_ids[comuna, ciudad]) for calle, numero, comuna, ciudad in claves.values()}
+
+    ids = {}
+    for lote in en_lotes(sorted(filas), LOTE_CONSULTA):
+        Direccion.objects.using(using).bulk_create(
+            [Direccion(calle=calle, numero=numero, comuna_id=comuna_id) for calle, numero, comuna_id in lote],
+            ignore_conflicts=True,
+        )
+        # ignore_conflicts no devuelve los ids: se leen por la clave única
+        filtro = Q()
+        for calle, numero, comuna_id in lote:
+            filtro |= Q(calle=calle, numero=numero, comuna_id=comuna_id)
+        ids.update({
+            (calle, numero, comuna_id): pk
+            for pk, calle, numero, comuna_id in Direccion.objects.using(using).filter(filtro).values_list(
+                'pk', 'calle', 'numero', 'comuna_id'
+            )
+        })
+
+    resultado = {}
+    for original, (calle, numero, comuna, ciudad) in claves.items():
+        resultado[original] = ids[calle, numero, comuna_ids[comuna, ciudad]]
+    return resultado
+
+
+def internar(calle, numero, comuna, ciudad, using=DEFAULT_DB_ALIAS):
+    """Id de la dirección, creándola (y su comuna y ciudad) si no existe"""
+    direccion = (calle, numero, comuna, ciudad)
+    return internar_varias([direccion], using)[direccion]
+
+
+def fusionar_duplicadas(direccion, referencias, using=DEFAULT_DB_ALIAS, lote=LOTE_CONSULTA):
+    """
+    Normaliza calle y número de todas las filas de ``direccion`` y deja una
+    por (calle, numero, comuna): las filas de ``referencias`` (modelos con
+    una FK ``direccion``) pasan a apuntar a la de menor id, con un UPDATE por
+    lote, y las demás se borran. Recibe los modelos para poder usarse con los
+    históricos de una migración. Devuelve (normalizadas, fusionadas).
+    """
+    canonicas = {}
+    reemplazos = {}
+    normalizadas = []
+    filas = direccion.objects.using(using).order_by('pk').values_list('pk', 'calle', 'numero', 'comuna_id')
+    for pk, calle, numero, comuna_id in filas.iterator():
+        llave = (normalizar_espacios(calle), normalizar_espacios(numero), comuna_id)
+        if llave in canonicas:
+            reemplazos[pk] = canonicas[llave]
+            continue
+        canonicas[llave] = pk
+        if (calle, numero) != llave[:2]:
+            normalizadas.append(direccion(pk=pk, calle=llave[0], numero=llave[1], comuna_id=comuna_id))
+
+    with transaction.atomic(using=using):
+        for grupo in en_lotes(reemplazos.items(), lote):
+            duplicadas = [duplicada for duplicada, _ in grupo]
+            nueva = Case(*(When(direccion_id=duplicada, then=Value(canonica)) for duplicada, canonica in grupo))
+            for modelo in referencias:
+                modelo.objects.using(using).filter(direccion_id__in=duplicadas).update(direccion_id=nueva)
+            # Ya nadie las referencia: el borrado no arrastra clientes ni proveedores
+            direccion.objects.using(using).filter(pk__in=duplicadas).delete()
+        # Después de borrar las duplicadas no choca con la restricción única
+        direccion.objects.using(using).bulk_update(normalizadas, ['calle', 'numero'], batch_size=lote)
+    return len(normalizadas), len(reemplazos)
@@ -0,0 +1,158 @@
+"""
+Exportación de ventas en memoria constante.
+
+Las filas se leen con ``values_list(...).iterator(chunk_size=...)`` (cursor del
+lado del servidor en PostgreSQL, lectura por bloques en SQLite) y cada formato
+las consume como generador, de modo que exportar millones de líneas no
+materializa nunca el queryset completo.
+"""
+import csv
+import json
+
+from .models import DetalleVenta
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - dependencia opcional
+    pyarrow = None
+
+
+COLUMNAS = (
+    'numero_factura',
+    'fecha',
+    'cliente_codigo',
+    'cliente_nombre',
+    'descuento',
+    'monto',
+    'producto_id',
+    'producto_nombre',
+    'precio_momento',
+    'cantidad',
+    'monto_total',
+)
+
+CAMPOS = (
+    'venta__numero_factura',
+    'venta__fecha',
+    'venta__cliente__codigo',
+    'venta__cliente__nombre',
+    'venta__descuento',
+    'venta__monto',
+    'producto_id',
+    'producto__nombre',
+    'precio_momento',
+    'cantidad',
+    'monto_total',
+)
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+def filas_detalle(desde=None, hasta=None, chunk_size=2000):
+    """Una tupla por DetalleVenta con los datos de su venta, ordenadas por venta"""
+    queryset = DetalleVenta.objects.all()
+    if desde:
+        queryset = queryset.filter(venta__fecha__gte=desde)
+    if hasta:
+        queryset = queryset.filter(venta__fecha__lt=hasta)
+    return queryset.order_by('venta_id', 'id').values_list(*CAMPOS).iterator(chunk_size=chunk_size)
+
+
+class _Eco:
+    """Objeto tipo archivo que devuelve lo escrito en vez de guardarlo"""
+
+    def write(self, valor):
+        return valor
+
+
+def generar_csv(filas):
+    """Genera el CSV línea por línea, comenzando por la cabecera"""
+    writer = csv.writer(_Eco())
+    yield writer.writerow(COLUMNAS)
+    for fila in filas:
+        yield writer.writerow(fila)
+
+
+def generar_jsonl(filas):
+    """
+    Genera una línea JSON por venta con sus detalles anidados. Como las filas
+    vienen ordenadas por venta basta con agrupar filas consecutivas.
+    """
+    venta = None
+    for fila in filas:
+        (numero_factura, fecha, cliente_codigo, cliente_nombre, descuento, monto,
+         producto_id, producto_nombre, precio_momento, cantidad, monto_total) = fila
+        if venta is None or venta['numero_factura'] != numero_factura:
+            if venta is not None:
+                yield json.dumps(venta, ensure_ascii=False) + '\n'
+            venta = {
+                'numero_factura': numero_factura,
+                'fecha': fecha.isoformat(),
+                'cliente': {'codigo': cliente_codigo, 'nombre': cliente_nombre},
+                'descuento': str(descuento),
+                'monto': str(monto),
+                'detalles': [],
+            }
+        venta['detalles'].append({
+            'producto_id': producto_id,
+            'producto': producto_nombre,
+            'precio_momento': str(precio_momento),
+            'cantidad': cantidad,
+            'monto_total': str(monto_total),
+        })
+    if venta is not None:
+        yield json.dumps(venta, ensure_ascii=False) + '\n'
+
+
+GENERADORES = {
+    'csv': generar_csv,
+    'jsonl': generar_jsonl,
+}
+
+
+def escribir_parquet(filas, ruta, filas_por_grupo=50000):
+    """
+    Escribe un archivo Parquet columnar por grupos de filas; solo se mantiene
+    en memoria un grupo a la vez. Requiere pyarrow.
+    """
+    if pyarrow is None:
+        raise ImportError('La exportación a Parquet requiere pyarrow')
+
+    esquema = pyarrow.schema([
+        ('numero_factura', pyarrow.string()),
+        ('fecha', pyarrow.timestamp('us', tz='UTC')),
+        ('cliente_codigo', pyarrow.string()),
+        ('cliente_nombre', pyarrow.string()),
+        ('descuento', pyarrow.decimal128(5, 2)),
+        ('monto', pyarrow.decimal128(10, 2)),
+        ('producto_id', pyarrow.int64()),
+        ('producto_nombre', pyarrow.string()),
+        ('precio_momento', pyarrow.decimal128(10, 2)),
+        ('cantidad', pyarrow.int64()),
+        ('monto_total', pyarrow.decimal128(10, 2)),
+    ])
+    total = 0
+    with pyarrow.parquet.ParquetWriter(ruta, esquema) as writer:
+        grupo = []
+
+        def volcar():
+            columnas = list(zip(*grupo))
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(columna, type=campo.type) for columna, campo in zip(columnas, esquema)],
+                schema=esquema,
+            ))
+
+        for fila in filas:
+            grupo.append(fila)
+            if len(grupo) >= filas_por_grupo:
+                volcar()
+                total += len(grupo)
+                grupo = []
+        if grupo:
+            volcar()
+            total += len(grupo)
+    return total
@@ -0,0 +1,108 @@
+"""
+Filtros del admin que no cargan tablas completas en la barra lateral.
+
+Los filtros por clave foránea de Django listan todas las filas relacionadas
+(todas las ventas, todos los clientes...). Estos filtros usan un campo de
+texto sobre un código indexado o rangos fijos de valores.
+"""
+from django.contrib import admin
+from decimal import Decimal
+
+
+class FiltroTexto(admin.SimpleListFilter):
+    """
+    Filtro con un cuadro de texto que busca por igualdad exacta en ``campo``
+    (normalmente un código único e indexado de la tabla relacionada).
+    """
+    template = 'admin/ventas/filtro_texto.html'
+    campo = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        valor = (self.value() or '').strip()
+        if valor:
+            return queryset.filter(**{self.campo: valor})
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'parametro': self.parameter_name,
+            'valor': self.value() or '',
+            'otros': [
+                (nombre, valor) for nombre, valor in changelist.params.items()
+                if nombre != self.parameter_name
+            ],
+            'limpiar': changelist.get_query_string(remove=[self.parameter_name]),
+        }
+
+
+class FiltroRango(admin.SimpleListFilter):
+    """
+    Filtro por rangos fijos de un campo numérico.
+    ``rangos`` es una lista de (clave, etiqueta, desde, hasta); los extremos
+    None dejan el rango abierto.
+    """
+    campo = None
+    rangos = ()
+
+    def lookups(self, request, model_admin):
+        return [(clave, etiqueta) for clave, etiqueta, _, _ in self.rangos]
+
+    def queryset(self, request, queryset):
+        for clave, _, desde, hasta in self.rangos:
+            if self.value() == clave:
+                if desde is not None:
+                    queryset = queryset.filter(**{f'{self.campo}__gte': desde})
+                if hasta is not None:
+                    queryset = queryset.filter(**{f'{self.campo}__lt': hasta})
+        return queryset
+
+
+class ClienteCodigoFilter(FiltroTexto):
+    title = 'código de cliente'
+    parameter_name = 'cliente_codigo'
+    campo = 'cliente__codigo'
+
+
+class FacturaFilter(FiltroTexto):
+    title = 'número de factura'
+    parameter_name = 'factura'
+    campo = 'venta__numero_factura'
+
+
+class ProveedorCodigoFilter(FiltroTexto):
+    title = 'código de proveedor'
+    parameter_name = 'proveedor_codigo'
+    campo = 'proveedores__codigo'
+
+
+class MontoVentaFilter(FiltroRango):
+    title = 'monto'
+    parameter_name = 'monto_rango'
+    campo = 'monto'
+    rangos = (
+        ('0-100', 'Menos de $100', None, Decimal('100')),
+        ('100-500', '$100 a $500', Decimal('100'), Decimal('500')),
+        ('500-2000', '$500 a $2.000', Decimal('500'), Decimal('2000')),
+        ('2000+', '$2.000 o más', Decimal('2000'), None),
+    )
+
+
+class MontoLineaFilter(MontoVentaFilter):
+    campo = 'monto_total'
+
+
+class CantidadFilter(FiltroRango):
+    title = 'cantidad'
+    parameter_name = 'cantidad_rango'
+    campo = 'cantidad'
+    rangos = (
+        ('1', '1 unidad', None, 2),
+        ('2-5', '2 a 5 unidades', 2, 6),
+        ('6+', '6 o más unidades', 6, None),
+    )
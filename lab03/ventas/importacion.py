@@ -0,0 +1,579 @@
+"""
+Importación masiva de proveedores, productos y ventas desde CSV o JSON Lines.
+
+El archivo se lee como flujo y se corta en bloques de ``lote`` registros.
+Cada bloque se convierte y valida en un proceso del pool (tipos, rangos,
+fechas, montos; sin tocar la base) mientras el proceso principal escribe
+el bloque anterior, así que nunca hay más de unos pocos bloques en memoria.
+
+El proceso principal resuelve las claves naturales (nombre de categoría,
+``codigo`` de proveedor y cliente, ``numero_factura``) con diccionarios
+cargados una sola vez y escribe cada bloque en su propia transacción con
+inserciones en lote que actualizan lo existente:
+
+* proveedores por ``codigo``; las direcciones se internan (ver
+  ventas.direcciones), así que se reutilizan si ya existen;
+* productos por ``id`` o, sin id, por nombre; las categorías que no existen
+  se crean, se reemplazan sus proveedores y los precios que cambian se
+  registran en el historial;
+* ventas por ``numero_factura``; sus líneas se reemplazan. El stock no se
+  descuenta: son ventas históricas. El resumen de los clientes tocados
+  (ResumenCliente) se recalcula una vez al final. Las ventas nuevas entran a
+  los resúmenes diarios en el próximo refresco incremental, pero si se
+  reescribió una factura ya incorporada a ellos (id bajo la marca de agua)
+  los resúmenes diarios se reconstruyen completos al final.
+
+Un registro inválido se informa con su número de línea y no detiene la
+carga; si falla la escritura de un bloque, solo ese bloque se revierte.
+
+Formatos (los de ventas son los de exportar_ventas, así que un archivo
+exportado se puede volver a importar):
+
+* proveedores: codigo, nombre, telefono, web, calle, numero, comuna, ciudad
+* productos: id (opcional), nombre, precio, stock, categoria, proveedores
+  (códigos separados por ``|`` en CSV, lista en JSON)
+* ventas CSV: una fila por línea de venta, consecutivas por factura, con
+  numero_factura, fecha, cliente_codigo, descuento, monto (opcional),
+  producto_id, precio_momento, cantidad y monto_total (opcional)
+* ventas JSONL: una venta por línea con ``cliente`` (código u objeto con
+  ``codigo``) y sus ``detalles``
+"""
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as hora
+from decimal import Decimal, InvalidOperation
+
+import django
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import busqueda, catalogo, direcciones, precios, resumen_clientes, resumenes
+from .models import Categoria, Cliente, DetalleVenta, MarcaResumen, Producto, Proveedor, Venta, VentaArchivada
+from .utils import fecha_manual
+
+CENTAVO = Decimal('0.01')
+
+COLUMNAS = {
+    'proveedores': ('codigo', 'nombre', 'telefono', 'calle', 'numero', 'comuna', 'ciudad'),
+    'productos': ('nombre', 'precio', 'stock', 'categoria'),
+    'ventas': ('numero_factura', 'fecha', 'cliente_codigo', 'producto_id', 'cantidad', 'precio_momento'),
+}
+
+
+class ErrorImportacion(Exception):
+    """El archivo no se puede importar (formato o cabecera inválidos)"""
+
+
+# Conversión y validación (corre en los procesos del pool, sin base de datos)
+
+def _texto(registro, campo, largo, obligatorio=True):
+    valor = registro.get(campo)
+    valor = '' if valor is None else str(valor).strip()
+    if obligatorio and not valor:
+        raise ValueError(f'{campo} vacío')
+    if len(valor) > largo:
+        raise ValueError(f'{campo} supera {largo} caracteres')
+    return valor
+
+
+def _decimal(registro, campo, maximo, obligatorio=True):
+    valor = registro.get(campo)
+    if valor in (None, ''):
+        if obligatorio:
+            raise ValueError(f'{campo} vacío')
+        return None
+    try:
+        numero = Decimal(str(valor).strip()).quantize(CENTAVO)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'{campo} inválido: {valor}')
+    # NaN e Infinity pasan quantize pero no se pueden comparar
+    if not numero.is_finite():
+        raise ValueError(f'{campo} inválido: {valor}')
+    if not 0 <= numero < maximo:
+        raise ValueError(f'{campo} fuera de rango: {valor}')
+    return numero
+
+
+def _entero(registro, campo, minimo=0):
+    valor = registro.get(campo)
+    try:
+        numero = int(str(valor).strip())
+    except (TypeError, ValueError):
+        raise ValueError(f'{campo} inválido: {valor}')
+    if numero < minimo:
+        raise ValueError(f'{campo} debe ser al menos {minimo}')
+    return numero
+
+
+def _fecha(valor):
+    """Datetime con zona horaria a partir de ISO 8601 (o solo la fecha)"""
+    texto = str(valor or '').strip()
+    fecha = parse_datetime(texto)
+    if fecha is None:
+        dia = parse_date(texto)
+        if dia is None:
+            raise ValueError(f'fecha inválida: {valor}')
+        fecha = datetime.combine(dia, hora.min)
+    return fecha if timezone.is_aware(fecha) else timezone.make_aware(fecha)
+
+
+def _proveedor(registro):
+    return {
+        'codigo': _texto(registro, 'codigo', 10),
+        'nombre': _texto(registro, 'nombre', 100),
+        'telefono': _texto(registro, 'telefono', 15),
+        'web': _texto(registro, 'web', 200, obligatorio=False),
+        'direccion': (
+            _texto(registro, 'calle', 200),
+            _texto(registro, 'numero', 10),
+            _texto(registro, 'comuna', 100),
+            _texto(registro, 'ciudad', 100),
+        ),
+    }
+
+
+def _producto(registro):
+    proveedores = registro.get('proveedores') or []
+    if isinstance(proveedores, str):
+        proveedores = proveedores.split('|')
+    if not isinstance(proveedores, list):
+        raise ValueError('proveedores inválidos')
+    producto_id = registro.get('id')
+    return {
+        'id': _entero(registro, 'id', 1) if producto_id not in (None, '') else None,
+        'nombre': _texto(registro, 'nombre', 100),
+        'precio': _decimal(registro, 'precio', Decimal('1e8')),
+        'stock': _entero(registro, 'stock'),
+        'categoria': _texto(registro, 'categoria', 50),
+        'proveedores': sorted({str(codigo).strip() for codigo in proveedores if str(codigo).strip()}),
+    }
+
+
+def _linea_venta(registro):
+    precio = _decimal(registro, 'precio_momento', Decimal('1e8'))
+    cantidad = _entero(registro, 'cantidad', 1)
+    monto_total = _decimal(registro, 'monto_total', Decimal('1e8'), obligatorio=False)
+    return {
+        'producto_id': _entero(registro, 'producto_id', 1),
+        'precio_momento': precio,
+        'cantidad': cantidad,
+        'monto_total': (precio * cantidad).quantize(CENTAVO) if monto_total is None else monto_total,
+    }
+
+
+def _venta(registro, lineas):
+    cliente = registro.get('cliente_codigo', registro.get('cliente'))
+    if isinstance(cliente, dict):
+        cliente = cliente.get('codigo')
+    descuento = _decimal(registro, 'descuento', Decimal('100.01'), obligatorio=False) or Decimal('0.00')
+    monto = _decimal(registro, 'monto', Decimal('1e8'), obligatorio=False)
+    if monto is None:
+        subtotal = sum((linea['monto_total'] for linea in lineas), Decimal('0'))
+        monto = (subtotal - subtotal * descuento / 100).quantize(CENTAVO)
+    return {
+        'numero_factura': _texto(registro, 'numero_factura', 20),
+        'fecha': _fecha(registro.get('fecha')),
+        'cliente': _texto({'cliente': cliente}, 'cliente', 10),
+        'descuento': descuento,
+        'monto': monto,
+        'lineas': lineas,
+    }
+
+
+def _ventas_csv(registros):
+    """Agrupa las filas consecutivas de cada factura; una fila inválida descarta la factura"""
+    facturas, errores = [], []
+    grupo = []
+
+    def cerrar():
+        linea_inicial, cabecera = grupo[0]
+        lineas, invalida = [], False
+        for linea, registro in grupo:
+            try:
+                lineas.append(_linea_venta(registro))
+            except ValueError as error:
+                errores.append((linea, str(error)))
+                invalida = True
+        if invalida:
+            return
+        try:
+            facturas.append((linea_inicial, _venta(cabecera, lineas)))
+        except ValueError as error:
+            errores.append((linea_inicial, str(error)))
+
+    for linea, registro in registros:
+        if grupo and registro.get('numero_factura') != grupo[0][1].get('numero_factura'):
+            cerrar()
+            grupo = []
+        grupo.append((linea, registro))
+    if grupo:
+        cerrar()
+    return facturas, errores
+
+
+def _venta_json(registro):
+    detalles = registro.get('detalles') or registro.get('lineas')
+    if not isinstance(detalles, list) or not detalles:
+        raise ValueError('venta sin detalles')
+    lineas = []
+    for i, detalle in enumerate(detalles):
+        if not isinstance(detalle, dict):
+            raise ValueError(f'detalle {i} inválido')
+        detalle = dict(detalle)
+        detalle.setdefault('producto_id', detalle.get('producto'))
+        try:
+            lineas.append(_linea_venta(detalle))
+        except ValueError as error:
+            raise ValueError(f'detalle {i}: {error}')
+    return _venta(registro, lineas)
+
+
+CONVERTIDORES = {
+    'proveedores': _proveedor,
+    'productos': _producto,
+    'ventas': _venta_json,
+}
+
+
+def procesar_bloque(tipo, cabecera, registros):
+    """
+    Convierte y valida un bloque de registros (línea, valores). ``cabecera``
+    es la lista de columnas en CSV y None en JSONL (los valores son el texto
+    de cada línea). Devuelve (válidos, errores), ambos con su número de línea.
+    """
+    validos, errores, dicts = [], [], []
+    for linea, valores in registros:
+        if cabecera is None:
+            try:
+                registro = json.loads(valores)
+            except ValueError as error:
+                errores.append((linea, f'JSON inválido: {error}'))
+                continue
+            if not isinstance(registro, dict):
+                errores.append((linea, 'se espera un objeto JSON'))
+                continue
+        else:
+            if len(valores) != len(cabecera):
+                errores.append((linea, f'se esperaban {len(cabecera)} columnas y hay {len(valores)}'))
+                continue
+            registro = dict(zip(cabecera, valores))
+        dicts.append((linea, registro))
+
+    if tipo == 'ventas' and cabecera is not None:
+        facturas, invalidas = _ventas_csv(dicts)
+        return facturas, errores + invalidas
+
+    convertir = CONVERTIDORES[tipo]
+    for linea, registro in dicts:
+        try:
+            validos.append((linea, convertir(registro)))
+        except ValueError as error:
+            errores.append((linea, str(error)))
+    return validos, errores
+
+
+# Lectura del archivo
+
+def bloques(archivo, tipo, formato, lote):
+    """
+    Genera bloques (tipo, cabecera, registros) de a lo más ``lote`` registros
+    leyendo ``archivo`` (abierto en modo texto) como flujo. En ventas CSV un
+    bloque no corta las filas de una misma factura.
+    """
+    if formato == 'jsonl':
+        grupo = []
+        for linea, texto in enumerate(archivo, 1):
+            if texto.strip():
+                grupo.append((linea, texto))
+                if len(grupo) >= lote:
+                    yield tipo, None, grupo
+                    grupo = []
+        if grupo:
+            yield tipo, None, grupo
+        return
+
+    lector = csv.reader(archivo)
+    cabecera = [columna.strip() for columna in next(lector, [])]
+    faltantes = [columna for columna in COLUMNAS[tipo] if columna not in cabecera]
+    if faltantes:
+        raise ErrorImportacion(f'Faltan columnas en la cabecera: {", ".join(faltantes)}')
+    indice_factura = cabecera.index('numero_factura') if tipo == 'ventas' else None
+    grupo = []
+    for valores in lector:
+        if not any(valores):
+            continue
+        if (
+            len(grupo) >= lote
+            and (indice_factura is None or grupo[-1][1][indice_factura:indice_factura + 1] != valores[indice_factura:indice_factura + 1])
+        ):
+            yield tipo, cabecera, grupo
+            grupo = []
+        grupo.append((lector.line_num, valores))
+    if grupo:
+        yield tipo, cabecera, grupo
+
+
+def procesados(bloques, procesos):
+    """
+    Resultados de procesar_bloque en el orden de los bloques. Con más de un
+    proceso se usa un pool con a lo más dos bloques pendientes por proceso.
+    """
+    if procesos <= 1:
+        for bloque in bloques:
+            yield procesar_bloque(*bloque)
+        return
+    # django.setup: con spawn (macOS, Windows) los procesos parten sin configurar
+    with ProcessPoolExecutor(max_workers=procesos, initializer=django.setup) as pool:
+        pendientes = deque()
+        for bloque in bloques:
+            pendientes.append(pool.submit(procesar_bloque, *bloque))
+            if len(pendientes) >= procesos * 2:
+                yield pendientes.popleft().result()
+        while pendientes:
+            yield pendientes.popleft().result()
+
+
+# Escritura (proceso principal)
+
+class Importador:
+    """Escribe bloques validados resolviendo las claves naturales con diccionarios en memoria"""
+
+    def __init__(self, tipo):
+        self.tipo = tipo
+        self.escribir = getattr(self, f'_escribir_{tipo}')
+        self.mapas = None
+        self.clientes = set()
+        # Menor id de las ventas existentes que se reescribieron
+        self.primera_reescrita = None
+
+    def _cargar(self):
+        if self.tipo == 'proveedores':
+            # Se llena con las direcciones internadas de cada bloque
+            self.mapas = {'direcciones': {}}
+        elif self.tipo == 'productos':
+            # Con nombres repetidos se usa el de menor id (el último en ganar)
+            self.mapas = {
+                'categorias': dict(Categoria.objects.order_by('-pk').values_list('nombre', 'pk')),
+                'proveedores': dict(Proveedor.objects.values_list('codigo', 'pk').iterator()),
+                'productos': dict(Producto.objects.order_by('-pk').values_list('nombre', 'pk').iterator()),
+            }
+            self.mapas['ids'] = set(self.mapas['productos'].values()) | set(
+                Producto.objects.values_list('pk', flat=True).iterator()
+            )
+        else:
+            self.mapas = {
+                'clientes': dict(Cliente.objects.values_list('codigo', 'pk').iterator()),
+                'productos': set(Producto.objects.values_list('pk', flat=True).iterator()),
+            }
+
+    def __call__(self, registros):
+        """Escribe un bloque en una transacción; devuelve (importados, errores)"""
+        if self.mapas is None:
+            self._cargar()
+        try:
+            with transaction.atomic():
+                return self.escribir(registros)
+        except DatabaseError as error:
+            if self.tipo != 'ventas':
+                # Lo creado en el bloque revertido no debe quedar en los diccionarios
+                self._cargar()
+            return 0, [(linea, f'bloque revertido: {error}') for linea, _ in registros]
+
+    def _escribir_proveedores(self, registros):
+        # El último registro de cada código gana
+        por_codigo = {registro['codigo']: (linea, registro) for linea, registro in registros}
+        conocidas = self.mapas['direcciones']
+        nuevas = {registro['direccion'] for _, registro in por_codigo.values()} - set(conocidas)
+        if nuevas:
+            conocidas.update(direcciones.internar_varias(nuevas))
+        Proveedor.objects.bulk_create(
+            [
+                Proveedor(
+                    codigo=registro['codigo'], nombre=registro['nombre'], telefono=registro['telefono'],
+                    web=registro['web'], direccion_id=conocidas[registro['direccion']],
+                )
+                for _, registro in por_codigo.values()
+            ],
+            update_conflicts=True,
+            unique_fields=['codigo'],
+            update_fields=['nombre', 'telefono', 'web', 'direccion'],
+        )
+        # bulk_create no envía señales: se indexa aquí
+        busqueda.indexar_ids('proveedor', Proveedor.objects.filter(codigo__in=list(por_codigo)).values_list('pk', flat=True))
+        return len(por_codigo), []
+
+    def _escribir_productos(self, registros):
+        errores = []
+        categorias, proveedores = self.mapas['categorias'], self.mapas['proveedores']
+        por_nombre, ids = self.mapas['productos'], self.mapas['ids']
+
+        validos = []
+        for linea, registro in registros:
+            desconocidos = [codigo for codigo in registro['proveedores'] if codigo not in proveedores]
+            if desconocidos:
+                errores.append((linea, f'proveedor inexistente: {", ".join(desconocidos)}'))
+            elif registro['id'] is not None and registro['id'] not in ids:
+                errores.append((linea, f'producto inexistente: {registro["id"]}'))
+            else:
+                validos.append((linea, registro))
+
+        nuevas = {registro['categoria'] for _, registro in validos} - set(categorias)
+        if nuevas:
+            creadas = Categoria.objects.bulk_create([Categoria(nombre=nombre) for nombre in sorted(nuevas)])
+            categorias.update({categoria.nombre: categoria.pk for categoria in creadas})
+
+        ahora = timezone.now()
+        existentes, nuevos = {}, {}
+        for linea, registro in validos:
+            producto = Producto(
+                nombre=registro['nombre'], precio=registro['precio'], stock=registro['stock'],
+                categoria_id=categorias[registro['categoria']], modificado=ahora,
+            )
+            producto.pk = registro['id'] or por_nombre.get(registro['nombre'])
+            if producto.pk is None:
+                # Nombre repetido en el bloque: el último gana
+                nuevos[registro['nombre']] = (producto, registro)
+            else:
+                existentes[producto.pk] = (producto, registro)
+
+        anteriores = dict(Producto.objects.filter(pk__in=list(existentes)).values_list('pk', 'precio'))
+        # modificado se asigna a mano (bulk_update no aplica auto_now) para que
+        # los catálogos de otros procesos vean los cambios
+        Producto.objects.bulk_update(
+            [producto for producto, _ in existentes.values()],
+            ['nombre', 'precio', 'stock', 'categoria', 'modificado'],
+            batch_size=500,
+        )
+        Producto.objects.bulk_create([producto for producto, _ in nuevos.values()])
+        for producto, _ in nuevos.values():
+            por_nombre.setdefault(producto.nombre, producto.pk)
+            ids.add(producto.pk)
+        # bulk_create y bulk_update no envían señales: el historial se escribe aquí
+        precios.registrar(
+            [
+                (producto.pk, producto.precio)
+                for producto, _ in (*existentes.values(), *nuevos.values())
+                if anteriores.get(producto.pk) != producto.precio
+            ],
+            ahora,
+        )
+
+        Relacion = Producto.proveedores.through
+        Relacion.objects.filter(producto_id__in=list(existentes)).delete()
+        Relacion.objects.bulk_create([
+            Relacion(producto_id=producto.pk, proveedor_id=proveedores[codigo])
+            for producto, registro in (*existentes.values(), *nuevos.values())
+            for codigo in registro['proveedores']
+        ])
+        busqueda.indexar_ids('producto', [*existentes, *(producto.pk for producto, _ in nuevos.values())])
+        transaction.on_commit(catalogo.productos_importados)
+        return len(existentes) + len(nuevos), errores
+
+    def _escribir_ventas(self, registros):
+        errores = []
+        clientes, productos = self.mapas['clientes'], self.mapas['productos']
+        por_numero = {}
+        for linea, factura in registros:
+            faltantes = sorted({l['producto_id'] for l in factura['lineas']} - productos)
+            if factura['cliente'] not in clientes:
+                errores.append((linea, f'cliente inexistente: {factura["cliente"]}'))
+            elif faltantes:
+                errores.append((linea, f'producto inexistente: {", ".join(map(str, faltantes))}'))
+            else:
+                por_numero[factura['numero_factura']] = (linea, factura)
+
+        # Una factura ya archivada no puede volver a las vigentes
+        for numero in VentaArchivada.objects.filter(numero_factura__in=list(por_numero)).values_list('numero_factura', flat=True):
+            errores.append((por_numero.pop(numero)[0], f'la factura {numero} está archivada'))
+        if not por_numero:
+            return 0, errores
+
+        existentes = list(Venta.objects.filter(numero_factura__in=list(por_numero)).values_list('pk', 'cliente_id'))
+        anteriores = {cliente_id for _, cliente_id in existentes}
+        with fecha_manual(Venta):
+            Venta.objects.bulk_create(
+                [
+                    Venta(
+                        numero_factura=numero, fecha=factura['fecha'], cliente_id=clientes[factura['cliente']],
+                        descuento=factura['descuento'], monto=factura['monto'],
+                    )
+                    for numero, (_, factura) in por_numero.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['numero_factura'],
+                update_fields=['fecha', 'cliente', 'descuento', 'monto'],
+            )
+        venta_ids = dict(Venta.objects.filter(numero_factura__in=list(por_numero)).values_list('numero_factura', 'pk'))
+        DetalleVenta.objects.filter(venta_id__in=list(venta_ids.values())).delete()
+        DetalleVenta.objects.bulk_create(
+            [
+                DetalleVenta(venta_id=venta_ids[numero], **linea)
+                for numero, (_, factura) in por_numero.items()
+                for linea in factura['lineas']
+            ],
+            batch_size=1000,
+        )
+        self.clientes |= anteriores | {clientes[factura['cliente']] for _, factura in por_numero.values()}
+        if existentes:
+            primera = min(pk for pk, _ in existentes)
+            self.primera_reescrita = primera if self.primera_reescrita is None else min(self.primera_reescrita, primera)
+        return len(por_numero), errores
+
+    def terminar(self):
+        """
+        Recalcula una sola vez el resumen de los clientes tocados: por bloque
+        se repetiría la agregación de cada cliente con ventas en varios bloques.
+        Reconstruye los resúmenes diarios si se reescribieron ventas que ya
+        sumaban en ellos (el refresco incremental solo ve ventas nuevas).
+        Devuelve True si los reconstruyó.
+        """
+        if self.clientes:
+            with transaction.atomic():
+                resumen_clientes.recalcular(self.clientes)
+            self.clientes = set()
+        reconstruir = self.primera_reescrita is not None and self.primera_reescrita <= (
+            MarcaResumen.objects.filter(nombre=resumenes.MARCA).values_list('ultima_venta_id', flat=True).first() or 0
+        )
+        self.primera_reescrita = None
+        if reconstruir:
+            resumenes.refrescar(completo=True)
+        return reconstruir
+
+
+def importar(archivo, tipo, formato='csv', lote=2000, procesos=None, progreso=None):
+    """
+    Importa ``archivo`` (abierto en modo texto). Devuelve un diccionario con
+    registros leídos, importados, errores [(línea, mensaje)], bloques, los
+    segundos totales y de escritura y si se reconstruyeron los resúmenes
+    diarios.
+    """
+    if tipo not in COLUMNAS:
+        raise ErrorImportacion(f'Tipo desconocido: {tipo}')
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+    importador = Importador(tipo)
+    resultado = {
+        'leidos': 0, 'importados': 0, 'errores': [], 'bloques': 0, 'segundos': 0.0, 'escritura': 0.0,
+        'resumenes_reconstruidos': False,
+    }
+    inicio = time.perf_counter()
+    for validos, errores in procesados(bloques(archivo, tipo, formato, lote), procesos):
+        escritura = time.perf_counter()
+        importados, rechazados = importador(validos) if validos else (0, [])
+        resultado['escritura'] += time.perf_counter() - escritura
+        resultado['bloques'] += 1
+        resultado['leidos'] += len(validos) + len(errores)
+        resultado['importados'] += importados
+        resultado['errores'].extend(sorted(errores + rechazados))
+        if progreso:
+            progreso(resultado)
+    escritura = time.perf_counter()
+    resultado['resumenes_reconstruidos'] = importador.terminar()
+    resultado['escritura'] += time.perf_counter() - escritura
+    resultado['segundos'] = time.perf_counter() - inicio
+    return resultado
@@ -0,0 +1,167 @@
+"""
+Ingreso de ventas en lote.
+
+Recibe muchas facturas a la vez (p. ej. desde los terminales de venta), las
+valida con unas pocas consultas, calcula los montos en memoria e inserta
+cabeceras y líneas con bulk_create. El stock se descuenta con un UPDATE
+condicional por producto (``stock >= cantidad``, ver ventas.stock); si algún
+producto no alcanza, toda la operación se revierte.
+
+Formato de cada factura::
+
+    {
+        "numero_factura": "F-0001",
+        "cliente": "CLI001",          # código del cliente
+        "descuento": "5.00",          # porcentaje, opcional
+        "lineas": [{"producto": 3, "cantidad": 2}, ...]
+    }
+"""
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from . import resumen_clientes
+from .catalogo import obtener_catalogo
+from .models import Cliente, DetalleVenta, Venta, VentaArchivada
+from .stock import StockInsuficiente, descontar_stock
+
+CENTAVO = Decimal('0.01')
+MAX_FACTURAS = 1000
+
+
+class ErrorIngesta(Exception):
+    """Facturas rechazadas; ``errores`` es una lista de mensajes"""
+
+    def __init__(self, errores):
+        super().__init__('; '.join(errores))
+        self.errores = errores
+
+
+def _entero_positivo(valor):
+    """Entero > 0 a partir de un int o de un texto con dígitos; None si no lo es"""
+    # isdecimal y no isdigit: '²' es un dígito que int() no acepta
+    if isinstance(valor, str) and valor.isdecimal():
+        valor = int(valor)
+    if isinstance(valor, int) and not isinstance(valor, bool) and valor > 0:
+        return valor
+    return None
+
+
+def _descuento(valor):
+    try:
+        descuento = Decimal(str(valor)).quantize(CENTAVO)
+    except (InvalidOperation, TypeError):
+        return None
+    # NaN no se puede comparar con los límites
+    return descuento if descuento.is_finite() and 0 <= descuento <= 100 else None
+
+
+def validar_facturas(facturas):
+    """
+    Revisa el lote; los clientes se resuelven con una consulta y los
+    productos con el catálogo en memoria (precio vigente sin consultar).
+    Devuelve (clientes por código, productos por id) o lanza ErrorIngesta
+    con todos los problemas encontrados.
+    """
+    if not isinstance(facturas, list) or not facturas:
+        raise ErrorIngesta(['Se espera una lista de facturas no vacía'])
+    if len(facturas) > MAX_FACTURAS:
+        raise ErrorIngesta([f'A lo más {MAX_FACTURAS} facturas por lote'])
+
+    errores = []
+    numeros = Counter()
+    codigos, producto_ids = set(), set()
+    for i, factura in enumerate(facturas):
+        if not isinstance(factura, dict):
+            errores.append(f'Factura {i}: formato inválido')
+            continue
+        numero = factura.get('numero_factura')
+        if not numero or not isinstance(numero, str) or len(numero) > 20:
+            errores.append(f'Factura {i}: numero_factura inválido')
+        else:
+            numeros[numero] += 1
+        cliente = factura.get('cliente')
+        if isinstance(cliente, str):
+            codigos.add(cliente)
+        else:
+            errores.append(f'Factura {i}: cliente inválido')
+        if _descuento(factura.get('descuento', 0)) is None:
+            errores.append(f'Factura {i}: descuento inválido')
+        lineas = factura.get('lineas')
+        if not isinstance(lineas, list) or not lineas:
+            errores.append(f'Factura {i}: sin líneas')
+            continue
+        for j, linea in enumerate(lineas):
+            producto = linea.get('producto') if isinstance(linea, dict) else None
+            cantidad = linea.get('cantidad') if isinstance(linea, dict) else None
+            if _entero_positivo(producto) is None or _entero_positivo(cantidad) is None:
+                errores.append(f'Factura {i}, línea {j}: producto y cantidad deben ser enteros positivos')
+            else:
+                producto_ids.add(int(producto))
+
+    errores.extend(
+        f'numero_factura repetido en el lote: {numero}' for numero, veces in numeros.items() if veces > 1
+    )
+    existentes = Venta.objects.filter(numero_factura__in=list(numeros)).values_list(
+        'numero_factura', flat=True
+    )
+    errores.extend(f'La factura {numero} ya existe' for numero in existentes)
+    # El número tampoco puede repetir uno archivado: la venta no se podría archivar
+    archivadas = VentaArchivada.objects.filter(numero_factura__in=list(numeros)).values_list(
+        'numero_factura', flat=True
+    )
+    errores.extend(f'La factura {numero} ya existe en el archivo' for numero in archivadas)
+
+    clientes = {cliente.codigo: cliente for cliente in Cliente.objects.filter(codigo__in=codigos)}
+    errores.extend(f'Cliente inexistente: {codigo}' for codigo in codigos if codigo not in clientes)
+    productos = obtener_catalogo().obtener_varios(producto_ids)
+    errores.extend(f'Producto inexistente: {pk}' for pk in sorted(producto_ids - set(productos)))
+    if errores:
+        raise ErrorIngesta(errores)
+    return clientes, productos
+
+
+def ingresar_ventas(facturas, tamano_lote=500):
+    """
+    Valida e inserta un lote de facturas de forma atómica.
+    Devuelve la lista de Ventas creadas (con pk y monto).
+    """
+    clientes, productos = validar_facturas(facturas)
+
+    ventas, lineas_por_venta = [], []
+    cantidades = Counter()
+    for factura in facturas:
+        lineas = []
+        for linea in factura['lineas']:
+            producto = productos[int(linea['producto'])]
+            cantidad = int(linea['cantidad'])
+            cantidades[producto.id] += cantidad
+            lineas.append(DetalleVenta(
+                producto_id=producto.id,
+                precio_momento=producto.precio,
+                cantidad=cantidad,
+                monto_total=producto.precio * cantidad,
+            ))
+        subtotal = sum((linea.monto_total for linea in lineas), Decimal('0'))
+        descuento = _descuento(factura.get('descuento', 0))
+        ventas.append(Venta(
+            numero_factura=factura['numero_factura'],
+            cliente=clientes[factura['cliente']],
+            descuento=descuento,
+            monto=(subtotal - subtotal * descuento / 100).quantize(CENTAVO),
+        ))
+        lineas_por_venta.append(lineas)
+
+    with transaction.atomic():
+        descontar_stock(cantidades)
+        Venta.objects.bulk_create(ventas, batch_size=tamano_lote)
+        detalles = []
+        for venta, lineas in zip(ventas, lineas_por_venta):
+            for linea in lineas:
+                linea.venta_id = venta.pk
+                detalles.append(linea)
+        DetalleVenta.objects.bulk_create(detalles, batch_size=tamano_lote)
+        # bulk_create no envía señales
+        resumen_clientes.recalcular({venta.cliente_id for venta in ventas})
+    return ventas
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from decimal import Decimal, InvalidOperation
+import time
+
+from ventas import precios
+from ventas.models import Categoria, Producto
+
+
+class Command(BaseCommand):
+    help = (
+        'Ajustar en bloque el precio de los productos de una categoría (o de todos) en un porcentaje, '
+        'con un solo UPDATE, registrando el historial de precios'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('porcentaje', help='Variación del precio, por ejemplo 5 o -10 (%%)')
+        parser.add_argument('--categoria', help='Nombre o id de la categoría (por defecto todos los productos)')
+        parser.add_argument('--productos', type=int, nargs='+', help='Limitar a estos ids de producto')
+
+    def handle(self, *args, **options):
+        try:
+            porcentaje = Decimal(options['porcentaje'])
+        except InvalidOperation:
+            raise CommandError(f"Porcentaje inválido: {options['porcentaje']}")
+        if not porcentaje.is_finite() or porcentaje <= -100:
+            raise CommandError('El porcentaje debe ser mayor que -100')
+
+        productos = Producto.objects.all()
+        if options['categoria']:
+            nombre = options['categoria']
+            categoria = Categoria.objects.filter(pk=int(nombre)) if nombre.isdigit() else Categoria.objects.filter(nombre=nombre)
+            categoria = categoria.order_by('pk').first()
+            if categoria is None:
+                raise CommandError(f'Categoría inexistente: {nombre}')
+            productos = productos.filter(categoria=categoria)
+        if options['productos']:
+            productos = productos.filter(pk__in=options['productos'])
+
+        inicio = time.perf_counter()
+        actualizados = precios.ajustar(productos, porcentaje)
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'Actualizados {actualizados} precios ({porcentaje:+}%) en {duracion:.2f}s'
+        ))
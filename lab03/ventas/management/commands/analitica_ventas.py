@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+import json
+import time
+
+from ventas import analitica
+from ventas.management.commands.exportar_ventas import fecha_desde_texto
+
+
+class Command(BaseCommand):
+    help = (
+        'Reportes de ventas con NumPy (top de productos, ingresos por categoría, RFM de '
+        'clientes e impacto de descuentos), con tiempos y verificación contra el ORM'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reporte', choices=[*analitica.REPORTES, 'todos'], default='todos', help='Reporte a calcular'
+        )
+        parser.add_argument('--n', type=int, default=10, help='Cantidad de filas a mostrar de cada reporte')
+        parser.add_argument('--desde', type=fecha_desde_texto, help='Incluir ventas desde esta fecha (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=fecha_desde_texto, help='Incluir ventas anteriores a esta fecha (AAAA-MM-DD)')
+        parser.add_argument('--chunk', type=int, default=50000, help='Filas leídas por cada viaje a la base de datos')
+        parser.add_argument(
+            '--verificar', action='store_true',
+            help='Comparar los resultados con agregaciones del ORM (y medir cuánto tardan)',
+        )
+        parser.add_argument('--json', action='store_true', help='Escribir los reportes completos en JSON')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            datos = analitica.ColumnasVentas(options['desde'], options['hasta'], chunk_size=options['chunk'])
+        except ImportError as error:
+            raise CommandError(str(error))
+        carga = time.perf_counter() - inicio
+
+        reportes = analitica.REPORTES if options['reporte'] == 'todos' else [options['reporte']]
+        resultados, tiempos = {}, {}
+        for nombre in reportes:
+            inicio = time.perf_counter()
+            opciones = {'n': options['n']} if nombre == 'top_productos' else {}
+            resultados[nombre] = analitica.calcular(nombre, datos, **opciones)
+            tiempos[nombre] = time.perf_counter() - inicio
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados, cls=DjangoJSONEncoder, ensure_ascii=False, indent=2))
+        else:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{len(datos.venta_id):,} ventas y {len(datos.producto_id):,} líneas cargadas en {carga:.3f}s'
+            ))
+            for nombre, filas in resultados.items():
+                self.stdout.write(self.style.MIGRATE_LABEL(
+                    f'{nombre} ({len(filas):,} filas, {tiempos[nombre] * 1000:.1f} ms)'
+                ))
+                for fila in filas[:options['n']]:
+                    self.stdout.write('  ' + ', '.join(f'{clave}={valor}' for clave, valor in fila.items()))
+
+        if options['verificar']:
+            inicio = time.perf_counter()
+            diferencias = analitica.verificar(datos, options['n'])
+            duracion = time.perf_counter() - inicio
+            self.stdout.write(f'Agregaciones del ORM: {duracion:.3f}s')
+            errores = {nombre: filas for nombre, filas in diferencias.items() if filas}
+            if errores:
+                for nombre, filas in errores.items():
+                    self.stderr.write(f'{nombre}: {len(filas)} diferencias, p. ej. {filas[0]}')
+                raise CommandError('Los reportes no coinciden con el ORM')
+            self.stdout.write(self.style.SUCCESS('Los reportes coinciden con las agregaciones del ORM'))
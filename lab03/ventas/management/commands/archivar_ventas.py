@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+import time
+
+from ventas import archivo
+from ventas.management.commands.exportar_ventas import fecha_desde_texto
+from ventas.models import Venta
+
+
+class Command(BaseCommand):
+    help = 'Mover las ventas anteriores a la fecha de corte (y sus líneas) al archivo, por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses', type=int,
+            help='Archivar lo anterior al inicio del mes de hace N meses (por defecto VENTAS_ARCHIVO_MESES)',
+        )
+        parser.add_argument('--antes', type=fecha_desde_texto, help='Fecha de corte explícita (AAAA-MM-DD)')
+        parser.add_argument('--lote', type=int, default=1000, help='Ventas movidas por transacción')
+        parser.add_argument('--simular', action='store_true', help='Solo contar las ventas que se archivarían')
+
+    def handle(self, *args, **options):
+        corte = options['antes'] or archivo.fecha_corte(options['meses'])
+        pendientes = Venta.objects.filter(fecha__lt=corte).count()
+        self.stdout.write(f'Ventas anteriores a {corte:%Y-%m-%d}: {pendientes:,}')
+        if options['simular'] or not pendientes:
+            return
+
+        inicio = time.perf_counter()
+        resultado = archivo.archivar(corte, lote=options['lote'])
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Archivadas {resultado['ventas']:,} ventas y {resultado['lineas']:,} líneas "
+            f"en {resultado['lotes']:,} lotes ({duracion:.2f}s, base '{archivo.alias_archivo()}')"
+        ))
+        if resultado['rechazadas']:
+            self.stderr.write(
+                f"{len(resultado['rechazadas'])} ventas no se archivaron porque su número de factura "
+                f"ya está en el archivo: {', '.join(resultado['rechazadas'][:20])}"
+            )
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+import statistics
+import time
+
+from ventas import busqueda
+
+
+class Command(BaseCommand):
+    help = 'Comparar la búsqueda con el índice de texto contra icontains'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--terminos', nargs='+',
+            default=['lampara', 'perez', 'gonz', 'deportiva', 'silla ergo', 'CLI00'],
+            help='Consultas a medir',
+        )
+        parser.add_argument('--repeticiones', type=int, default=20, help='Repeticiones por consulta')
+
+    def handle(self, *args, **options):
+        indice = busqueda.backend()
+        if indice is None:
+            raise CommandError('No hay índice de búsqueda en esta base (se necesita SQLite con FTS5 o PostgreSQL)')
+        self.stdout.write(f'Backend: {indice.nombre}')
+        for tipo in ('producto', 'cliente'):
+            modelo = busqueda.MODELOS[tipo]
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{modelo._meta.verbose_name_plural} ({modelo.objects.count():,})'))
+            for termino in options['terminos']:
+                def con_icontains():
+                    queryset = modelo.objects.all()
+                    for palabra in termino.split():
+                        filtro = Q()
+                        for campo in busqueda.CAMPOS[tipo]:
+                            filtro |= Q(**{f'{campo}__icontains': palabra})
+                        queryset = queryset.filter(filtro)
+                    return queryset.count()
+
+                def con_indice():
+                    return modelo.objects.filter(pk__in=indice.subconsulta(tipo, termino)).count()
+
+                def ranking():
+                    # Los 50 más relevantes: lo que muestra una página de búsqueda
+                    return len(indice.buscar(tipo, termino, 50))
+
+                resultados = []
+                for funcion in (con_icontains, con_indice, ranking):
+                    tiempos = []
+                    for _ in range(options['repeticiones']):
+                        inicio = time.perf_counter()
+                        cantidad = funcion()
+                        tiempos.append(time.perf_counter() - inicio)
+                    resultados.append((cantidad, statistics.median(tiempos) * 1000))
+                (cantidad_like, ms_like), (cantidad_indice, ms_indice), (_, ms_ranking) = resultados
+                self.stdout.write(
+                    f'  {termino!r:14} icontains {cantidad_like:>7,} en {ms_like:7.2f} ms   '
+                    f'índice {cantidad_indice:>7,} en {ms_indice:7.2f} ms   top 50 {ms_ranking:7.2f} ms'
+                )
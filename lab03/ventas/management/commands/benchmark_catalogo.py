@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+import random
+import time
+
+from ventas import catalogo
+from ventas.models import Producto
+
+
+class Command(BaseCommand):
+    help = (
+        'Comparar consultas y tiempo al resolver precio, categoría y proveedores de '
+        'las líneas de venta: una consulta por dato contra el catálogo en memoria'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lineas', type=int, default=5000, help='Líneas de venta a resolver')
+
+    def handle(self, *args, **options):
+        ids = list(Producto.objects.values_list('pk', flat=True))
+        if not ids:
+            raise CommandError('No hay productos; ejecute primero poblar_datos')
+        lineas = [random.choice(ids) for _ in range(options['lineas'])]
+
+        def por_consulta():
+            for producto_id in lineas:
+                producto = Producto.objects.get(pk=producto_id)
+                (producto.precio, producto.categoria.nombre, list(producto.proveedores.values_list('pk', flat=True)))
+
+        def con_catalogo():
+            cache = catalogo.obtener_catalogo()
+            for producto_id in lineas:
+                producto = cache.obtener(producto_id)
+                (producto.precio, producto.categoria, producto.proveedores)
+
+        catalogo.reiniciar()
+        for nombre, funcion in (
+            ('Consulta por línea', por_consulta),
+            ('Catálogo (frío)', con_catalogo),
+            ('Catálogo (cargado)', con_catalogo),
+        ):
+            duracion, consultas = self.medir(funcion)
+            self.stdout.write(
+                f'{nombre:19} {len(lineas):,} líneas en {duracion:.3f}s '
+                f'({len(lineas) / duracion:,.0f} líneas/s, {consultas:,} consultas)'
+            )
+        self.stdout.write(f'Catálogo: {catalogo.obtener_catalogo().estadisticas()}')
+
+    def medir(self, funcion):
+        consultas = 0
+
+        def contar(execute, sql, params, many, context):
+            nonlocal consultas
+            consultas += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(contar):
+            inicio = time.perf_counter()
+            funcion()
+            duracion = time.perf_counter() - inicio
+        return duracion, consultas
@@ -0,0 +1,106 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from datetime import timedelta
+import time
+
+from ventas.models import Cliente, Producto, Venta, DetalleVenta
+
+
+class Command(BaseCommand):
+    help = 'Medir las consultas frecuentes de ventas con y sin los índices, mostrando sus planes de ejecución'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poblar',
+            type=int,
+            metavar='ESCALA',
+            help='Poblar datos con poblar_datos --escala ESCALA antes de medir',
+        )
+        parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones por consulta (se informa la mejor)')
+        parser.add_argument('--sin-planes', action='store_true', help='No mostrar los planes EXPLAIN')
+
+    def handle(self, *args, **options):
+        if options['poblar']:
+            call_command('poblar_datos', escala=options['poblar'], stdout=self.stdout)
+        if not Venta.objects.exists():
+            raise CommandError('No hay ventas: ejecute poblar_datos --escala N o use --poblar')
+
+        self.repeticiones = options['repeticiones']
+        self.planes = not options['sin_planes']
+        consultas = self.consultas()
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Con índices'))
+        con_indices = self.medir(consultas)
+
+        # Quitar los índices dentro de una transacción que se revierte
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for modelo in (Cliente, Producto, Venta, DetalleVenta):
+                    for indice in modelo._meta.indexes:
+                        cursor.execute(f'DROP INDEX {connection.ops.quote_name(indice.name)}')
+                cursor.execute('ANALYZE')
+            self.stdout.write(self.style.MIGRATE_HEADING('Sin índices'))
+            sin_indices = self.medir(consultas)
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Resumen'))
+        for nombre in consultas:
+            antes, despues = sin_indices[nombre], con_indices[nombre]
+            self.stdout.write(
+                f'{nombre:34} sin índices {antes * 1000:9.2f} ms   con índices {despues * 1000:9.2f} ms'
+                f'   x{antes / despues if despues else 0:,.1f}'
+            )
+
+    def consultas(self):
+        """Consultas representativas de los listados y reportes de ventas"""
+        venta = Venta.objects.order_by('pk').values('cliente_id', 'fecha').first()
+        producto = DetalleVenta.objects.order_by('pk').values_list('producto_id', flat=True).first()
+        nombre_producto = Producto.objects.order_by('pk').values_list('nombre', flat=True).first()
+        nombre_cliente = Cliente.objects.order_by('pk').values_list('nombre', flat=True).first()
+        desde = venta['fecha'] - timedelta(days=3)
+        hasta = min(venta['fecha'] + timedelta(days=3), timezone.now())
+
+        return {
+            'Ventas por rango de fecha': (
+                Venta.objects.filter(fecha__gte=desde, fecha__lt=hasta).order_by('-fecha')[:100]
+            ),
+            'Total diario en rango de fecha': (
+                Venta.objects.filter(fecha__gte=desde, fecha__lt=hasta)
+                .order_by().values('fecha__date').annotate(total=Sum('monto'))
+            ),
+            'Ventas de un cliente en el tiempo': (
+                Venta.objects.filter(cliente_id=venta['cliente_id'], fecha__gte=desde).order_by('-fecha')[:50]
+            ),
+            'Totales de un producto': (
+                DetalleVenta.objects.filter(producto_id=producto).order_by().values('producto_id')
+                .annotate(cantidad=Sum('cantidad'), monto=Sum('monto_total'), lineas=Count('id'))
+            ),
+            'Productos por nombre': (
+                Producto.objects.filter(nombre__startswith=nombre_producto[:6]).order_by('nombre')[:20]
+            ),
+            'Clientes por nombre': (
+                Cliente.objects.filter(nombre__startswith=nombre_cliente[:4]).order_by('nombre')[:20]
+            ),
+        }
+
+    def medir(self, consultas):
+        tiempos = {}
+        for nombre, queryset in consultas.items():
+            mejor = None
+            for _ in range(self.repeticiones):
+                inicio = time.perf_counter()
+                list(queryset.all())
+                duracion = time.perf_counter() - inicio
+                mejor = duracion if mejor is None else min(mejor, duracion)
+            tiempos[nombre] = mejor
+            self.stdout.write(f'{nombre}: {mejor * 1000:.2f} ms')
+            if self.planes:
+                for linea in queryset.explain().splitlines():
+                    self.stdout.write(f'    {linea}')
+        return tiempos
@@ -0,0 +1,57 @@
+from django.core.paginator import Paginator
+from django.core.management.base import BaseCommand, CommandError
+import time
+
+from ventas.models import DetalleVenta, Venta
+from ventas.paginacion import PaginadorKeyset, codificar_cursor
+
+
+class Command(BaseCommand):
+    help = 'Comparar paginación con OFFSET + COUNT(*) contra paginación por clave en la primera y en una página profunda'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pagina', type=int, default=10000, help='Página profunda a medir')
+        parser.add_argument('--tamano', type=int, default=50, help='Filas por página')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones por medición (se informa la mejor)')
+
+    def handle(self, *args, **options):
+        if not Venta.objects.exists():
+            raise CommandError('No hay ventas: ejecute poblar_datos --escala N')
+        self.repeticiones = options['repeticiones']
+        tamano = options['tamano']
+        for modelo, campos in ((Venta, ('-fecha', '-id')), (DetalleVenta, ('venta_id', 'id'))):
+            queryset = modelo.objects.order_by(*campos)
+            total = queryset.count()
+            # Si no hay tantas filas se mide la última página
+            pagina = max(1, min(options['pagina'], (total - 1) // tamano + 1))
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{modelo._meta.verbose_name_plural}: {total:,} filas, páginas 1 y {pagina:,} de {tamano}'
+            ))
+
+            def offset(numero):
+                paginador = Paginator(queryset, tamano)
+                return len(list(paginador.page(numero).object_list)) and paginador.count
+
+            keyset = PaginadorKeyset(modelo.objects.all(), campos, tamano)
+            cursor = None
+            if pagina > 1:
+                # Cursor de la última fila de la página anterior (se calcula fuera de la medición)
+                anterior = queryset.values(*keyset.campos)[(pagina - 1) * tamano - 1]
+                cursor = codificar_cursor(keyset._clave(anterior))
+
+            for nombre, funcion in (
+                ('OFFSET página 1', lambda: offset(1)),
+                (f'OFFSET página {pagina:,}', lambda: offset(pagina)),
+                ('Keyset página 1', lambda: keyset.pagina()),
+                (f'Keyset página {pagina:,}', lambda: keyset.pagina(cursor)),
+            ):
+                self.stdout.write(f'  {nombre:22} {self.medir(funcion) * 1000:9.2f} ms')
+
+    def medir(self, funcion):
+        mejor = None
+        for _ in range(self.repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            duracion = time.perf_counter() - inicio
+            mejor = duracion if mejor is None else min(mejor, duracion)
+        return mejor
@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Min, Sum
+from concurrent.futures import ThreadPoolExecutor
+import random
+import time
+
+from ventas.models import Categoria, FraccionStock, Producto, ReservaStock
+from ventas.reservas import confirmar, liberar, reservar
+from ventas.stock import StockInsuficiente, fraccionar, stock_total
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de estrés de las reservas de stock: varios hilos reservan, confirman '
+        'y liberan el mismo producto; verifica que no haya sobreventa y mide reservas/s'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos concurrentes')
+        parser.add_argument('--operaciones', type=int, default=200, help='Reservas por hilo')
+        parser.add_argument('--stock', type=int, default=1000, help='Stock inicial del producto de prueba')
+        parser.add_argument('--fracciones', type=int, default=0, help='Repartir el stock en N fracciones')
+        parser.add_argument('--liberar', type=float, default=0.3, help='Proporción de reservas que se liberan')
+
+    def handle(self, *args, **options):
+        categoria = Categoria.objects.create(nombre='Estrés reservas')
+        producto = Producto.objects.create(
+            nombre='Producto estrés', precio=1, stock=options['stock'], categoria=categoria
+        )
+        try:
+            if options['fracciones']:
+                fraccionar(producto.pk, options['fracciones'])
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['hilos']) as executor:
+                resultados = list(executor.map(
+                    lambda _: self.trabajar(producto.pk, options), range(options['hilos'])
+                ))
+            duracion = time.perf_counter() - inicio
+            self.reportar(producto.pk, options['stock'], resultados, duracion)
+        finally:
+            producto.delete()
+            categoria.delete()
+
+    def reintentar(self, funcion, *args):
+        """SQLite responde 'database is locked' cuando hay muchos escritores; se reintenta"""
+        for intento in range(50):
+            try:
+                return funcion(*args), intento
+            except OperationalError:
+                time.sleep(random.uniform(0, 0.01 * (intento + 1)))
+        raise CommandError('Demasiados reintentos por bloqueo de la base de datos')
+
+    def trabajar(self, producto_id, options):
+        conteo = {'reservas': 0, 'rechazadas': 0, 'reintentos': 0}
+        try:
+            for _ in range(options['operaciones']):
+                try:
+                    reserva, reintentos = self.reintentar(reservar, producto_id, random.randint(1, 3))
+                except StockInsuficiente:
+                    conteo['rechazadas'] += 1
+                    continue
+                conteo['reservas'] += 1
+                accion = liberar if random.random() < options['liberar'] else confirmar
+                _, otros = self.reintentar(accion, reserva.pk)
+                conteo['reintentos'] += reintentos + otros
+        finally:
+            connection.close()
+        return conteo
+
+    def reportar(self, producto_id, inicial, resultados, duracion):
+        totales = {clave: sum(r[clave] for r in resultados) for clave in resultados[0]}
+        disponible = stock_total([producto_id])[producto_id]
+        confirmado = ReservaStock.objects.filter(
+            producto_id=producto_id, estado=ReservaStock.CONFIRMADA
+        ).aggregate(total=Sum('cantidad'))['total'] or 0
+        minimo = min(
+            Producto.objects.get(pk=producto_id).stock,
+            FraccionStock.objects.filter(producto_id=producto_id).aggregate(minimo=Min('stock'))['minimo'] or 0,
+        )
+
+        self.stdout.write(
+            f'{totales["reservas"]:,} reservas en {duracion:.2f}s ({totales["reservas"] / duracion:,.0f} reservas/s), '
+            f'{totales["rechazadas"]:,} rechazadas por stock, {totales["reintentos"]:,} reintentos por bloqueo'
+        )
+        self.stdout.write(f'Stock inicial {inicial:,}, vendido {confirmado:,}, disponible {disponible:,}')
+        if minimo < 0 or confirmado + disponible != inicial:
+            raise CommandError('Sobreventa detectada: el stock no cuadra')
+        self.stdout.write(self.style.SUCCESS('Sin sobreventa: vendido + disponible = stock inicial'))
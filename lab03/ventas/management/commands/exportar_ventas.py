@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+import time
+
+from ventas.exportacion import GENERADORES, escribir_parquet, filas_detalle
+from ventas.utils import inicio_del_dia
+
+
+def fecha_desde_texto(valor):
+    """Convierte AAAA-MM-DD en un datetime con zona horaria al inicio del día"""
+    fecha = parse_date(valor)
+    if fecha is None:
+        raise CommandError(f'Fecha inválida: {valor} (formato AAAA-MM-DD)')
+    return inicio_del_dia(fecha)
+
+
+class Command(BaseCommand):
+    help = 'Exportar ventas con sus detalles a CSV, JSON Lines o Parquet en memoria constante'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=['csv', 'jsonl', 'parquet'], default='csv')
+        parser.add_argument(
+            '--salida',
+            help='Archivo de salida (por defecto la salida estándar; obligatorio para parquet)',
+        )
+        parser.add_argument('--desde', type=fecha_desde_texto, help='Incluir ventas desde esta fecha (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=fecha_desde_texto, help='Incluir ventas anteriores a esta fecha (AAAA-MM-DD)')
+        parser.add_argument('--chunk', type=int, default=2000, help='Filas leídas por cada viaje a la base de datos')
+
+    def handle(self, *args, **options):
+        filas = filas_detalle(options['desde'], options['hasta'], chunk_size=options['chunk'])
+        inicio = time.perf_counter()
+
+        if options['formato'] == 'parquet':
+            if not options['salida']:
+                raise CommandError('--salida es obligatorio para el formato parquet')
+            try:
+                total = escribir_parquet(filas, options['salida'])
+            except ImportError as error:
+                raise CommandError(str(error))
+        else:
+            generar = GENERADORES[options['formato']]
+            total = 0
+            if options['salida']:
+                with open(options['salida'], 'w', encoding='utf-8', newline='') as archivo:
+                    for linea in generar(filas):
+                        archivo.write(linea)
+                        total += 1
+            else:
+                for linea in generar(filas):
+                    self.stdout.write(linea, ending='')
+                    total += 1
+
+        if options['salida']:
+            duracion = time.perf_counter() - inicio
+            self.stdout.write(self.style.SUCCESS(
+                f"Exportadas {total} filas/líneas a {options['salida']} en {duracion:.2f}s"
+            ))
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+import csv
+import os
+
+from ventas.importacion import COLUMNAS, ErrorImportacion, importar
+
+
+class Command(BaseCommand):
+    help = 'Importar proveedores, productos o ventas desde CSV o JSON Lines en paralelo y por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=list(COLUMNAS))
+        parser.add_argument('archivo', help='Archivo a importar')
+        parser.add_argument(
+            '--formato',
+            choices=['csv', 'jsonl'],
+            help='Formato del archivo (por defecto según la extensión)',
+        )
+        parser.add_argument('--lote', type=int, default=2000, help='Registros por bloque (y por transacción)')
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Procesos que validan los bloques; 1 valida en el mismo proceso',
+        )
+        parser.add_argument('--errores', help='Guardar todos los errores (línea, mensaje) en este CSV')
+        parser.add_argument('--mostrar', type=int, default=20, help='Errores que se muestran en pantalla')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1 or options['procesos'] < 1:
+            raise CommandError('--lote y --procesos deben ser mayores que cero')
+        formato = options['formato'] or ('jsonl' if options['archivo'].endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        def progreso(resultado):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Bloque {resultado['bloques']}: {resultado['importados']} importados")
+
+        try:
+            with open(options['archivo'], encoding='utf-8', newline='') as archivo:
+                resultado = importar(
+                    archivo, options['tipo'], formato, lote=options['lote'],
+                    procesos=options['procesos'], progreso=progreso,
+                )
+        except (OSError, ErrorImportacion) as error:
+            raise CommandError(str(error))
+
+        errores = resultado['errores']
+        if options['errores']:
+            with open(options['errores'], 'w', encoding='utf-8', newline='') as salida:
+                writer = csv.writer(salida)
+                writer.writerow(['linea', 'error'])
+                writer.writerows(errores)
+        for linea, mensaje in errores[:options['mostrar']]:
+            self.stdout.write(self.style.WARNING(f'Línea {linea}: {mensaje}'))
+        if len(errores) > options['mostrar']:
+            self.stdout.write(self.style.WARNING(f'... y {len(errores) - options["mostrar"]} errores más'))
+
+        segundos = resultado['segundos']
+        velocidad = resultado['leidos'] / segundos if segundos else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Importados {resultado['importados']} de {resultado['leidos']} registros "
+            f"({len(errores)} errores) en {resultado['bloques']} bloques, {segundos:.2f}s "
+            f"({velocidad:,.0f} registros/s; escritura {resultado['escritura']:.2f}s)"
+        ))
+        if resultado['resumenes_reconstruidos']:
+            self.stdout.write('Se reescribieron ventas ya resumidas: resúmenes diarios reconstruidos')
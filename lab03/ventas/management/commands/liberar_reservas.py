@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ventas import reservas
+
+
+class Command(BaseCommand):
+    help = 'Liberar las reservas de stock vencidas y devolver sus unidades (para correr periódicamente)'
+
+    def handle(self, *args, **options):
+        liberadas = reservas.liberar_expiradas()
+        self.stdout.write(self.style.SUCCESS(f'Liberadas {liberadas} reservas vencidas'))
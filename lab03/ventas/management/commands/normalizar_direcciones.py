@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+import time
+
+from ventas import direcciones
+from ventas.models import Cliente, Direccion, Proveedor
+
+
+class Command(BaseCommand):
+    help = (
+        'Normalizar los espacios de calle y número y fusionar las direcciones repetidas '
+        '(clientes y proveedores pasan a la de menor id)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=direcciones.LOTE_CONSULTA,
+            help='Direcciones repetidas reasignadas por UPDATE',
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que cero')
+        inicio = time.perf_counter()
+        normalizadas, fusionadas = direcciones.fusionar_duplicadas(
+            Direccion, [Cliente, Proveedor], lote=options['lote']
+        )
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'Normalizadas {normalizadas} direcciones y fusionadas {fusionadas} repetidas en {duracion:.2f}s'
+        ))
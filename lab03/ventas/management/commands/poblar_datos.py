@@ -1,19 +1,105 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.utils import timezone
 from decimal import Decimal
 import random
-from datetime import datetime, timedelta
+import time
+from datetime import timedelta
 
 from ventas.models import (
+    Ciudad,
+    Comuna,
     Direccion,
     TelefonoCliente,
     Categoria,
     Proveedor,
     Cliente,
     Producto,
+    HistorialPrecio,
     Venta,
-    DetalleVenta
+    DetalleVenta,
+    ResumenCliente
 )
+from ventas import busqueda, direcciones, resumen_clientes
+from ventas.utils import en_lotes, fecha_manual
+
+# Datos base: con --escala 1 se crean exactamente estos registros y con
+# escalas mayores se generan variaciones a partir de ellos.
+DIRECCIONES = [
+    {'calle': 'Av. Libertador', 'numero': '1234', 'comuna': 'Las Condes', 'ciudad': 'Santiago'},
+    {'calle': 'Calle Moneda', 'numero': '567', 'comuna': 'Santiago Centro', 'ciudad': 'Santiago'},
+    {'calle': 'Av. Providencia', 'numero': '890', 'comuna': 'Providencia', 'ciudad': 'Santiago'},
+    {'calle': 'Calle Huérfanos', 'numero': '321', 'comuna': 'Santiago Centro', 'ciudad': 'Santiago'},
+    {'calle': 'Av. Apoquindo', 'numero': '654', 'comuna': 'Las Condes', 'ciudad': 'Santiago'},
+    {'calle': 'Calle Bandera', 'numero': '987', 'comuna': 'Santiago Centro', 'ciudad': 'Santiago'},
+    {'calle': 'Av. Vitacura', 'numero': '147', 'comuna': 'Vitacura', 'ciudad': 'Santiago'},
+    {'calle': 'Calle Estado', 'numero': '258', 'comuna': 'Santiago Centro', 'ciudad': 'Santiago'},
+]
+
+CATEGORIAS = [
+    {'nombre': 'Electrónicos', 'descripcion': 'Dispositivos electrónicos y tecnología'},
+    {'nombre': 'Ropa', 'descripcion': 'Vestimenta y accesorios'},
+    {'nombre': 'Hogar', 'descripcion': 'Artículos para el hogar y decoración'},
+    {'nombre': 'Deportes', 'descripcion': 'Equipamiento deportivo y fitness'},
+    {'nombre': 'Libros', 'descripcion': 'Literatura y material educativo'},
+]
+
+PROVEEDORES = [
+    {'nombre': 'TechnoSupply SpA', 'telefono': '+56912345678', 'web': 'https://technosupply.cl'},
+    {'nombre': 'Distribuidora Central', 'telefono': '+56987654321', 'web': 'https://distcentral.cl'},
+    {'nombre': 'Importadora Global', 'telefono': '+56911223344', 'web': 'https://impglobal.cl'},
+    {'nombre': 'Comercial del Sur', 'telefono': '+56955667788', 'web': 'https://comsur.cl'},
+    {'nombre': 'Mayorista Express', 'telefono': '+56933445566', 'web': 'https://mayexpress.cl'},
+]
+
+CLIENTES = [
+    'Juan Pérez González',
+    'María García López',
+    'Carlos Rodríguez Silva',
+    'Ana Martínez Torres',
+    'Luis Fernández Ruiz',
+    'Carmen Sánchez Morales',
+    'Roberto Díaz Herrera',
+    'Patricia Jiménez Castro',
+    'Miguel Vargas Mendoza',
+    'Isabel Romero Vega',
+]
+
+PRODUCTOS = [
+    {'nombre': 'Smartphone Galaxy S23', 'precio': Decimal('899.99'), 'stock': 25},
+    {'nombre': 'Laptop Dell Inspiron', 'precio': Decimal('1299.99'), 'stock': 15},
+    {'nombre': 'Auriculares Bluetooth', 'precio': Decimal('199.99'), 'stock': 50},
+    {'nombre': 'Camiseta Deportiva', 'precio': Decimal('29.99'), 'stock': 100},
+    {'nombre': 'Pantalón Jeans', 'precio': Decimal('79.99'), 'stock': 75},
+    {'nombre': 'Zapatillas Running', 'precio': Decimal('149.99'), 'stock': 40},
+    {'nombre': 'Mesa de Centro', 'precio': Decimal('299.99'), 'stock': 20},
+    {'nombre': 'Lámpara LED', 'precio': Decimal('89.99'), 'stock': 60},
+    {'nombre': 'Silla Ergonómica', 'precio': Decimal('399.99'), 'stock': 30},
+    {'nombre': 'Libro Python Programming', 'precio': Decimal('49.99'), 'stock': 80},
+    {'nombre': 'Tablet iPad Air', 'precio': Decimal('699.99'), 'stock': 35},
+    {'nombre': 'Reloj Inteligente', 'precio': Decimal('299.99'), 'stock': 45},
+    {'nombre': 'Mochila Deportiva', 'precio': Decimal('59.99'), 'stock': 90},
+    {'nombre': 'Cafetera Automática', 'precio': Decimal('199.99'), 'stock': 25},
+    {'nombre': 'Monitor 24 pulgadas', 'precio': Decimal('349.99'), 'stock': 20},
+]
+
+TELEFONOS = [
+    '+56912345678', '+56987654321', '+56911223344',
+    '+56955667788', '+56933445566', '+56977889900',
+    '+56944556677', '+56966778899', '+56922334455',
+    '+56988776655', '+56999887766', '+56911998877'
+]
+
+VENTAS_POR_ESCALA = 10
+
+CENTAVO = Decimal('0.01')
+
+
+def codigo(prefijo, numero, total, ancho_minimo):
+    """Código correlativo con ceros a la izquierda, p. ej. CLI001"""
+    ancho = max(ancho_minimo, len(str(total)))
+    return f'{prefijo}{str(numero).zfill(ancho)}'
+
 
 class Command(BaseCommand):
     help = 'Poblar la base de datos con datos ficticios para el sistema de ventas'
@@ -24,245 +110,272 @@ class Command(BaseCommand):
             action='store_true',
             help='Limpiar datos existentes antes de poblar',
         )
+        parser.add_argument(
+            '--escala',
+            type=int,
+            default=1,
+            help='Factor de escala: multiplica direcciones, proveedores, clientes, productos y ventas',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=5000,
+            help='Cantidad de filas por cada bulk_create',
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=30,
+            help='Las ventas se reparten en los últimos N días',
+        )
+        parser.add_argument(
+            '--semilla',
+            type=int,
+            help='Semilla aleatoria para obtener siempre los mismos datos',
+        )
 
     def handle(self, *args, **options):
+        escala = options['escala']
+        if escala < 1 or options['lote'] < 1:
+            raise CommandError('--escala y --lote deben ser mayores que cero')
+        self.lote = options['lote']
+        self.dias = options['dias']
+        self.metricas = {}
+        if options['semilla'] is not None:
+            random.seed(options['semilla'])
+
         if options['limpiar']:
             self.stdout.write(self.style.WARNING('Limpiando datos existentes...'))
             self.limpiar_datos()
 
-        self.stdout.write(self.style.SUCCESS('Iniciando población de datos...'))
-        
+        self.stdout.write(self.style.SUCCESS(f'Iniciando población de datos (escala {escala})...'))
+
         with transaction.atomic():
-            # Crear datos en orden de dependencias
-            direcciones = self.crear_direcciones()
+            # Crear datos en orden de dependencias; solo se guardan en memoria
+            # los ids (y precios) necesarios para las relaciones
+            direcciones = self.crear_direcciones(escala)
             categorias = self.crear_categorias()
-            proveedores = self.crear_proveedores(direcciones)
-            clientes = self.crear_clientes(direcciones)
+            proveedores = self.crear_proveedores(escala, direcciones)
+            clientes = self.crear_clientes(escala, direcciones)
             self.crear_telefonos_clientes(clientes)
-            productos = self.crear_productos(categorias, proveedores)
-            ventas = self.crear_ventas(clientes)
-            self.crear_detalles_ventas(ventas, productos)
+            productos = self.crear_productos(escala, categorias, proveedores)
+            self.crear_ventas(escala, clientes, productos)
+            # bulk_create no envía señales: el índice de búsqueda se reconstruye aparte
+            inicio = time.perf_counter()
+            indexados = busqueda.reindexar()
+            self.registrar('Índice de búsqueda', indexados, time.perf_counter() - inicio)
+            inicio = time.perf_counter()
+            resumidos = resumen_clientes.reconstruir()
+            self.registrar('Resumen de clientes', resumidos, time.perf_counter() - inicio)
 
+        self.reportar()
         self.stdout.write(
             self.style.SUCCESS('¡Datos poblados exitosamente!')
         )
 
     def limpiar_datos(self):
         """Eliminar todos los datos existentes"""
-        DetalleVenta.objects.all().delete()
-        Venta.objects.all().delete()
+        ResumenCliente.objects.all().delete()
+        with resumen_clientes.suspendido():
+            DetalleVenta.objects.all().delete()
+            Venta.objects.all().delete()
+        HistorialPrecio.objects.all().delete()
         Producto.objects.all().delete()
         TelefonoCliente.objects.all().delete()
         Cliente.objects.all().delete()
         Proveedor.objects.all().delete()
         Categoria.objects.all().delete()
         Direccion.objects.all().delete()
+        Comuna.objects.all().delete()
+        Ciudad.objects.all().delete()
         self.stdout.write(self.style.SUCCESS('Datos limpiados'))
 
-    def crear_direcciones(self):
-        """Crear direcciones de ejemplo"""
-        direcciones_data = [
-            {'calle': 'Av. Libertador', 'numero': '1234', 'comuna': 'Las Condes', 'ciudad': 'Santiago'},
-            {'calle': 'Calle Moneda', 'numero': '567', 'comuna': 'Santiago Centro', 'ciudad': 'Santiago'},
-            {'calle': 'Av. Providencia', 'numero': '890', 'comuna': 'Providencia', 'ciudad': 'Santiago'},
-            {'calle': 'Calle Huérfanos', 'numero': '321', 'comuna': 'Santiago Centro', 'ciudad': 'Santiago'},
-            {'calle': 'Av. Apoquindo', 'numero': '654', 'comuna': 'Las Condes', 'ciudad': 'Santiago'},
-            {'calle': 'Calle Bandera', 'numero': '987', 'comuna': 'Santiago Centro', 'ciudad': 'Santiago'},
-            {'calle': 'Av. Vitacura', 'numero': '147', 'comuna': 'Vitacura', 'ciudad': 'Santiago'},
-            {'calle': 'Calle Estado', 'numero': '258', 'comuna': 'Santiago Centro', 'ciudad': 'Santiago'},
-        ]
-        
-        direcciones = []
-        for data in direcciones_data:
-            direccion = Direccion.objects.create(**data)
-            direcciones.append(direccion)
-            
-        self.stdout.write(f'Creadas {len(direcciones)} direcciones')
-        return direcciones
+    def insertar(self, modelo, objetos, nombre=None):
+        """Inserta objetos en lotes con bulk_create y registra filas/segundo"""
+        ids = []
+        for lote in en_lotes(objetos, self.lote):
+            inicio = time.perf_counter()
+            creados = modelo.objects.bulk_create(lote, batch_size=self.lote)
+            self.registrar(nombre or modelo.__name__, len(creados), time.perf_counter() - inicio)
+            ids.extend(objeto.pk for objeto in creados)
+        return ids
+
+    def registrar(self, nombre, filas, segundos):
+        acumulado = self.metricas.setdefault(nombre, [0, 0.0])
+        acumulado[0] += filas
+        acumulado[1] += segundos
+
+    def reportar(self):
+        """Muestra filas creadas y filas por segundo de cada modelo"""
+        for nombre, (filas, segundos) in self.metricas.items():
+            velocidad = filas / segundos if segundos else 0
+            self.stdout.write(f'{nombre:22} {filas:>10,} filas {segundos:8.2f}s {velocidad:>12,.0f} filas/s')
+
+    def crear_direcciones(self, escala):
+        """Crear direcciones de ejemplo (internadas: las repetidas se crean una vez)"""
+        def generar():
+            for i in range(len(DIRECCIONES) * escala):
+                data = dict(DIRECCIONES[i % len(DIRECCIONES)])
+                if i >= len(DIRECCIONES):
+                    data['numero'] = str(random.randint(1, 9999))
+                yield data['calle'], data['numero'], data['comuna'], data['ciudad']
+
+        ids = []
+        for lote in en_lotes(dict.fromkeys(generar()), self.lote):
+            inicio = time.perf_counter()
+            internadas = direcciones.internar_varias(lote)
+            self.registrar('Direccion', len(internadas), time.perf_counter() - inicio)
+            ids.extend(internadas[direccion] for direccion in lote)
+        self.stdout.write(f'Creadas {len(ids)} direcciones')
+        return ids
 
     def crear_categorias(self):
         """Crear categorías de productos"""
-        categorias_data = [
-            {'nombre': 'Electrónicos', 'descripcion': 'Dispositivos electrónicos y tecnología'},
-            {'nombre': 'Ropa', 'descripcion': 'Vestimenta y accesorios'},
-            {'nombre': 'Hogar', 'descripcion': 'Artículos para el hogar y decoración'},
-            {'nombre': 'Deportes', 'descripcion': 'Equipamiento deportivo y fitness'},
-            {'nombre': 'Libros', 'descripcion': 'Literatura y material educativo'},
-        ]
-        
-        categorias = []
-        for data in categorias_data:
-            categoria = Categoria.objects.create(**data)
-            categorias.append(categoria)
-            
+        categorias = self.insertar(Categoria, (Categoria(**data) for data in CATEGORIAS))
         self.stdout.write(f'Creadas {len(categorias)} categorías')
         return categorias
 
-    def crear_proveedores(self, direcciones):
+    def crear_proveedores(self, escala, direcciones):
         """Crear proveedores"""
-        proveedores_data = [
-            {'codigo': 'PROV001', 'nombre': 'TechnoSupply SpA', 'telefono': '+56912345678', 'web': 'https://technosupply.cl'},
-            {'codigo': 'PROV002', 'nombre': 'Distribuidora Central', 'telefono': '+56987654321', 'web': 'https://distcentral.cl'},
-            {'codigo': 'PROV003', 'nombre': 'Importadora Global', 'telefono': '+56911223344', 'web': 'https://impglobal.cl'},
-            {'codigo': 'PROV004', 'nombre': 'Comercial del Sur', 'telefono': '+56955667788', 'web': 'https://comsur.cl'},
-            {'codigo': 'PROV005', 'nombre': 'Mayorista Express', 'telefono': '+56933445566', 'web': 'https://mayexpress.cl'},
-        ]
-        
-        proveedores = []
-        for i, data in enumerate(proveedores_data):
-            direccion = random.choice(direcciones)
-            proveedor = Proveedor.objects.create(
-                direccion=direccion,
-                **data
-            )
-            proveedores.append(proveedor)
-            
+        total = len(PROVEEDORES) * escala
+
+        def generar():
+            for i in range(total):
+                data = dict(PROVEEDORES[i % len(PROVEEDORES)])
+                if i >= len(PROVEEDORES):
+                    data['nombre'] = f"{data['nombre']} {i // len(PROVEEDORES) + 1}"
+                yield Proveedor(
+                    codigo=codigo('PROV', i + 1, total, 3),
+                    direccion_id=random.choice(direcciones),
+                    **data
+                )
+
+        proveedores = self.insertar(Proveedor, generar())
         self.stdout.write(f'Creados {len(proveedores)} proveedores')
         return proveedores
 
-    def crear_clientes(self, direcciones):
+    def crear_clientes(self, escala, direcciones):
         """Crear clientes"""
-        clientes_data = [
-            {'codigo': 'CLI001', 'nombre': 'Juan Pérez González'},
-            {'codigo': 'CLI002', 'nombre': 'María García López'},
-            {'codigo': 'CLI003', 'nombre': 'Carlos Rodríguez Silva'},
-            {'codigo': 'CLI004', 'nombre': 'Ana Martínez Torres'},
-            {'codigo': 'CLI005', 'nombre': 'Luis Fernández Ruiz'},
-            {'codigo': 'CLI006', 'nombre': 'Carmen Sánchez Morales'},
-            {'codigo': 'CLI007', 'nombre': 'Roberto Díaz Herrera'},
-            {'codigo': 'CLI008', 'nombre': 'Patricia Jiménez Castro'},
-            {'codigo': 'CLI009', 'nombre': 'Miguel Vargas Mendoza'},
-            {'codigo': 'CLI010', 'nombre': 'Isabel Romero Vega'},
-        ]
-        
-        clientes = []
-        for data in clientes_data:
-            direccion = random.choice(direcciones)
-            cliente = Cliente.objects.create(
-                direccion=direccion,
-                **data
-            )
-            clientes.append(cliente)
-            
+        total = len(CLIENTES) * escala
+        nombres = [nombre.split(' ', 1) for nombre in CLIENTES]
+
+        def generar():
+            for i in range(total):
+                if i < len(CLIENTES):
+                    nombre = CLIENTES[i]
+                else:
+                    # Combinar nombres y apellidos de la lista base
+                    nombre = f'{random.choice(nombres)[0]} {random.choice(nombres)[1]}'
+                yield Cliente(
+                    codigo=codigo('CLI', i + 1, total, 3),
+                    nombre=nombre,
+                    direccion_id=random.choice(direcciones),
+                )
+
+        clientes = self.insertar(Cliente, generar())
         self.stdout.write(f'Creados {len(clientes)} clientes')
         return clientes
 
     def crear_telefonos_clientes(self, clientes):
         """Crear teléfonos para clientes"""
-        telefonos_base = [
-            '+56912345678', '+56987654321', '+56911223344',
-            '+56955667788', '+56933445566', '+56977889900',
-            '+56944556677', '+56966778899', '+56922334455',
-            '+56988776655', '+56999887766', '+56911998877'
-        ]
-        
-        telefonos_creados = 0
-        for cliente in clientes:
-            # Cada cliente tiene entre 1 y 3 teléfonos
-            num_telefonos = random.randint(1, 3)
-            telefonos_cliente = random.sample(telefonos_base, num_telefonos)
-            
-            for telefono in telefonos_cliente:
-                TelefonoCliente.objects.create(
-                    cliente=cliente,
-                    numero=telefono
-                )
-                telefonos_creados += 1
-                
-        self.stdout.write(f'Creados {telefonos_creados} teléfonos')
-
-    def crear_productos(self, categorias, proveedores):
-        """Crear productos"""
-        productos_data = [
-            {'nombre': 'Smartphone Galaxy S23', 'precio': Decimal('899.99'), 'stock': 25},
-            {'nombre': 'Laptop Dell Inspiron', 'precio': Decimal('1299.99'), 'stock': 15},
-            {'nombre': 'Auriculares Bluetooth', 'precio': Decimal('199.99'), 'stock': 50},
-            {'nombre': 'Camiseta Deportiva', 'precio': Decimal('29.99'), 'stock': 100},
-            {'nombre': 'Pantalón Jeans', 'precio': Decimal('79.99'), 'stock': 75},
-            {'nombre': 'Zapatillas Running', 'precio': Decimal('149.99'), 'stock': 40},
-            {'nombre': 'Mesa de Centro', 'precio': Decimal('299.99'), 'stock': 20},
-            {'nombre': 'Lámpara LED', 'precio': Decimal('89.99'), 'stock': 60},
-            {'nombre': 'Silla Ergonómica', 'precio': Decimal('399.99'), 'stock': 30},
-            {'nombre': 'Libro Python Programming', 'precio': Decimal('49.99'), 'stock': 80},
-            {'nombre': 'Tablet iPad Air', 'precio': Decimal('699.99'), 'stock': 35},
-            {'nombre': 'Reloj Inteligente', 'precio': Decimal('299.99'), 'stock': 45},
-            {'nombre': 'Mochila Deportiva', 'precio': Decimal('59.99'), 'stock': 90},
-            {'nombre': 'Cafetera Automática', 'precio': Decimal('199.99'), 'stock': 25},
-            {'nombre': 'Monitor 24 pulgadas', 'precio': Decimal('349.99'), 'stock': 20},
-        ]
-        
-        productos = []
-        for data in productos_data:
-            categoria = random.choice(categorias)
-            producto = Producto.objects.create(
-                categoria=categoria,
-                **data
-            )
-            
-            # Asignar proveedores aleatorios (1-3 proveedores por producto)
-            num_proveedores = random.randint(1, 3)
-            proveedores_producto = random.sample(proveedores, num_proveedores)
-            producto.proveedores.set(proveedores_producto)
-            
-            productos.append(producto)
-            
+        def generar():
+            for cliente_id in clientes:
+                # Cada cliente tiene entre 1 y 3 teléfonos
+                for telefono in random.sample(TELEFONOS, random.randint(1, 3)):
+                    yield TelefonoCliente(cliente_id=cliente_id, numero=telefono)
+
+        telefonos = self.insertar(TelefonoCliente, generar())
+        self.stdout.write(f'Creados {len(telefonos)} teléfonos')
+
+    def crear_productos(self, escala, categorias, proveedores):
+        """Crear productos y asignar sus proveedores en la tabla intermedia"""
+        precios = []
+
+        def generar():
+            for i in range(len(PRODUCTOS) * escala):
+                data = dict(PRODUCTOS[i % len(PRODUCTOS)])
+                if i >= len(PRODUCTOS):
+                    data['nombre'] = f"{data['nombre']} Modelo {i // len(PRODUCTOS) + 1}"
+                    variacion = Decimal(random.randint(80, 120)) / 100
+                    data['precio'] = (data['precio'] * variacion).quantize(CENTAVO)
+                precios.append(data['precio'])
+                yield Producto(categoria_id=random.choice(categorias), **data)
+
+        ids = self.insertar(Producto, generar())
+        productos = list(zip(ids, precios))
+
+        # Precio inicial vigente desde antes de la primera venta generada
+        desde = timezone.now() - timedelta(days=self.dias)
+        self.insertar(
+            HistorialPrecio,
+            (HistorialPrecio(producto_id=producto_id, precio=precio, vigente_desde=desde) for producto_id, precio in productos),
+        )
+
+        # Asignar proveedores aleatorios (1-3 proveedores por producto)
+        Through = Producto.proveedores.through
+        relaciones = (
+            Through(producto_id=producto_id, proveedor_id=proveedor_id)
+            for producto_id in ids
+            for proveedor_id in random.sample(proveedores, min(len(proveedores), random.randint(1, 3)))
+        )
+        self.insertar(Through, relaciones, nombre='Producto.proveedores')
+
         self.stdout.write(f'Creados {len(productos)} productos')
         return productos
 
-    def crear_ventas(self, clientes):
-        """Crear ventas"""
-        ventas = []
-        
-        for i in range(10):
-            # Generar fecha aleatoria en los últimos 30 días
-            fecha_base = datetime.now() - timedelta(days=30)
-            fecha_venta = fecha_base + timedelta(days=random.randint(0, 30))
-            
-            venta = Venta.objects.create(
-                numero_factura=f'FAC{str(i+1).zfill(6)}',
-                cliente=random.choice(clientes),
-                descuento=Decimal(str(random.uniform(0, 15))),  # Descuento 0-15%
-                monto=Decimal('0.00')  # Se calculará después
-            )
-            # Actualizar la fecha manualmente
-            venta.fecha = fecha_venta
-            venta.save()
-            
-            ventas.append(venta)
-            
-        self.stdout.write(f'Creadas {len(ventas)} ventas')
-        return ventas
-
-    def crear_detalles_ventas(self, ventas, productos):
-        """Crear detalles de ventas"""
+    def crear_ventas(self, escala, clientes, productos):
+        """
+        Crear ventas con sus detalles. Por cada lote se generan primero las
+        líneas en memoria para calcular el monto de cada venta, de modo que
+        cada Venta se inserta una sola vez con su fecha y monto definitivos.
+        """
+        total = VENTAS_POR_ESCALA * escala
+        fecha_base = timezone.now() - timedelta(days=self.dias)
+        ventas_creadas = 0
         detalles_creados = 0
-        
-        for venta in ventas:
-            # Cada venta tiene entre 1 y 5 productos
-            num_productos = random.randint(1, 5)
-            productos_venta = random.sample(productos, num_productos)
-            
-            monto_total_venta = Decimal('0.00')
-            
-            for producto in productos_venta:
-                cantidad = random.randint(1, 5)
-                precio_momento = producto.precio
-                monto_total = precio_momento * cantidad
-                
-                DetalleVenta.objects.create(
-                    venta=venta,
-                    producto=producto,
-                    precio_momento=precio_momento,
+
+        for numeros in en_lotes(range(total), self.lote):
+            ventas = []
+            lineas_por_venta = []
+            for i in numeros:
+                # Cada venta tiene entre 1 y 5 productos
+                lineas = []
+                for producto_id, precio in random.sample(productos, min(len(productos), random.randint(1, 5))):
+                    cantidad = random.randint(1, 5)
+                    lineas.append((producto_id, precio, cantidad, precio * cantidad))
+
+                subtotal = sum(linea[3] for linea in lineas)
+                descuento = Decimal(str(random.uniform(0, 15))).quantize(CENTAVO)  # Descuento 0-15%
+                monto = (subtotal - subtotal * descuento / 100).quantize(CENTAVO)
+                fecha = fecha_base + timedelta(
+                    days=random.randint(0, self.dias),
+                    seconds=random.randint(0, 86399),
+                )
+                ventas.append(Venta(
+                    numero_factura=codigo('FAC', i + 1, total, 6),
+                    cliente_id=random.choice(clientes),
+                    descuento=descuento,
+                    monto=monto,
+                    fecha=min(fecha, timezone.now()),
+                ))
+                lineas_por_venta.append(lineas)
+
+            with fecha_manual(Venta):
+                ids = self.insertar(Venta, ventas)
+            detalles = [
+                DetalleVenta(
+                    venta_id=venta_id,
+                    producto_id=producto_id,
+                    precio_momento=precio,
                     cantidad=cantidad,
-                    monto_total=monto_total
+                    monto_total=monto_total,
                 )
-                
-                monto_total_venta += monto_total
-                detalles_creados += 1
-            
-            # Actualizar monto de la venta
-            descuento_monto = monto_total_venta * (venta.descuento / 100)
-            venta.monto = monto_total_venta - descuento_monto
-            venta.save()
-            
-        self.stdout.write(f'Creados {detalles_creados} detalles de venta')
\ No newline at end of file
+                for venta_id, lineas in zip(ids, lineas_por_venta)
+                for producto_id, precio, cantidad, monto_total in lineas
+            ]
+            self.insertar(DetalleVenta, detalles)
+            ventas_creadas += len(ids)
+            detalles_creados += len(detalles)
+
+        self.stdout.write(f'Creadas {ventas_creadas} ventas')
+        self.stdout.write(f'Creados {detalles_creados} detalles de venta')
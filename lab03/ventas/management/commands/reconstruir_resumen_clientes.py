@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+import time
+
+from ventas import resumen_clientes
+
+
+class Command(BaseCommand):
+    help = 'Recalcular desde las ventas (vigentes y archivadas) el resumen de compras de cada cliente'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Cantidad de clientes recalculados por pasada',
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que cero')
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            resumidos = resumen_clientes.reconstruir(lote=options['lote'])
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f'Resumidos {resumidos} clientes en {duracion:.2f}s'))
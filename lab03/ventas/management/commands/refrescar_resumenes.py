@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from datetime import timedelta
+import time
+
+from ventas import resumenes
+from ventas.models import ResumenVentaProducto, ResumenVentaCategoria, ResumenVentaCliente
+
+
+class Command(BaseCommand):
+    help = 'Actualizar los resúmenes diarios de ventas por producto, categoría y cliente'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Vaciar los resúmenes y recalcularlos desde todas las ventas',
+        )
+        parser.add_argument(
+            '--ventana',
+            type=int,
+            default=20000,
+            help='Cantidad de ventas agregadas en cada pasada',
+        )
+        parser.add_argument(
+            '--margen',
+            type=int,
+            default=int(resumenes.MARGEN.total_seconds()),
+            help='Segundos de antigüedad mínima de una venta para incorporarla',
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        procesadas = resumenes.refrescar(
+            completo=options['completo'],
+            ventas_por_ventana=options['ventana'],
+            margen=timedelta(seconds=options['margen']),
+        )
+        duracion = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(f'Incorporadas {procesadas} ventas en {duracion:.2f}s'))
+        for modelo in (ResumenVentaProducto, ResumenVentaCategoria, ResumenVentaCliente):
+            self.stdout.write(f'{modelo._meta.verbose_name_plural}: {modelo.objects.count()} filas')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+import time
+
+from ventas import busqueda
+
+
+class Command(BaseCommand):
+    help = 'Reconstruir el índice de búsqueda de productos, clientes y proveedores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipos', nargs='*', choices=list(busqueda.TIPOS), help='Tipos a reindexar (todos por defecto)')
+
+    def handle(self, *args, **options):
+        if busqueda.backend() is None:
+            self.stdout.write(self.style.WARNING('No hay índice de búsqueda en esta base; se usa icontains'))
+            return
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            total = busqueda.reindexar(options['tipos'] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f'{total:,} objetos indexados en {time.perf_counter() - inicio:.2f}s'
+        ))
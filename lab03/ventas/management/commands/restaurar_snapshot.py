@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+import time
+
+from ventas.snapshot import ErrorSnapshot, restaurar
+
+
+class Command(BaseCommand):
+    help = 'Cargar un snapshot creado con volcar_snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ruta', help='Snapshot a restaurar')
+        parser.add_argument(
+            '--limpiar',
+            action='store_true',
+            help='Borrar antes los datos existentes de ventas',
+        )
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por cada inserción en lote')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que cero')
+        inicio = time.perf_counter()
+        try:
+            filas = restaurar(
+                options['ruta'], lote=options['lote'], limpiar=options['limpiar'],
+                progreso=lambda modelo, cantidad: self.stdout.write(f'{modelo:32} {cantidad:>10,} filas'),
+            )
+        except (OSError, ErrorSnapshot) as error:
+            raise CommandError(str(error))
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f'Restauradas {sum(filas.values()):,} filas en {duracion:.2f}s'))
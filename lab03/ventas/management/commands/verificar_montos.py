@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from decimal import Decimal
+import time
+
+from ventas.models import Venta
+
+
+class Command(BaseCommand):
+    help = 'Verificar que el monto de cada venta coincida con sus detalles y opcionalmente corregirlo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corregir',
+            action='store_true',
+            help='Recalcular en la base de datos el monto de las ventas descuadradas',
+        )
+        parser.add_argument(
+            '--tolerancia',
+            type=Decimal,
+            default=Decimal('0.01'),
+            help='Diferencia máxima aceptada entre el monto guardado y el calculado',
+        )
+        parser.add_argument(
+            '--mostrar',
+            type=int,
+            default=20,
+            help='Cantidad máxima de ventas descuadradas a listar',
+        )
+        parser.add_argument(
+            '--benchmark',
+            type=int,
+            metavar='N',
+            help='Comparar (sin guardar cambios) el recálculo venta por venta contra el UPDATE masivo sobre N ventas',
+        )
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            self.benchmark(options['benchmark'])
+            return
+
+        descuadradas = Venta.objects.con_monto_descuadrado(options['tolerancia'])
+        total = descuadradas.count()
+        if not total:
+            self.stdout.write(self.style.SUCCESS('Todos los montos cuadran con sus detalles'))
+            return
+
+        self.stdout.write(self.style.WARNING(f'{total} ventas con monto descuadrado'))
+        filas = descuadradas.order_by('pk').values_list('numero_factura', 'monto', 'monto_calculado')
+        for numero_factura, monto, calculado in filas[:options['mostrar']]:
+            self.stdout.write(f'  {numero_factura}: guardado {monto}, según detalles {calculado}')
+
+        if options['corregir']:
+            corregidas = Venta.objects.filter(pk__in=descuadradas.values('pk')).recalcular_montos()
+            self.stdout.write(self.style.SUCCESS(f'Corregidas {corregidas} ventas'))
+
+    def benchmark(self, cantidad):
+        """Mide ambos caminos dentro de transacciones que se revierten"""
+        ids = list(Venta.objects.order_by('pk').values_list('pk', flat=True)[:cantidad])
+
+        def medir(funcion):
+            consultas = 0
+
+            def contar(execute, sql, params, many, context):
+                nonlocal consultas
+                consultas += 1
+                return execute(sql, params, many, context)
+
+            with transaction.atomic(), connection.execute_wrapper(contar):
+                inicio = time.perf_counter()
+                funcion()
+                duracion = time.perf_counter() - inicio
+                transaction.set_rollback(True)
+            return duracion, consultas
+
+        def por_instancia():
+            for venta in Venta.objects.filter(pk__in=ids):
+                venta.actualizar_monto()
+
+        def masivo():
+            Venta.objects.filter(pk__in=ids).recalcular_montos()
+
+        for nombre, funcion in (('Venta por venta', por_instancia), ('UPDATE masivo', masivo)):
+            duracion, consultas = medir(funcion)
+            self.stdout.write(
+                f'{nombre:16} {len(ids)} ventas en {duracion:.3f}s '
+                f'({len(ids) / duracion:,.0f} ventas/s, {consultas} consultas)'
+            )
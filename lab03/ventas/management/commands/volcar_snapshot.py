@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+import os
+import time
+
+from ventas.snapshot import ErrorSnapshot, volcar
+
+
+class Command(BaseCommand):
+    help = 'Guardar los datos de ventas en un snapshot binario columnar (ver restaurar_snapshot)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ruta', help='Archivo de salida')
+        parser.add_argument('--chunk', type=int, default=5000, help='Filas leídas por cada viaje a la base de datos')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            filas = volcar(options['ruta'], chunk_size=options['chunk'])
+        except (OSError, ErrorSnapshot) as error:
+            raise CommandError(str(error))
+        duracion = time.perf_counter() - inicio
+        for modelo, cantidad in filas.items():
+            self.stdout.write(f'{modelo:32} {cantidad:>10,} filas')
+        tamano = os.path.getsize(options['ruta'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot de {sum(filas.values()):,} filas ({tamano / 1024 / 1024:.1f} MB) en {duracion:.2f}s"
+        ))
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0002_alter_detalleventa_producto_alter_producto_categoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaResumen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(help_text='Nombre del proceso de resumen', max_length=50, unique=True)),
+                ('ultima_venta_id', models.BigIntegerField(default=0, help_text='Id de la última venta procesada')),
+                ('actualizado', models.DateTimeField(auto_now=True, help_text='Fecha del último refresco')),
+            ],
+            options={
+                'verbose_name': 'Marca de resumen',
+                'verbose_name_plural': 'Marcas de resumen',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenVentaCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(help_text='Día de las ventas')),
+                ('cantidad', models.IntegerField(default=0, help_text='Unidades vendidas en el día')),
+                ('lineas', models.IntegerField(default=0, help_text='Cantidad de líneas de venta del día')),
+                ('monto', models.DecimalField(decimal_places=2, default=0, help_text='Suma de monto_total de las líneas', max_digits=14)),
+                ('categoria', models.ForeignKey(help_text='Categoría de los productos vendidos', on_delete=django.db.models.deletion.CASCADE, to='ventas.categoria')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario por categoría',
+                'verbose_name_plural': 'Resúmenes diarios por categoría',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'categoria'), name='resumen_categoria_dia_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenVentaCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(help_text='Día de las ventas')),
+                ('ventas', models.IntegerField(default=0, help_text='Cantidad de ventas del día')),
+                ('monto', models.DecimalField(decimal_places=2, default=0, help_text='Suma del monto (con descuento) de las ventas', max_digits=14)),
+                ('cliente', models.ForeignKey(help_text='Cliente que realizó las compras', on_delete=django.db.models.deletion.CASCADE, to='ventas.cliente')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario por cliente',
+                'verbose_name_plural': 'Resúmenes diarios por cliente',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'cliente'), name='resumen_cliente_dia_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenVentaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(help_text='Día de las ventas')),
+                ('cantidad', models.IntegerField(default=0, help_text='Unidades vendidas en el día')),
+                ('lineas', models.IntegerField(default=0, help_text='Cantidad de líneas de venta del día')),
+                ('monto', models.DecimalField(decimal_places=2, default=0, help_text='Suma de monto_total de las líneas', max_digits=14)),
+                ('producto', models.ForeignKey(help_text='Producto vendido', on_delete=django.db.models.deletion.CASCADE, to='ventas.producto')),
+            ],
+            options={
+                'verbose_name': 'Resumen diario por producto',
+                'verbose_name_plural': 'Resúmenes diarios por producto',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'producto'), name='resumen_producto_dia_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0003_resumenes_diarios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['nombre'], name='cliente_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='detalleventa',
+            index=models.Index(fields=['producto', 'venta', 'cantidad', 'monto_total'], name='detalle_producto_venta_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['nombre'], name='producto_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['fecha'], name='venta_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['cliente', 'fecha'], name='venta_cliente_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0004_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FraccionStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.PositiveSmallIntegerField(help_text='Número de la fracción')),
+                ('stock', models.IntegerField(default=0, help_text='Unidades disponibles en esta fracción')),
+                ('producto', models.ForeignKey(help_text='Producto al que pertenece la fracción', on_delete=django.db.models.deletion.CASCADE, related_name='fracciones', to='ventas.producto')),
+            ],
+            options={
+                'verbose_name': 'Fracción de stock',
+                'verbose_name_plural': 'Fracciones de stock',
+                'constraints': [models.UniqueConstraint(fields=('producto', 'indice'), name='fraccion_stock_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField(help_text='Unidades reservadas')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmada', 'Confirmada'), ('liberada', 'Liberada'), ('expirada', 'Expirada')], default='pendiente', help_text='Estado de la reserva', max_length=10)),
+                ('creada', models.DateTimeField(auto_now_add=True, help_text='Fecha de la reserva')),
+                ('expira', models.DateTimeField(help_text='Fecha en que la reserva pendiente se libera sola')),
+                ('producto', models.ForeignKey(help_text='Producto reservado', on_delete=django.db.models.deletion.CASCADE, to='ventas.producto')),
+            ],
+            options={
+                'verbose_name': 'Reserva de stock',
+                'verbose_name_plural': 'Reservas de stock',
+                'indexes': [models.Index(fields=['estado', 'expira'], name='reserva_estado_expira_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0005_reservas_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='modificado',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, help_text='Fecha del último cambio (versión para el catálogo en memoria)'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='detalleventa',
+            name='precio_momento',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Precio del producto al momento de la venta (si se deja vacío se usa el precio actual)', max_digits=10),
+        ),
+    ]
@@ -0,0 +1,73 @@
+import unicodedata
+
+from django.db import OperationalError, migrations
+
+TABLA = 'ventas_indice_busqueda'
+TIPOS = {'producto': 1, 'cliente': 2, 'proveedor': 3}
+CAMPOS = {'producto': ('nombre',), 'cliente': ('codigo', 'nombre'), 'proveedor': ('codigo', 'nombre')}
+
+
+def sin_acentos(texto):
+    return ''.join(
+        caracter for caracter in unicodedata.normalize('NFKD', texto)
+        if not unicodedata.combining(caracter)
+    ).casefold()
+
+
+def crear_indice(apps, schema_editor):
+    """
+    Crea la tabla de índice de búsqueda (ver ventas.busqueda) y la llena.
+    En motores sin soporte no se crea nada y la búsqueda usa icontains.
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {TABLA} USING fts5("
+                    f"tipo UNINDEXED, objeto_id UNINDEXED, texto, "
+                    f"tokenize='unicode61 remove_diacritics 2')"
+                )
+            except OperationalError:
+                # SQLite compilado sin FTS5
+                return
+            insertar = f'INSERT INTO {TABLA} (rowid, tipo, objeto_id, texto) VALUES (%s, %s, %s, %s)'
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'CREATE TABLE {TABLA} (tipo varchar(10) NOT NULL, objeto_id bigint NOT NULL, '
+                f'texto text NOT NULL, documento tsvector NOT NULL, PRIMARY KEY (tipo, objeto_id))'
+            )
+            cursor.execute(f'CREATE INDEX {TABLA}_documento ON {TABLA} USING gin (documento)')
+            insertar = (
+                f"INSERT INTO {TABLA} (tipo, objeto_id, texto, documento) "
+                f"VALUES (%s, %s, %s, to_tsvector('simple', %s))"
+            )
+        else:
+            return
+
+        for tipo, campos in CAMPOS.items():
+            modelo = apps.get_model('ventas', tipo)
+            filas = []
+            for objeto_id, *valores in modelo.objects.values_list('pk', *campos).iterator():
+                texto = ' '.join(valores)
+                if connection.vendor == 'sqlite':
+                    filas.append((objeto_id * 4 + TIPOS[tipo], tipo, objeto_id, texto))
+                else:
+                    filas.append((tipo, objeto_id, texto, sin_acentos(texto)))
+            cursor.executemany(insertar, filas)
+
+
+def borrar_indice(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLA}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0006_producto_modificado'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
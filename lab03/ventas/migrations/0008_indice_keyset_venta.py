@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0007_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='venta',
+            name='venta_fecha_idx',
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['fecha', 'id'], name='venta_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0008_indice_keyset_venta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenMensualArchivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes', unique=True)),
+                ('ventas', models.IntegerField(default=0, help_text='Cantidad de ventas archivadas del mes')),
+                ('lineas', models.IntegerField(default=0, help_text='Cantidad de líneas de venta')),
+                ('unidades', models.IntegerField(default=0, help_text='Unidades vendidas')),
+                ('bruto', models.DecimalField(decimal_places=2, default=0, help_text='Suma de monto_total de las líneas', max_digits=14)),
+                ('monto', models.DecimalField(decimal_places=2, default=0, help_text='Suma del monto (con descuento) de las ventas', max_digits=14)),
+                ('actualizado', models.DateTimeField(auto_now=True, help_text='Último archivado que modificó el mes')),
+            ],
+            options={
+                'verbose_name': 'Resumen mensual archivado',
+                'verbose_name_plural': 'Resúmenes mensuales archivados',
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(help_text='Id que tenía la venta original', primary_key=True, serialize=False)),
+                ('numero_factura', models.CharField(help_text='Número único de factura', max_length=20, unique=True)),
+                ('fecha', models.DateTimeField(help_text='Fecha y hora de la venta')),
+                ('mes', models.DateField(help_text='Primer día del mes de la venta (partición del archivo)')),
+                ('cliente_id', models.BigIntegerField(help_text='Id del cliente que realizó la compra')),
+                ('descuento', models.DecimalField(decimal_places=2, default=0, help_text='Descuento aplicado en porcentaje', max_digits=5)),
+                ('monto', models.DecimalField(decimal_places=2, help_text='Monto total de la venta', max_digits=10)),
+                ('archivada', models.DateTimeField(auto_now_add=True, help_text='Fecha en que se archivó')),
+            ],
+            options={
+                'verbose_name': 'Venta archivada',
+                'verbose_name_plural': 'Ventas archivadas',
+                'indexes': [models.Index(fields=['mes', 'id'], name='venta_archivada_mes_idx'), models.Index(fields=['cliente_id', 'fecha'], name='venta_archivada_cliente_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DetalleVentaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(help_text='Id que tenía la línea original', primary_key=True, serialize=False)),
+                ('producto_id', models.BigIntegerField(help_text='Id del producto vendido')),
+                ('precio_momento', models.DecimalField(decimal_places=2, help_text='Precio del producto al momento de la venta', max_digits=10)),
+                ('cantidad', models.IntegerField(help_text='Cantidad de productos vendidos')),
+                ('monto_total', models.DecimalField(decimal_places=2, help_text='Monto total de esta línea', max_digits=10)),
+                ('venta', models.ForeignKey(help_text='Venta archivada a la que pertenece este detalle', on_delete=django.db.models.deletion.CASCADE, related_name='detalleventa_set', to='ventas.ventaarchivada')),
+            ],
+            options={
+                'verbose_name': 'Detalle de venta archivada',
+                'verbose_name_plural': 'Detalles de ventas archivadas',
+            },
+        ),
+    ]
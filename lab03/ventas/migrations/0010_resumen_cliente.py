@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0009_archivo_ventas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCliente',
+            fields=[
+                ('cliente', models.OneToOneField(help_text='Cliente resumido', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='ventas.cliente')),
+                ('ventas', models.IntegerField(default=0, help_text='Cantidad de ventas del cliente')),
+                ('monto_total', models.DecimalField(decimal_places=2, default=0, help_text='Suma del monto de sus ventas', max_digits=14)),
+                ('primera_compra', models.DateTimeField(blank=True, help_text='Fecha de la primera venta', null=True)),
+                ('ultima_compra', models.DateTimeField(blank=True, help_text='Fecha de la venta más reciente', null=True)),
+                ('actualizado', models.DateTimeField(auto_now=True, help_text='Última actualización')),
+                ('categoria_favorita', models.ForeignKey(blank=True, help_text='Categoría en la que más gastó', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ventas.categoria')),
+            ],
+            options={
+                'verbose_name': 'Resumen de cliente',
+                'verbose_name_plural': 'Resúmenes de clientes',
+                'indexes': [models.Index(fields=['monto_total'], name='resumen_cliente_monto_idx'), models.Index(fields=['ultima_compra'], name='resumen_cliente_ultima_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0010_resumen_cliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ciudad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(help_text='Nombre de la ciudad', max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name': 'Ciudad',
+                'verbose_name_plural': 'Ciudades',
+            },
+        ),
+        migrations.CreateModel(
+            name='Comuna',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(help_text='Nombre de la comuna', max_length=100)),
+                ('ciudad', models.ForeignKey(help_text='Ciudad de la comuna', on_delete=django.db.models.deletion.PROTECT, related_name='comunas', to='ventas.ciudad')),
+            ],
+            options={
+                'verbose_name': 'Comuna',
+                'verbose_name_plural': 'Comunas',
+                'constraints': [models.UniqueConstraint(fields=('ciudad', 'nombre'), name='comuna_unica_por_ciudad')],
+            },
+        ),
+        # Los textos se conservan hasta que 0012 los pase a Comuna y Ciudad
+        migrations.RenameField(
+            model_name='direccion',
+            old_name='comuna',
+            new_name='comuna_texto',
+        ),
+        migrations.RenameField(
+            model_name='direccion',
+            old_name='ciudad',
+            new_name='ciudad_texto',
+        ),
+        migrations.AddField(
+            model_name='direccion',
+            name='comuna',
+            field=models.ForeignKey(help_text='Comuna', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='direcciones', to='ventas.comuna'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+from django.db import migrations, transaction
+from django.db.models import Case, Value, When
+
+# Copias de ventas.utils y ventas.direcciones al momento de esta migración:
+# cambiar esos módulos no debe cambiar lo que hace una migración ya aplicada
+LOTE = 300
+
+
+def normalizar(texto):
+    return ' '.join(str(texto).split())
+
+
+def en_lotes(iterable, tamano):
+    lote = []
+    for elemento in iterable:
+        lote.append(elemento)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def fusionar_duplicadas(direccion, referencias, using):
+    """
+    Normaliza calle y número y deja una fila por (calle, numero, comuna): las
+    referencias pasan a la de menor id y las demás se borran.
+    """
+    canonicas = {}
+    reemplazos = {}
+    normalizadas = []
+    filas = direccion.objects.using(using).order_by('pk').values_list('pk', 'calle', 'numero', 'comuna_id')
+    for pk, calle, numero, comuna_id in filas.iterator():
+        llave = (normalizar(calle), normalizar(numero), comuna_id)
+        if llave in canonicas:
+            reemplazos[pk] = canonicas[llave]
+            continue
+        canonicas[llave] = pk
+        if (calle, numero) != llave[:2]:
+            normalizadas.append(direccion(pk=pk, calle=llave[0], numero=llave[1], comuna_id=comuna_id))
+
+    with transaction.atomic(using=using):
+        for grupo in en_lotes(reemplazos.items(), LOTE):
+            duplicadas = [duplicada for duplicada, _ in grupo]
+            nueva = Case(*(When(direccion_id=duplicada, then=Value(canonica)) for duplicada, canonica in grupo))
+            for modelo in referencias:
+                modelo.objects.using(using).filter(direccion_id__in=duplicadas).update(direccion_id=nueva)
+            direccion.objects.using(using).filter(pk__in=duplicadas).delete()
+        direccion.objects.using(using).bulk_update(normalizadas, ['calle', 'numero'], batch_size=LOTE)
+
+
+def internar(apps, schema_editor):
+    """
+    Pasa los textos de comuna y ciudad a Comuna y Ciudad (un UPDATE por par
+    distinto, no por dirección) y fusiona las direcciones repetidas.
+    """
+    alias = schema_editor.connection.alias
+    Ciudad = apps.get_model('ventas', 'Ciudad')
+    Comuna = apps.get_model('ventas', 'Comuna')
+    Direccion = apps.get_model('ventas', 'Direccion')
+    direcciones = Direccion.objects.using(alias)
+
+    pares = list(direcciones.values_list('comuna_texto', 'ciudad_texto').distinct().order_by())
+    ciudades = {}
+    for nombre in sorted({normalizar(ciudad) for _, ciudad in pares}):
+        ciudades[nombre] = Ciudad.objects.using(alias).create(nombre=nombre).pk
+    comunas = {}
+    for comuna, ciudad in pares:
+        llave = (normalizar(comuna), normalizar(ciudad))
+        if llave not in comunas:
+            comunas[llave] = Comuna.objects.using(alias).create(nombre=llave[0], ciudad_id=ciudades[llave[1]]).pk
+        direcciones.filter(comuna_texto=comuna, ciudad_texto=ciudad).update(comuna_id=comunas[llave])
+
+    fusionar_duplicadas(
+        Direccion,
+        [apps.get_model('ventas', 'Cliente'), apps.get_model('ventas', 'Proveedor')],
+        using=alias,
+    )
+
+
+def restaurar_textos(apps, schema_editor):
+    """Vuelve a copiar los nombres en cada dirección (las fusionadas no se separan)"""
+    alias = schema_editor.connection.alias
+    Comuna = apps.get_model('ventas', 'Comuna')
+    Direccion = apps.get_model('ventas', 'Direccion')
+    for pk, comuna, ciudad in Comuna.objects.using(alias).values_list('pk', 'nombre', 'ciudad__nombre'):
+        Direccion.objects.using(alias).filter(comuna_id=pk).update(comuna_texto=comuna, ciudad_texto=ciudad)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0011_ciudad_comuna'),
+    ]
+
+    operations = [
+        migrations.RunPython(internar, restaurar_textos),
+    ]
@@ -0,0 +1,29 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0012_internar_direcciones'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='direccion',
+            name='comuna_texto',
+        ),
+        migrations.RemoveField(
+            model_name='direccion',
+            name='ciudad_texto',
+        ),
+        migrations.AlterField(
+            model_name='direccion',
+            name='comuna',
+            field=models.ForeignKey(help_text='Comuna', on_delete=django.db.models.deletion.PROTECT, related_name='direcciones', to='ventas.comuna'),
+        ),
+        migrations.AddConstraint(
+            model_name='direccion',
+            constraint=models.UniqueConstraint(fields=('calle', 'numero', 'comuna'), name='direccion_unica'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def reconstruir_historial(apps, schema_editor):
+    """
+    Reconstruye los cambios de precio pasados desde las líneas de venta (el
+    único registro que había): por producto, en orden de fecha, una fila cada
+    vez que cambia ``precio_momento``, y al final el precio actual si difiere.
+    Las ventas del archivo (otra base) no se leen.
+    """
+    alias = schema_editor.connection.alias
+    HistorialPrecio = apps.get_model('ventas', 'HistorialPrecio')
+    DetalleVenta = apps.get_model('ventas', 'DetalleVenta')
+    Producto = apps.get_model('ventas', 'Producto')
+
+    pendientes = []
+
+    def agregar(producto_id, precio, desde):
+        pendientes.append(HistorialPrecio(producto_id=producto_id, precio=precio, vigente_desde=desde))
+        if len(pendientes) >= 1000:
+            HistorialPrecio.objects.using(alias).bulk_create(pendientes)
+            pendientes.clear()
+
+    ultimos = {}
+    lineas = DetalleVenta.objects.using(alias).order_by('producto_id', 'venta__fecha', 'pk').values_list(
+        'producto_id', 'venta__fecha', 'precio_momento'
+    )
+    for producto_id, fecha, precio in lineas.iterator(chunk_size=5000):
+        anterior = ultimos.get(producto_id)
+        if anterior is None or anterior[0] != precio:
+            agregar(producto_id, precio, fecha)
+        ultimos[producto_id] = (precio, fecha)
+
+    for producto_id, precio, modificado in Producto.objects.using(alias).values_list('pk', 'precio', 'modificado').iterator():
+        anterior = ultimos.get(producto_id)
+        if anterior is None or anterior[0] != precio:
+            agregar(producto_id, precio, modificado if anterior is None else max(modificado, anterior[1]))
+    HistorialPrecio.objects.using(alias).bulk_create(pendientes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0013_direccion_unica'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='detalleventa',
+            name='precio_momento',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Precio del producto al momento de la venta (si se deja vacío se toma del historial de precios)', max_digits=10),
+        ),
+        migrations.CreateModel(
+            name='HistorialPrecio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio', models.DecimalField(decimal_places=2, help_text='Precio desde esa fecha', max_digits=10)),
+                ('vigente_desde', models.DateTimeField(help_text='Desde cuándo rige el precio')),
+                ('producto', models.ForeignKey(db_index=False, help_text='Producto', on_delete=django.db.models.deletion.CASCADE, related_name='historial_precios', to='ventas.producto')),
+            ],
+            options={
+                'verbose_name': 'Historial de precio',
+                'verbose_name_plural': 'Historial de precios',
+                'indexes': [models.Index(fields=['producto', 'vigente_desde'], name='historial_precio_vigencia_idx')],
+            },
+        ),
+        migrations.RunPython(reconstruir_historial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0014_historial_precio'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cliente',
+            name='direccion',
+            field=models.ForeignKey(help_text='Dirección del cliente', on_delete=django.db.models.deletion.PROTECT, to='ventas.direccion'),
+        ),
+        migrations.AlterField(
+            model_name='proveedor',
+            name='direccion',
+            field=models.ForeignKey(help_text='Dirección del proveedor', on_delete=django.db.models.deletion.PROTECT, to='ventas.direccion'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0015_direccion_protegida'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='detalleventa',
+            name='producto',
+            field=models.ForeignKey(db_index=False, help_text='Producto vendido', on_delete=django.db.models.deletion.PROTECT, to='ventas.producto'),
+        ),
+        migrations.AlterField(
+            model_name='venta',
+            name='cliente',
+            field=models.ForeignKey(db_index=False, help_text='Cliente que realiza la compra', on_delete=django.db.models.deletion.CASCADE, to='ventas.cliente'),
+        ),
+    ]
@@ -1,22 +1,69 @@
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Abs, Coalesce, Round
+from decimal import Decimal
+
+from .utils import normalizar_espacios
 
 # Create your models here.
 
+class Ciudad(models.Model):
+    """
+    Ciudades de las direcciones (cada nombre una sola vez)
+    """
+    nombre = models.CharField(max_length=100, unique=True, help_text="Nombre de la ciudad")
+
+    def __str__(self):
+        return self.nombre
+
+    class Meta:
+        verbose_name = "Ciudad"
+        verbose_name_plural = "Ciudades"
+
+
+class Comuna(models.Model):
+    """
+    Comunas de cada ciudad (cada par comuna-ciudad una sola vez)
+    """
+    nombre = models.CharField(max_length=100, help_text="Nombre de la comuna")
+    ciudad = models.ForeignKey(Ciudad, on_delete=models.PROTECT, related_name='comunas', help_text="Ciudad de la comuna")
+
+    def __str__(self):
+        return self.nombre
+
+    class Meta:
+        verbose_name = "Comuna"
+        verbose_name_plural = "Comunas"
+        constraints = [
+            models.UniqueConstraint(fields=['ciudad', 'nombre'], name='comuna_unica_por_ciudad'),
+        ]
+
+
 class Direccion(models.Model):
     """
-    Modelo para almacenar direcciones de clientes y proveedores
+    Modelo para almacenar direcciones de clientes y proveedores.
+    Cada dirección existe una sola vez (ver ventas.direcciones): clientes y
+    proveedores en la misma dirección comparten la fila.
     """
     calle = models.CharField(max_length=200, help_text="Nombre de la calle")
     numero = models.CharField(max_length=10, help_text="Número de la dirección")
-    comuna = models.CharField(max_length=100, help_text="Comuna")
-    ciudad = models.CharField(max_length=100, help_text="Ciudad")
+    comuna = models.ForeignKey(Comuna, on_delete=models.PROTECT, related_name='direcciones', help_text="Comuna")
     
+    def clean(self):
+        # Igual que al internar: variantes con espacios de más son la misma dirección
+        self.calle = normalizar_espacios(self.calle)
+        self.numero = normalizar_espacios(self.numero)
+
     def __str__(self):
-        return f"{self.calle} {self.numero}, {self.comuna}, {self.ciudad}"
+        # Usar select_related('comuna__ciudad') al listar direcciones
+        return f"{self.calle} {self.numero}, {self.comuna.nombre}, {self.comuna.ciudad.nombre}"
     
     class Meta:
         verbose_name = "Dirección"
         verbose_name_plural = "Direcciones"
+        constraints = [
+            models.UniqueConstraint(fields=['calle', 'numero', 'comuna'], name='direccion_unica'),
+        ]
 
 
 class TelefonoCliente(models.Model):
@@ -55,7 +102,8 @@ class Proveedor(models.Model):
     """
     codigo = models.CharField(max_length=10, unique=True, help_text="Código único del proveedor")
     nombre = models.CharField(max_length=100, help_text="Nombre del proveedor")
-    direccion = models.ForeignKey(Direccion, on_delete=models.CASCADE, help_text="Dirección del proveedor")
+    # Las direcciones se comparten: borrar una no debe arrastrar a nadie
+    direccion = models.ForeignKey(Direccion, on_delete=models.PROTECT, help_text="Dirección del proveedor")
     telefono = models.CharField(max_length=15, help_text="Teléfono del proveedor")
     web = models.URLField(blank=True, help_text="Página web del proveedor")
     
@@ -73,7 +121,8 @@ class Cliente(models.Model):
     """
     codigo = models.CharField(max_length=10, unique=True, help_text="Código único del cliente")
     nombre = models.CharField(max_length=100, help_text="Nombre del cliente")
-    direccion = models.ForeignKey(Direccion, on_delete=models.CASCADE, help_text="Dirección del cliente")
+    # Las direcciones se comparten: borrar una no debe arrastrar a nadie
+    direccion = models.ForeignKey(Direccion, on_delete=models.PROTECT, help_text="Dirección del cliente")
     
     def __str__(self):
         return f"{self.codigo} - {self.nombre}"
@@ -81,6 +130,10 @@ class Cliente(models.Model):
     class Meta:
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
+        indexes = [
+            # Búsquedas y orden por nombre
+            models.Index(fields=['nombre'], name='cliente_nombre_idx'),
+        ]
 
 
 class Producto(models.Model):
@@ -92,6 +145,7 @@ class Producto(models.Model):
     stock = models.IntegerField(help_text="Cantidad disponible en inventario")
     categoria = models.ForeignKey(Categoria, on_delete=models.PROTECT, help_text="Categoría del producto")
     proveedores = models.ManyToManyField(Proveedor, help_text="Proveedores que suministran este producto")
+    modificado = models.DateTimeField(auto_now=True, db_index=True, help_text="Fecha del último cambio (versión para el catálogo en memoria)")
     
     def __str__(self):
         return f"{self.nombre} - ${self.precio}"
@@ -99,6 +153,122 @@ class Producto(models.Model):
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
+        indexes = [
+            # Búsquedas y orden por nombre
+            models.Index(fields=['nombre'], name='producto_nombre_idx'),
+        ]
+
+
+class HistorialPrecio(models.Model):
+    """
+    Precios que tuvo cada producto: una fila por cambio, vigente desde
+    ``vigente_desde`` hasta la fila siguiente del mismo producto. La última
+    coincide con Producto.precio.
+    """
+    # Sin índice propio: lo cubre el índice (producto, vigente_desde)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, db_index=False, related_name='historial_precios', help_text="Producto")
+    precio = models.DecimalField(max_digits=10, decimal_places=2, help_text="Precio desde esa fecha")
+    vigente_desde = models.DateTimeField(help_text="Desde cuándo rige el precio")
+
+    def __str__(self):
+        return f"{self.producto_id} - ${self.precio} desde {self.vigente_desde:%Y-%m-%d %H:%M}"
+
+    class Meta:
+        verbose_name = "Historial de precio"
+        verbose_name_plural = "Historial de precios"
+        indexes = [
+            # Precio vigente en una fecha: búsqueda por índice del último
+            # vigente_desde <= fecha del producto, sin recorrer su historial
+            models.Index(fields=['producto', 'vigente_desde'], name='historial_precio_vigencia_idx'),
+        ]
+
+
+class FraccionStock(models.Model):
+    """
+    Parte del stock de un producto muy vendido.
+    El stock se reparte en varias filas para que las ventas simultáneas
+    actualicen filas distintas; el stock total es la suma de las fracciones
+    más Producto.stock.
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='fracciones', help_text="Producto al que pertenece la fracción")
+    indice = models.PositiveSmallIntegerField(help_text="Número de la fracción")
+    stock = models.IntegerField(default=0, help_text="Unidades disponibles en esta fracción")
+
+    def __str__(self):
+        return f"{self.producto_id} - fracción {self.indice}: {self.stock}"
+
+    class Meta:
+        verbose_name = "Fracción de stock"
+        verbose_name_plural = "Fracciones de stock"
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'indice'], name='fraccion_stock_unica'),
+        ]
+
+
+class ReservaStock(models.Model):
+    """
+    Unidades apartadas para una venta en curso.
+    El stock se descuenta al reservar; al confirmar la reserva queda como
+    venta y al liberarla (o al expirar) las unidades vuelven al producto.
+    """
+    PENDIENTE = 'pendiente'
+    CONFIRMADA = 'confirmada'
+    LIBERADA = 'liberada'
+    EXPIRADA = 'expirada'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (CONFIRMADA, 'Confirmada'),
+        (LIBERADA, 'Liberada'),
+        (EXPIRADA, 'Expirada'),
+    ]
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, help_text="Producto reservado")
+    cantidad = models.IntegerField(help_text="Unidades reservadas")
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDIENTE, help_text="Estado de la reserva")
+    creada = models.DateTimeField(auto_now_add=True, help_text="Fecha de la reserva")
+    expira = models.DateTimeField(help_text="Fecha en que la reserva pendiente se libera sola")
+
+    def __str__(self):
+        return f"Reserva {self.pk} - producto {self.producto_id} (x{self.cantidad}, {self.estado})"
+
+    class Meta:
+        verbose_name = "Reserva de stock"
+        verbose_name_plural = "Reservas de stock"
+        indexes = [
+            # Búsqueda de reservas pendientes vencidas
+            models.Index(fields=['estado', 'expira'], name='reserva_estado_expira_idx'),
+        ]
+
+
+class VentaQuerySet(models.QuerySet):
+    """
+    Operaciones sobre montos de ventas resueltas en la base de datos
+    """
+
+    def _monto_calculado(self):
+        """Expresión: suma de las líneas de la venta menos el descuento, redondeada a 2 decimales"""
+        subtotal = DetalleVenta.objects.filter(venta=OuterRef('pk')).order_by().values('venta').annotate(
+            total=Sum('monto_total')
+        ).values('total')
+        monto = Coalesce(Subquery(subtotal), Value(Decimal('0'))) * (Value(100) - F('descuento')) / Value(100)
+        return Round(monto, 2, output_field=models.DecimalField(max_digits=10, decimal_places=2))
+
+    def con_monto_calculado(self):
+        """Anota cada venta con monto_calculado a partir de sus detalles"""
+        return self.annotate(monto_calculado=self._monto_calculado())
+
+    def recalcular_montos(self):
+        """Corrige el monto de todas las ventas del queryset con un solo UPDATE"""
+        return self.update(monto=self._monto_calculado())
+
+    def con_monto_descuadrado(self, tolerancia=Decimal('0.01')):
+        """
+        Ventas cuyo monto guardado difiere de sus líneas en más de ``tolerancia``.
+        La tolerancia absorbe diferencias de redondeo de un centavo.
+        """
+        return self.con_monto_calculado().annotate(
+            diferencia=Round(Abs(F('monto') - F('monto_calculado')), 2)
+        ).filter(diferencia__gt=tolerancia)
 
 
 class Venta(models.Model):
@@ -107,21 +277,23 @@ class Venta(models.Model):
     """
     numero_factura = models.CharField(max_length=20, unique=True, help_text="Número único de factura")
     fecha = models.DateTimeField(auto_now_add=True, help_text="Fecha y hora de la venta")
-    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, help_text="Cliente que realiza la compra")
+    # Sin índice propio: lo cubre el índice (cliente, fecha)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, db_index=False, help_text="Cliente que realiza la compra")
     descuento = models.DecimalField(max_digits=5, decimal_places=2, default=0, help_text="Descuento aplicado en porcentaje")
     monto = models.DecimalField(max_digits=10, decimal_places=2, help_text="Monto total de la venta")
     
+    objects = VentaQuerySet.as_manager()
+    
     def calcular_monto_total(self):
-        """Calcula el monto total basado en los detalles de venta"""
-        from decimal import Decimal
-        subtotal = sum(detalle.monto_total for detalle in self.detalleventa_set.all())
+        """Calcula el monto total basado en los detalles de venta (suma en la base de datos)"""
+        subtotal = self.detalleventa_set.aggregate(total=Sum('monto_total'))['total'] or Decimal('0')
         descuento_aplicado = subtotal * (self.descuento / Decimal('100'))
         return subtotal - descuento_aplicado
     
     def actualizar_monto(self):
         """Actualiza el monto de la venta basado en los detalles"""
         self.monto = self.calcular_monto_total()
-        self.save()
+        self.save(update_fields=['monto'])
     
     def __str__(self):
         return f"Factura {self.numero_factura} - {self.cliente.nombre}"
@@ -129,6 +301,13 @@ class Venta(models.Model):
     class Meta:
         verbose_name = "Venta"
         verbose_name_plural = "Ventas"
+        indexes = [
+            # Ventas por rango de fechas (date_hierarchy, reportes); con el id
+            # también sirve a la paginación por clave (fecha, id)
+            models.Index(fields=['fecha', 'id'], name='venta_fecha_idx'),
+            # Ventas de un cliente a lo largo del tiempo
+            models.Index(fields=['cliente', 'fecha'], name='venta_cliente_fecha_idx'),
+        ]
 
 
 class DetalleVenta(models.Model):
@@ -137,13 +316,20 @@ class DetalleVenta(models.Model):
     Actúa como tabla intermedia entre Venta y Producto con información adicional
     """
     venta = models.ForeignKey(Venta, on_delete=models.CASCADE, help_text="Venta a la que pertenece este detalle")
-    producto = models.ForeignKey(Producto, on_delete=models.PROTECT, help_text="Producto vendido")
-    precio_momento = models.DecimalField(max_digits=10, decimal_places=2, help_text="Precio del producto al momento de la venta")
+    # Sin índice propio: lo cubre el índice (producto, venta, cantidad, monto_total)
+    producto = models.ForeignKey(Producto, on_delete=models.PROTECT, db_index=False, help_text="Producto vendido")
+    precio_momento = models.DecimalField(max_digits=10, decimal_places=2, blank=True, help_text="Precio del producto al momento de la venta (si se deja vacío se toma del historial de precios)")
     cantidad = models.IntegerField(help_text="Cantidad de productos vendidos")
     monto_total = models.DecimalField(max_digits=10, decimal_places=2, help_text="Monto total de esta línea (precio_momento * cantidad)")
     
     def save(self, *args, **kwargs):
         """Calcula automáticamente el monto_total antes de guardar"""
+        if self.precio_momento is None:
+            # Precio vigente a la fecha de la venta (el actual si no se conoce)
+            # desde el catálogo en memoria, sin consultar el producto ni el historial
+            from .catalogo import obtener_catalogo
+            fecha = self.venta.fecha if DetalleVenta.venta.is_cached(self) else None
+            self.precio_momento = obtener_catalogo().precio_en(self.producto_id, fecha)
         self.monto_total = self.precio_momento * self.cantidad
         super().save(*args, **kwargs)
     
@@ -153,3 +339,198 @@ class DetalleVenta(models.Model):
     class Meta:
         verbose_name = "Detalle de Venta"
         verbose_name_plural = "Detalles de Ventas"
+        indexes = [
+            # Líneas por producto; incluye cantidad y monto_total para que los
+            # totales por producto se respondan solo con el índice
+            models.Index(
+                fields=['producto', 'venta', 'cantidad', 'monto_total'],
+                name='detalle_producto_venta_idx',
+            ),
+        ]
+
+
+class ResumenVentaProducto(models.Model):
+    """
+    Totales diarios de ventas por producto
+    Tabla desnormalizada que se actualiza con el comando refrescar_resumenes
+    """
+    fecha = models.DateField(help_text="Día de las ventas")
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, help_text="Producto vendido")
+    cantidad = models.IntegerField(default=0, help_text="Unidades vendidas en el día")
+    lineas = models.IntegerField(default=0, help_text="Cantidad de líneas de venta del día")
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Suma de monto_total de las líneas")
+
+    def __str__(self):
+        return f"{self.fecha} - producto {self.producto_id}"
+
+    class Meta:
+        verbose_name = "Resumen diario por producto"
+        verbose_name_plural = "Resúmenes diarios por producto"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='resumen_producto_dia_unico'),
+        ]
+
+
+class ResumenVentaCategoria(models.Model):
+    """
+    Totales diarios de ventas por categoría
+    Tabla desnormalizada que se actualiza con el comando refrescar_resumenes
+    """
+    fecha = models.DateField(help_text="Día de las ventas")
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, help_text="Categoría de los productos vendidos")
+    cantidad = models.IntegerField(default=0, help_text="Unidades vendidas en el día")
+    lineas = models.IntegerField(default=0, help_text="Cantidad de líneas de venta del día")
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Suma de monto_total de las líneas")
+
+    def __str__(self):
+        return f"{self.fecha} - categoría {self.categoria_id}"
+
+    class Meta:
+        verbose_name = "Resumen diario por categoría"
+        verbose_name_plural = "Resúmenes diarios por categoría"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'categoria'], name='resumen_categoria_dia_unico'),
+        ]
+
+
+class ResumenVentaCliente(models.Model):
+    """
+    Totales diarios de ventas por cliente
+    Tabla desnormalizada que se actualiza con el comando refrescar_resumenes
+    """
+    fecha = models.DateField(help_text="Día de las ventas")
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, help_text="Cliente que realizó las compras")
+    ventas = models.IntegerField(default=0, help_text="Cantidad de ventas del día")
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Suma del monto (con descuento) de las ventas")
+
+    def __str__(self):
+        return f"{self.fecha} - cliente {self.cliente_id}"
+
+    class Meta:
+        verbose_name = "Resumen diario por cliente"
+        verbose_name_plural = "Resúmenes diarios por cliente"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'cliente'], name='resumen_cliente_dia_unico'),
+        ]
+
+
+class ResumenCliente(models.Model):
+    """
+    Totales históricos de compras de un cliente (incluye ventas archivadas).
+    Se mantiene con las señales de Venta (ver ventas.resumen_clientes) y se
+    reconstruye con el comando reconstruir_resumen_clientes.
+    """
+    cliente = models.OneToOneField(
+        Cliente, on_delete=models.CASCADE, primary_key=True, related_name='resumen',
+        help_text="Cliente resumido",
+    )
+    ventas = models.IntegerField(default=0, help_text="Cantidad de ventas del cliente")
+    monto_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Suma del monto de sus ventas")
+    primera_compra = models.DateTimeField(null=True, blank=True, help_text="Fecha de la primera venta")
+    ultima_compra = models.DateTimeField(null=True, blank=True, help_text="Fecha de la venta más reciente")
+    categoria_favorita = models.ForeignKey(
+        Categoria, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        help_text="Categoría en la que más gastó",
+    )
+    actualizado = models.DateTimeField(auto_now=True, help_text="Última actualización")
+
+    def __str__(self):
+        return f"{self.cliente_id} - {self.ventas} ventas"
+
+    class Meta:
+        verbose_name = "Resumen de cliente"
+        verbose_name_plural = "Resúmenes de clientes"
+        indexes = [
+            # Orden por columnas del admin de clientes
+            models.Index(fields=['monto_total'], name='resumen_cliente_monto_idx'),
+            models.Index(fields=['ultima_compra'], name='resumen_cliente_ultima_idx'),
+        ]
+
+
+class MarcaResumen(models.Model):
+    """
+    Marca de agua de los resúmenes: última Venta ya incorporada. La marca
+    'catalogo' solo usa ``actualizado``, como generación del catálogo en
+    memoria (ver ventas.catalogo).
+    """
+    nombre = models.CharField(max_length=50, unique=True, help_text="Nombre del proceso de resumen")
+    ultima_venta_id = models.BigIntegerField(default=0, help_text="Id de la última venta procesada")
+    actualizado = models.DateTimeField(auto_now=True, help_text="Fecha del último refresco")
+
+    def __str__(self):
+        return f"{self.nombre} - venta {self.ultima_venta_id}"
+
+    class Meta:
+        verbose_name = "Marca de resumen"
+        verbose_name_plural = "Marcas de resumen"
+
+
+class VentaArchivada(models.Model):
+    """
+    Venta antigua movida fuera de ventas_venta por el comando archivar_ventas.
+    Conserva el id original; puede vivir en otra base (VENTAS_ARCHIVO_DB),
+    por eso el cliente se guarda como id y no como clave foránea.
+    """
+    id = models.BigIntegerField(primary_key=True, help_text="Id que tenía la venta original")
+    numero_factura = models.CharField(max_length=20, unique=True, help_text="Número único de factura")
+    fecha = models.DateTimeField(help_text="Fecha y hora de la venta")
+    mes = models.DateField(help_text="Primer día del mes de la venta (partición del archivo)")
+    cliente_id = models.BigIntegerField(help_text="Id del cliente que realizó la compra")
+    descuento = models.DecimalField(max_digits=5, decimal_places=2, default=0, help_text="Descuento aplicado en porcentaje")
+    monto = models.DecimalField(max_digits=10, decimal_places=2, help_text="Monto total de la venta")
+    archivada = models.DateTimeField(auto_now_add=True, help_text="Fecha en que se archivó")
+
+    def __str__(self):
+        return f"Factura {self.numero_factura} (archivada)"
+
+    class Meta:
+        verbose_name = "Venta archivada"
+        verbose_name_plural = "Ventas archivadas"
+        indexes = [
+            models.Index(fields=['mes', 'id'], name='venta_archivada_mes_idx'),
+            models.Index(fields=['cliente_id', 'fecha'], name='venta_archivada_cliente_idx'),
+        ]
+
+
+class DetalleVentaArchivada(models.Model):
+    """
+    Línea de una VentaArchivada. Usa el mismo nombre de relación inversa que
+    DetalleVenta (detalleventa_set) para leer ambas ventas de la misma forma.
+    """
+    id = models.BigIntegerField(primary_key=True, help_text="Id que tenía la línea original")
+    venta = models.ForeignKey(
+        VentaArchivada, on_delete=models.CASCADE, related_name='detalleventa_set',
+        help_text="Venta archivada a la que pertenece este detalle",
+    )
+    producto_id = models.BigIntegerField(help_text="Id del producto vendido")
+    precio_momento = models.DecimalField(max_digits=10, decimal_places=2, help_text="Precio del producto al momento de la venta")
+    cantidad = models.IntegerField(help_text="Cantidad de productos vendidos")
+    monto_total = models.DecimalField(max_digits=10, decimal_places=2, help_text="Monto total de esta línea")
+
+    def __str__(self):
+        return f"{self.venta_id} - producto {self.producto_id} (x{self.cantidad})"
+
+    class Meta:
+        verbose_name = "Detalle de venta archivada"
+        verbose_name_plural = "Detalles de ventas archivadas"
+
+
+class ResumenMensualArchivo(models.Model):
+    """
+    Totales por mes de las ventas archivadas; queda en la base principal
+    para que los reportes históricos no tengan que leer el archivo.
+    """
+    mes = models.DateField(unique=True, help_text="Primer día del mes")
+    ventas = models.IntegerField(default=0, help_text="Cantidad de ventas archivadas del mes")
+    lineas = models.IntegerField(default=0, help_text="Cantidad de líneas de venta")
+    unidades = models.IntegerField(default=0, help_text="Unidades vendidas")
+    bruto = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Suma de monto_total de las líneas")
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Suma del monto (con descuento) de las ventas")
+    actualizado = models.DateTimeField(auto_now=True, help_text="Último archivado que modificó el mes")
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} - {self.ventas} ventas"
+
+    class Meta:
+        verbose_name = "Resumen mensual archivado"
+        verbose_name_plural = "Resúmenes mensuales archivados"
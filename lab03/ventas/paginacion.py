@@ -0,0 +1,182 @@
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Min, Q
+from django.utils.functional import cached_property
+import base64
+import binascii
+import json
+
+
+# Por debajo de esta estimación se cuenta de verdad: en SQLite COUNT(*) de un
+# millón de filas recorre el índice de la clave primaria en decenas de ms
+CONTEO_EXACTO = 1000000
+
+
+def estimar_filas(modelo, using='default'):
+    """
+    Estimación barata de la cantidad de filas de la tabla de un modelo.
+    En PostgreSQL usa las estadísticas del planificador; en el resto usa el
+    rango de ids (máximo - mínimo + 1), que se obtiene del índice de la clave
+    primaria sin recorrer la tabla. El rango sobreestima si hubo borrados en
+    el medio, así que si no supera CONTEO_EXACTO se cuenta de verdad.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [modelo._meta.db_table])
+            fila = cursor.fetchone()
+        if fila and fila[0] >= 0:
+            return int(fila[0])
+        return None
+    filas = modelo._default_manager.using(using)
+    rango = filas.aggregate(minimo=Min('pk'), maximo=Max('pk'))
+    if rango['maximo'] is None:
+        return 0
+    estimado = rango['maximo'] - rango['minimo'] + 1
+    if estimado <= CONTEO_EXACTO:
+        return filas.count()
+    return estimado
+
+
+class PaginadorConteoEstimado(Paginator):
+    """
+    Paginador que evita COUNT(*) sobre tablas grandes sin filtros.
+    Si el listado no tiene filtros y la estimación supera ``umbral`` se usa
+    la estimación; con filtros o tablas pequeñas se cuenta de verdad.
+    """
+    umbral = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimado = estimar_filas(queryset.model, queryset.db)
+            if estimado is not None and estimado > self.umbral:
+                return estimado
+        return super().count
+
+
+def _valor_json(valor):
+    # isoformat completo: DjangoJSONEncoder recorta los microsegundos y el
+    # cursor dejaría de coincidir con la fila
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return str(valor)
+
+
+def codificar_cursor(valores, direccion='siguiente'):
+    """Cursor opaco para la URL: los valores de la clave de la última fila vista"""
+    datos = json.dumps({'v': valores, 'd': direccion}, default=_valor_json, separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (valores, dirección); lanza ValueError si el cursor no es válido"""
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        valores, direccion = datos['v'], datos['d']
+    except (TypeError, KeyError, binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as error:
+        raise ValueError('Cursor inválido') from error
+    if not isinstance(valores, list) or direccion not in ('siguiente', 'anterior'):
+        raise ValueError('Cursor inválido')
+    return valores, direccion
+
+
+class PaginaKeyset:
+    """Una página de resultados y los cursores para moverse desde ella"""
+
+    def __init__(self, objetos, siguiente=None, anterior=None):
+        self.objetos = objetos
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+
+class PaginadorKeyset:
+    """
+    Paginación por clave (keyset): en vez de OFFSET, cada página empieza
+    después de la última fila de la anterior, con una condición sobre la
+    clave de orden, p. ej. ``(fecha, id) < (f, i)``. Con un índice sobre esa
+    clave, la página 10.000 cuesta lo mismo que la primera y no hace falta
+    COUNT(*).
+
+    ``campos`` es el orden, como en order_by (``('-fecha', '-id')``); el
+    último campo debe ser único para que el orden sea total.
+    """
+
+    def __init__(self, queryset, campos, tamano=50):
+        self.queryset = queryset
+        self.campos = [campo.lstrip('-') for campo in campos]
+        self.descendente = [campo.startswith('-') for campo in campos]
+        self.tamano = tamano
+
+    def _condicion(self, valores, adelante):
+        """
+        Filas después (o antes) de ``valores`` en el orden. Se expande como
+        c1 <= v1 AND (c1 < v1 OR (c1 = v1 AND c2 < v2 ...)); la primera
+        condición da al planificador un rango sobre el índice.
+        """
+        def operador(i, estricto):
+            menor = self.descendente[i] == adelante
+            return ('lt' if menor else 'gt') if estricto else ('lte' if menor else 'gte')
+
+        condicion = None
+        for i in reversed(range(len(self.campos))):
+            estricta = Q(**{f'{self.campos[i]}__{operador(i, True)}': valores[i]})
+            condicion = estricta if condicion is None else estricta | (Q(**{self.campos[i]: valores[i]}) & condicion)
+        return Q(**{f'{self.campos[0]}__{operador(0, False)}': valores[0]}) & condicion
+
+    def _orden(self, adelante):
+        return [
+            f'{"-" if descendente == adelante else ""}{campo}'
+            for campo, descendente in zip(self.campos, self.descendente)
+        ]
+
+    def _clave(self, objeto):
+        # Instancias del modelo o diccionarios de values()
+        if isinstance(objeto, dict):
+            return [objeto[campo] for campo in self.campos]
+        return [getattr(objeto, campo) for campo in self.campos]
+
+    def _convertir(self, valores):
+        modelo = self.queryset.model
+        if len(valores) != len(self.campos):
+            raise ValueError('Cursor inválido')
+        try:
+            return [
+                modelo._meta.get_field(campo).to_python(valor)
+                for campo, valor in zip(self.campos, valores)
+            ]
+        except (ValidationError, TypeError, ValueError) as error:
+            # Valores del tipo equivocado (una lista en vez de una fecha) no llegan a ValidationError
+            raise ValueError('Cursor inválido') from error
+
+    def pagina(self, cursor=None):
+        """Página que sigue al cursor (la primera si no hay cursor)"""
+        queryset = self.queryset
+        adelante = True
+        if cursor:
+            valores, direccion = decodificar_cursor(cursor)
+            adelante = direccion == 'siguiente'
+            queryset = queryset.filter(self._condicion(self._convertir(valores), adelante))
+        # Una fila extra indica si hay más páginas en esa dirección
+        objetos = list(queryset.order_by(*self._orden(adelante))[:self.tamano + 1])
+        hay_mas = len(objetos) > self.tamano
+        objetos = objetos[:self.tamano]
+        if not adelante:
+            objetos.reverse()
+        if not objetos:
+            return PaginaKeyset([])
+        hay_siguiente = hay_mas if adelante else True
+        hay_anterior = bool(cursor) if adelante else hay_mas
+        return PaginaKeyset(
+            objetos,
+            siguiente=codificar_cursor(self._clave(objetos[-1])) if hay_siguiente else None,
+            anterior=codificar_cursor(self._clave(objetos[0]), 'anterior') if hay_anterior else None,
+        )
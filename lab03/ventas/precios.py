@@ -0,0 +1,72 @@
+"""
+Historial de precios de los productos (HistorialPrecio).
+
+Cada cambio de ``Producto.precio`` agrega una fila vigente desde el
+``modificado`` del producto:
+
+* guardar un producto lo registra desde las señales (ver ventas.signals);
+* las cargas masivas (poblar_datos, importar_datos) llaman a ``registrar``
+  con bulk_create;
+* ``ajustar`` cambia el precio de muchos productos con un UPDATE por lote
+  de claves (por ejemplo +5% a una categoría) y registra el historial en
+  bloque.
+
+``precio_en`` consulta el precio vigente en una fecha con el índice
+(producto, vigente_desde). Para muchas líneas de venta conviene el catálogo
+en memoria (``Catalogo.precio_en``), que no consulta la base.
+"""
+from decimal import Decimal
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from . import catalogo
+from .models import HistorialPrecio, Producto
+from .utils import en_lotes
+
+# Claves por UPDATE: bajo el límite de 999 parámetros de SQLite
+LOTE_CONSULTA = 900
+
+
+def registrar(precios, desde, using=DEFAULT_DB_ALIAS, lote=1000):
+    """Agrega al historial los pares (producto_id, precio) vigentes desde ``desde``"""
+    return len(HistorialPrecio.objects.using(using).bulk_create(
+        [HistorialPrecio(producto_id=producto_id, precio=precio, vigente_desde=desde) for producto_id, precio in precios],
+        batch_size=lote,
+    ))
+
+
+def ajustar(productos, porcentaje, using=DEFAULT_DB_ALIAS, lote=LOTE_CONSULTA):
+    """
+    Multiplica el precio de ``productos`` (un queryset) por
+    1 + porcentaje / 100, redondeado a centavos, con un UPDATE por lote y
+    registra los precios nuevos en el historial. Devuelve cuántos productos
+    cambiaron.
+    """
+    factor = 1 + Decimal(porcentaje) / 100
+    if factor <= 0:
+        raise ValueError('El ajuste dejaría precios negativos o en cero')
+    ahora = timezone.now()
+    nuevo = Round(F('precio') * Value(factor), 2)
+    actualizados = 0
+    with transaction.atomic(using=using):
+        # Primero las claves (bloqueadas donde se pueda): se actualizan y se
+        # registran exactamente esas filas. Los que no cambian al redondear
+        # no se tocan ni se registran.
+        ids = list(productos.using(using).select_for_update().exclude(precio=nuevo).values_list('pk', flat=True))
+        for ids_lote in en_lotes(ids, lote):
+            filas = Producto.objects.using(using).filter(pk__in=ids_lote)
+            actualizados += filas.update(precio=nuevo, modificado=ahora)
+            registrar(filas.values_list('pk', 'precio').iterator(), ahora, using)
+    # update() no envía señales
+    transaction.on_commit(catalogo.productos_importados, using=using)
+    return actualizados
+
+
+def precio_en(producto_id, fecha, using=DEFAULT_DB_ALIAS):
+    """Precio vigente del producto en ``fecha`` según el historial (None si no hay registro anterior)"""
+    return HistorialPrecio.objects.using(using).filter(
+        producto_id=producto_id, vigente_desde__lte=fecha
+    ).order_by('-vigente_desde').values_list('precio', flat=True).first()
@@ -0,0 +1,102 @@
+"""
+Reservas de stock: reservar, confirmar y liberar.
+
+Reservar descuenta el stock de inmediato (ver ventas.stock) y deja una
+ReservaStock pendiente con fecha de expiración. Confirmar la convierte en
+definitiva; liberarla, o dejar que expire, devuelve las unidades. Los
+cambios de estado son UPDATE condicionales sobre el estado pendiente, así
+una reserva nunca se confirma y se libera a la vez ni devuelve su stock dos
+veces.
+
+Las reservas vencidas se liberan con el comando liberar_reservas (para
+correr periódicamente) y, si a ``reservar`` le falta stock, primero libera
+las vencidas de ese producto y vuelve a intentar.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ReservaStock
+from .stock import StockInsuficiente, descontar, devolver
+
+DURACION = timedelta(minutes=15)
+
+
+class ReservaNoVigente(Exception):
+    """La reserva ya fue confirmada, liberada o expiró"""
+
+
+def _descontar_o_revertir(producto_id, cantidad):
+    """
+    ``descontar`` en un savepoint: si no alcanza se deshacen las restas
+    parciales en las fracciones y la transacción puede seguir
+    """
+    punto = transaction.savepoint()
+    if descontar(producto_id, cantidad):
+        transaction.savepoint_commit(punto)
+        return True
+    transaction.savepoint_rollback(punto)
+    return False
+
+
+@transaction.atomic
+def reservar(producto_id, cantidad, duracion=DURACION):
+    """Aparta ``cantidad`` unidades o lanza StockInsuficiente"""
+    if cantidad <= 0:
+        raise ValueError('La cantidad debe ser positiva')
+    # Solo si falta stock: las reservas vencidas del producto pueden devolverlo
+    if not _descontar_o_revertir(producto_id, cantidad) and not (
+        liberar_expiradas(producto_id=producto_id) and descontar(producto_id, cantidad)
+    ):
+        raise StockInsuficiente([f'Stock insuficiente para el producto {producto_id} (se piden {cantidad})'])
+    return ReservaStock.objects.create(
+        producto_id=producto_id,
+        cantidad=cantidad,
+        expira=timezone.now() + duracion,
+    )
+
+
+def _cambiar_estado(reserva_id, estado, ahora):
+    return ReservaStock.objects.filter(
+        pk=reserva_id, estado=ReservaStock.PENDIENTE, expira__gt=ahora
+    ).update(estado=estado)
+
+
+def confirmar(reserva_id):
+    """Confirma una reserva pendiente y vigente; el stock ya estaba descontado"""
+    if not _cambiar_estado(reserva_id, ReservaStock.CONFIRMADA, timezone.now()):
+        raise ReservaNoVigente(f'La reserva {reserva_id} no está pendiente')
+
+
+@transaction.atomic
+def liberar(reserva_id):
+    """Cancela una reserva pendiente y devuelve sus unidades"""
+    if not _cambiar_estado(reserva_id, ReservaStock.LIBERADA, timezone.now()):
+        raise ReservaNoVigente(f'La reserva {reserva_id} no está pendiente')
+    producto_id, cantidad = ReservaStock.objects.values_list('producto_id', 'cantidad').get(pk=reserva_id)
+    devolver(producto_id, cantidad)
+
+
+@transaction.atomic
+def liberar_expiradas(ahora=None, producto_id=None):
+    """
+    Marca como expiradas las reservas pendientes vencidas (de un producto o
+    de todos) y devuelve su stock con un UPDATE por producto. Devuelve la
+    cantidad de reservas liberadas.
+    """
+    ahora = ahora or timezone.now()
+    vencidas = ReservaStock.objects.filter(estado=ReservaStock.PENDIENTE, expira__lte=ahora)
+    if producto_id is not None:
+        vencidas = vencidas.filter(producto_id=producto_id)
+    devoluciones = Counter()
+    liberadas = 0
+    for pk, producto, cantidad in vencidas.values_list('pk', 'producto_id', 'cantidad'):
+        # Condicional por fila: si otro proceso la liberó antes, no se devuelve dos veces
+        if ReservaStock.objects.filter(pk=pk, estado=ReservaStock.PENDIENTE).update(estado=ReservaStock.EXPIRADA):
+            devoluciones[producto] += cantidad
+            liberadas += 1
+    for producto, cantidad in sorted(devoluciones.items()):
+        devolver(producto, cantidad)
+    return liberadas
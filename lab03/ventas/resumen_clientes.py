@@ -0,0 +1,187 @@
+"""
+Resumen histórico por cliente: cantidad de ventas, monto total, primera y
+última compra y categoría favorita (la de mayor monto en sus líneas).
+
+Se mantiene desde las señales de Venta (ver ventas.signals):
+
+* una venta nueva suma su monto y su fecha con un UPDATE con expresiones F,
+  sin leer las ventas anteriores del cliente;
+* cambiar una venta (por ejemplo ``actualizar_monto`` después de agregar las
+  líneas) recalcula solo a ese cliente, con consultas por índice;
+* borrar ventas junta sus clientes y los recalcula una sola vez al confirmar
+  la transacción (``recalcular_al_confirmar``): borrar 200 ventas no hace
+  200 recálculos.
+
+Las ventas archivadas siguen contando: ``recalcular`` lee también el archivo
+y el archivado borra sin actualizar los resúmenes (``suspendido``). Las cargas
+con bulk_create llaman a ``recalcular`` con los clientes afectados; el
+comando reconstruir_resumen_clientes recalcula todo.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Greatest, Least
+
+from .models import (
+    Cliente,
+    DetalleVenta,
+    DetalleVentaArchivada,
+    Producto,
+    ResumenCliente,
+    Venta,
+    VentaArchivada,
+)
+from .utils import en_lotes
+
+CENTAVO = Decimal('0.01')
+
+CAMPOS = ['ventas', 'monto_total', 'primera_compra', 'ultima_compra', 'categoria_favorita']
+
+_suspendido = ContextVar('resumen_clientes_suspendido', default=False)
+
+
+@contextmanager
+def suspendido():
+    """Las señales de Venta no tocan los resúmenes dentro de este bloque"""
+    token = _suspendido.set(True)
+    try:
+        yield
+    finally:
+        _suspendido.reset(token)
+
+
+def activo():
+    return not _suspendido.get()
+
+
+def sumar_venta(venta):
+    """Incorpora una venta nueva al resumen de su cliente"""
+    actualizadas = ResumenCliente.objects.filter(cliente_id=venta.cliente_id).update(
+        ventas=F('ventas') + 1,
+        monto_total=F('monto_total') + venta.monto,
+        primera_compra=Least('primera_compra', Value(venta.fecha)),
+        ultima_compra=Greatest('ultima_compra', Value(venta.fecha)),
+    )
+    if not actualizadas:
+        # Primera venta del cliente (o resumen aún no construido)
+        recalcular([venta.cliente_id])
+
+
+def _agregar(totales, filas):
+    for cliente_id, ventas, monto, primera, ultima in filas:
+        total = totales[cliente_id]
+        total['ventas'] += ventas
+        total['monto_total'] += monto or 0
+        total['primera_compra'] = min(filter(None, (total['primera_compra'], primera)), default=None)
+        total['ultima_compra'] = max(filter(None, (total['ultima_compra'], ultima)), default=None)
+
+
+def _calcular(cliente_ids=None):
+    """
+    ({cliente_id: totales}, {cliente_id: categoría favorita}) desde las ventas
+    vigentes y archivadas de ``cliente_ids`` (de todos los clientes con None).
+    """
+    def filtrar(queryset, campo):
+        return queryset if cliente_ids is None else queryset.filter(**{f'{campo}__in': cliente_ids})
+
+    totales = defaultdict(lambda: {
+        'ventas': 0, 'monto_total': Decimal('0'), 'primera_compra': None, 'ultima_compra': None,
+    })
+    for ventas in (filtrar(Venta.objects.all(), 'cliente_id'), filtrar(VentaArchivada.objects.all(), 'cliente_id')):
+        _agregar(totales, ventas.values('cliente_id').annotate(
+            n=Count('pk'), monto_sum=Sum('monto'), primera=Min('fecha'), ultima=Max('fecha')
+        ).order_by().values_list('cliente_id', 'n', 'monto_sum', 'primera', 'ultima'))
+
+    por_categoria = defaultdict(Decimal)
+    for cliente_id, categoria_id, monto in filtrar(DetalleVenta.objects.all(), 'venta__cliente_id').values(
+        'venta__cliente_id', 'producto__categoria_id'
+    ).annotate(total=Sum('monto_total')).order_by().values_list('venta__cliente_id', 'producto__categoria_id', 'total'):
+        por_categoria[cliente_id, categoria_id] += monto
+    archivadas = list(filtrar(DetalleVentaArchivada.objects.all(), 'venta__cliente_id').values(
+        'venta__cliente_id', 'producto_id'
+    ).annotate(total=Sum('monto_total')).order_by().values_list('venta__cliente_id', 'producto_id', 'total'))
+    if archivadas:
+        categorias = dict(Producto.objects.filter(
+            pk__in={producto_id for _, producto_id, _ in archivadas}
+        ).values_list('pk', 'categoria_id'))
+        for cliente_id, producto_id, monto in archivadas:
+            if producto_id in categorias:
+                por_categoria[cliente_id, categorias[producto_id]] += monto
+    favoritas = {}
+    # Mayor monto; a igualdad, la categoría de menor id
+    for (cliente_id, categoria_id), monto in sorted(por_categoria.items(), key=lambda item: (-item[1], item[0][1])):
+        favoritas.setdefault(cliente_id, categoria_id)
+    return totales, favoritas
+
+
+def _guardar(totales, favoritas, existentes, lote=1000):
+    ResumenCliente.objects.bulk_create(
+        [
+            ResumenCliente(
+                cliente_id=cliente_id,
+                categoria_favorita_id=favoritas.get(cliente_id),
+                **dict(total, monto_total=total['monto_total'].quantize(CENTAVO)),
+            )
+            for cliente_id, total in totales.items() if cliente_id in existentes
+        ],
+        batch_size=lote,
+        update_conflicts=True,
+        unique_fields=['cliente'],
+        update_fields=[*CAMPOS, 'actualizado'],
+    )
+
+
+def recalcular(cliente_ids):
+    """
+    Recalcula desde las ventas vigentes y archivadas el resumen de los
+    clientes indicados (unas pocas consultas por lote de 1000 clientes).
+    """
+    for lote in en_lotes(sorted(set(cliente_ids)), 1000):
+        totales, favoritas = _calcular(lote)
+        # Las ventas archivadas no tienen FK: el cliente pudo haberse borrado
+        existentes = set(Cliente.objects.filter(pk__in=totales).values_list('pk', flat=True))
+        sin_ventas = set(lote) - existentes
+        if sin_ventas:
+            ResumenCliente.objects.filter(cliente_id__in=sin_ventas).delete()
+        _guardar(totales, favoritas, existentes)
+
+
+def recalcular_al_confirmar(cliente_ids):
+    """
+    Agrega los clientes a los pendientes de la transacción en curso, que se
+    recalculan juntos con un solo on_commit. Sin transacción recalcula ya.
+    """
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        recalcular(cliente_ids)
+        return
+    estado = getattr(conexion, '_resumen_clientes_pendientes', None)
+    # Un rollback descarta el callback y reemplaza la lista run_on_commit
+    if estado is None or estado[0] is not conexion.run_on_commit:
+        pendientes = set()
+        estado = (conexion.run_on_commit, pendientes)
+        conexion._resumen_clientes_pendientes = estado
+
+        def confirmar():
+            if getattr(conexion, '_resumen_clientes_pendientes', None) is estado:
+                del conexion._resumen_clientes_pendientes
+            recalcular(pendientes)
+
+        transaction.on_commit(confirmar)
+    estado[1].update(cliente_ids)
+
+
+def reconstruir(lote=1000):
+    """
+    Vacía los resúmenes y los recalcula con una pasada por tabla (sin
+    filtrar por cliente); devuelve cuántos quedaron.
+    """
+    ResumenCliente.objects.all().delete()
+    totales, favoritas = _calcular()
+    existentes = set(Cliente.objects.values_list('pk', flat=True).iterator())
+    _guardar(totales, favoritas, existentes, lote)
+    return ResumenCliente.objects.count()
@@ -0,0 +1,119 @@
+"""
+Resúmenes diarios de ventas (producto, categoría y cliente).
+
+Los resúmenes se alimentan de forma incremental: una marca de agua guarda el
+id de la última Venta incorporada y cada refresco agrega solo las ventas
+nuevas, sumándolas a las filas diarias existentes. Las ventas se procesan en
+ventanas de ids para acotar la memoria incluso en una reconstrucción completa.
+
+Las líneas agregadas a una venta que ya fue resumida no se detectan de forma
+incremental; para esos casos existe la reconstrucción completa.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    Venta,
+    DetalleVenta,
+    ResumenVentaProducto,
+    ResumenVentaCategoria,
+    ResumenVentaCliente,
+    MarcaResumen
+)
+from .utils import en_lotes
+
+MARCA = 'ventas_diarias'
+
+# Ventas más recientes que este margen esperan al siguiente refresco, para no
+# saltarse transacciones que aún no confirman ids menores
+MARGEN = timedelta(seconds=60)
+
+
+def _acumular(modelo, clave, filas, campos):
+    """
+    Suma filas agregadas {fecha, clave, campos...} a la tabla de resumen,
+    actualizando las filas existentes y creando las que faltan.
+    """
+    for lote in en_lotes(filas, 1000):
+        fechas = {fila['dia'] for fila in lote}
+        ids = {fila[clave] for fila in lote}
+        existentes = {
+            (resumen.fecha, getattr(resumen, clave)): resumen
+            for resumen in modelo.objects.filter(fecha__in=fechas, **{f'{clave}__in': ids})
+        }
+        nuevos = []
+        for fila in lote:
+            resumen = existentes.get((fila['dia'], fila[clave]))
+            if resumen is None:
+                nuevos.append(modelo(fecha=fila['dia'], **{clave: fila[clave]}, **{c: fila[c] for c in campos}))
+            else:
+                for campo in campos:
+                    setattr(resumen, campo, getattr(resumen, campo) + fila[campo])
+        modelo.objects.bulk_update(existentes.values(), campos)
+        modelo.objects.bulk_create(nuevos)
+
+
+def _resumir_ventas(desde_id, hasta_id):
+    """Agrega las ventas con id en (desde_id, hasta_id] a los tres resúmenes"""
+    detalles = DetalleVenta.objects.filter(
+        venta_id__gt=desde_id, venta_id__lte=hasta_id
+    ).annotate(dia=TruncDate('venta__fecha'))
+
+    por_producto = detalles.values('dia', 'producto_id').annotate(
+        cantidad=Sum('cantidad'), lineas=Count('id'), monto=Sum('monto_total')
+    ).order_by()
+    _acumular(ResumenVentaProducto, 'producto_id', por_producto, ['cantidad', 'lineas', 'monto'])
+
+    por_categoria = detalles.values('dia', categoria_id=F('producto__categoria_id')).annotate(
+        cantidad=Sum('cantidad'), lineas=Count('id'), monto=Sum('monto_total')
+    ).order_by()
+    _acumular(ResumenVentaCategoria, 'categoria_id', por_categoria, ['cantidad', 'lineas', 'monto'])
+
+    por_cliente = Venta.objects.filter(
+        pk__gt=desde_id, pk__lte=hasta_id
+    ).annotate(dia=TruncDate('fecha')).values('dia', 'cliente_id').annotate(
+        ventas=Count('id'), monto=Sum('monto')
+    ).order_by()
+    _acumular(ResumenVentaCliente, 'cliente_id', por_cliente, ['ventas', 'monto'])
+
+
+def refrescar(completo=False, ventas_por_ventana=20000, margen=MARGEN):
+    """
+    Incorpora a los resúmenes las ventas posteriores a la marca de agua.
+    Con ``completo`` se vacían los resúmenes y se recalculan desde cero.
+    Devuelve la cantidad de ventas procesadas.
+    """
+    with transaction.atomic():
+        marca, _ = MarcaResumen.objects.select_for_update().get_or_create(nombre=MARCA)
+        if completo:
+            ResumenVentaProducto.objects.all().delete()
+            ResumenVentaCategoria.objects.all().delete()
+            ResumenVentaCliente.objects.all().delete()
+            marca.ultima_venta_id = 0
+
+        limite = Venta.objects.filter(
+            pk__gt=marca.ultima_venta_id,
+            fecha__lte=timezone.now() - margen,
+        ).aggregate(Max('pk'))['pk__max']
+        if limite is None:
+            marca.save()
+            return 0
+
+        procesadas = Venta.objects.filter(pk__gt=marca.ultima_venta_id, pk__lte=limite).count()
+        desde = marca.ultima_venta_id
+        while desde < limite:
+            # Ventana de ids con a lo más ventas_por_ventana ventas
+            ventana = Venta.objects.filter(pk__gt=desde, pk__lte=limite).order_by('pk').values_list(
+                'pk', flat=True
+            )[ventas_por_ventana - 1:ventas_por_ventana]
+            hasta = next(iter(ventana), limite)
+            _resumir_ventas(desde, hasta)
+            desde = hasta
+
+        marca.ultima_venta_id = limite
+        marca.save()
+    return procesadas
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Modelos del archivo de ventas (ver ventas.archivo)
+MODELOS_ARCHIVO = {'ventaarchivada', 'detalleventaarchivada'}
+
+
+def alias_archivo():
+    return getattr(settings, 'VENTAS_ARCHIVO_DB', DEFAULT_DB_ALIAS)
+
+
+class ArchivoRouter:
+    """
+    Envía las ventas archivadas a la base VENTAS_ARCHIVO_DB. Si es una base
+    aparte, en ella solo se crean las tablas del archivo.
+    """
+
+    def _es_archivo(self, app_label, model_name):
+        return app_label == 'ventas' and model_name in MODELOS_ARCHIVO
+
+    def db_for_read(self, model, **hints):
+        if self._es_archivo(model._meta.app_label, model._meta.model_name):
+            return alias_archivo()
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if self._es_archivo(app_label, model_name):
+            return db == alias_archivo()
+        if db != DEFAULT_DB_ALIAS and db == alias_archivo():
+            return False
+        return None
@@ -0,0 +1,102 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import busqueda, catalogo, precios, resumen_clientes
+from .models import Cliente, Producto, Proveedor, Venta
+
+
+@receiver(post_save, sender=Producto)
+def actualizar_catalogo(sender, instance, **kwargs):
+    # Después del commit, para no cargar datos de una transacción que se revierte
+    producto_id = instance.pk
+    transaction.on_commit(lambda: catalogo.producto_modificado(producto_id))
+
+
+@receiver(pre_save, sender=Producto)
+def recordar_precio_anterior(sender, instance, raw, update_fields, **kwargs):
+    """Guarda el precio anterior para registrar en el historial solo los cambios"""
+    instance._precio_anterior = None
+    if raw or instance._state.adding or (update_fields is not None and 'precio' not in update_fields):
+        return
+    instance._precio_anterior = sender.objects.filter(pk=instance.pk).values_list('precio', flat=True).first()
+
+
+@receiver(post_save, sender=Producto)
+def registrar_precio(sender, instance, created, raw, using, update_fields, **kwargs):
+    if raw or (update_fields is not None and 'precio' not in update_fields):
+        return
+    if created or instance.precio != getattr(instance, '_precio_anterior', None):
+        precios.registrar([(instance.pk, instance.precio)], instance.modificado, using=using)
+
+
+@receiver(post_delete, sender=Producto)
+def quitar_del_catalogo(sender, instance, **kwargs):
+    # El pk se copia: al terminar el borrado Django lo deja en None
+    producto_id = instance.pk
+    transaction.on_commit(lambda: catalogo.producto_borrado(producto_id))
+
+
+@receiver(m2m_changed, sender=Producto.proveedores.through)
+def proveedores_modificados(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Cambiar proveedores no guarda el Producto: se actualiza ``modificado``
+    para que los catálogos de otros procesos también lo vean.
+    """
+    if action in ('post_add', 'post_remove'):
+        productos = list(pk_set) if reverse else [instance.pk]
+    elif action == 'pre_clear' and reverse:
+        # Desde el proveedor: después de limpiar ya no se sabe qué productos tenía
+        productos = list(instance.producto_set.values_list('pk', flat=True))
+    elif action == 'post_clear' and not reverse:
+        productos = [instance.pk]
+    else:
+        return
+    Producto.objects.filter(pk__in=productos).update(modificado=timezone.now())
+    for producto_id in productos:
+        transaction.on_commit(lambda producto_id=producto_id: catalogo.producto_modificado(producto_id))
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_save, sender=Cliente)
+@receiver(post_save, sender=Proveedor)
+def indexar_busqueda(sender, instance, using, **kwargs):
+    # En la misma transacción que el cambio: si se revierte, el índice también
+    busqueda.indexar(instance, using=using)
+
+
+@receiver(post_delete, sender=Producto)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_delete, sender=Proveedor)
+def quitar_de_busqueda(sender, instance, using, **kwargs):
+    busqueda.quitar(sender._meta.model_name, instance.pk, using=using)
+
+
+@receiver(pre_save, sender=Venta)
+def recordar_cliente_anterior(sender, instance, raw, update_fields, **kwargs):
+    """Si la venta puede cambiar de cliente, guarda el anterior para recalcular ambos"""
+    instance._cliente_anterior = None
+    if raw or instance._state.adding or not resumen_clientes.activo():
+        return
+    if update_fields is None or 'cliente' in update_fields or 'cliente_id' in update_fields:
+        instance._cliente_anterior = sender.objects.filter(pk=instance.pk).values_list('cliente_id', flat=True).first()
+
+
+@receiver(post_save, sender=Venta)
+def actualizar_resumen_cliente(sender, instance, created, raw, **kwargs):
+    if raw or not resumen_clientes.activo():
+        return
+    if created:
+        resumen_clientes.sumar_venta(instance)
+    else:
+        # Monto, fecha o líneas pudieron cambiar: se recalcula solo ese cliente
+        clientes = {instance.cliente_id, getattr(instance, '_cliente_anterior', None)} - {None}
+        resumen_clientes.recalcular(clientes)
+
+
+@receiver(post_delete, sender=Venta)
+def descontar_resumen_cliente(sender, instance, **kwargs):
+    # Un borrado masivo llama a esta señal por fila: se recalcula una vez al confirmar
+    if resumen_clientes.activo():
+        resumen_clientes.recalcular_al_confirmar([instance.cliente_id])
@@ -0,0 +1,396 @@
+"""
+Snapshot binario y columnar de los datos de ventas.
+
+``volcar`` escribe las tablas de MODELOS en un solo archivo, una columna a
+continuación de otra:
+
+* enteros y claves foráneas como arreglos int64;
+* decimales como int64 en centavos (según los decimales del campo) y fechas
+  con hora como int64 en microsegundos desde 1970 (UTC);
+* textos como un bloque UTF-8 con sus offsets. Si la columna tiene pocos
+  valores distintos (calle, nombre de producto...) se guarda cada valor una
+  sola vez y por fila un código int32 (codificación por diccionario);
+* los nulos, si hay, en una máscara de un byte por fila.
+
+Al final va el manifiesto en JSON (modelos, filas, tipo y posición de cada
+columna), su largo y la marca MAGIA, como en Parquet: así se escribe una
+tabla a la vez sin conocer de antemano el tamaño de las demás.
+
+``restaurar`` abre el archivo con mmap y lee las columnas con
+``memoryview.cast`` sin copiarlas; inserta por lotes con executemany (sin
+crear instancias de los modelos ni enviar señales) y al final reinicia las
+secuencias, reconstruye el índice de búsqueda y los resúmenes de clientes.
+Las tablas derivadas que no están en MODELOS (resúmenes diarios, archivo,
+reservas) no se guardan.
+"""
+import json
+import mmap
+import struct
+import sys
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from . import busqueda, catalogo, resumen_clientes
+from .models import (
+    Categoria,
+    Ciudad,
+    Cliente,
+    Comuna,
+    DetalleVenta,
+    Direccion,
+    HistorialPrecio,
+    MarcaResumen,
+    Producto,
+    Proveedor,
+    TelefonoCliente,
+    Venta,
+)
+
+MAGIA = b'LAB03SNP'
+VERSION = 1
+
+# En orden de dependencias: se restauran en este orden y se vacían al revés
+MODELOS = (
+    Ciudad,
+    Comuna,
+    Direccion,
+    Categoria,
+    Proveedor,
+    Cliente,
+    TelefonoCliente,
+    Producto,
+    Producto.proveedores.through,
+    HistorialPrecio,
+    Venta,
+    DetalleVenta,
+)
+
+EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSEGUNDO = timedelta(microseconds=1)
+
+# Con más de esta fracción de valores distintos no conviene el diccionario
+FRACCION_DICCIONARIO = 0.5
+
+TIPOS_ENTEROS = {
+    'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField', 'BigIntegerField', 'SmallIntegerField',
+    'PositiveIntegerField', 'PositiveBigIntegerField', 'PositiveSmallIntegerField',
+}
+TIPOS_TEXTO = {'CharField', 'TextField', 'SlugField', 'URLField', 'EmailField'}
+
+
+class ErrorSnapshot(Exception):
+    """Archivo que no es un snapshot válido o modelo con campos no soportados"""
+
+
+def _nativo(arreglo):
+    """Los arreglos se guardan en little-endian"""
+    if sys.byteorder != 'little':
+        arreglo = array(arreglo.typecode, arreglo)
+        arreglo.byteswap()
+    return arreglo
+
+
+def _tipo(campo):
+    interno = campo.get_internal_type()
+    if campo.is_relation:
+        interno = campo.target_field.get_internal_type()
+    if interno in TIPOS_ENTEROS:
+        return 'entero'
+    if interno == 'BooleanField':
+        return 'booleano'
+    if interno == 'DecimalField':
+        return 'centavos'
+    if interno == 'DateTimeField':
+        return 'microsegundos'
+    if interno in TIPOS_TEXTO:
+        return 'texto'
+    raise ErrorSnapshot(f'{campo.model._meta.label}.{campo.name}: tipo {interno} no soportado')
+
+
+def _etiqueta(modelo):
+    return modelo._meta.label_lower
+
+
+class _Escritor:
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.posicion = 0
+        self._escribir(MAGIA + struct.pack('<I', VERSION))
+
+    def _escribir(self, datos):
+        self.archivo.write(datos)
+        self.posicion += len(datos)
+
+    def bloque(self, datos):
+        """Escribe un bloque alineado a 8 bytes; devuelve [offset, largo]"""
+        relleno = -self.posicion % 8
+        if relleno:
+            self._escribir(b'\0' * relleno)
+        offset = self.posicion
+        self._escribir(datos)
+        return [offset, len(datos)]
+
+    def terminar(self, manifiesto):
+        datos = json.dumps(manifiesto, ensure_ascii=False).encode()
+        self._escribir(datos)
+        self._escribir(struct.pack('<Q', len(datos)) + MAGIA)
+
+
+def _columna_texto(escritor, valores):
+    distintos = {}
+    for valor in valores:
+        distintos.setdefault(valor, len(distintos))
+    diccionario = len(distintos) <= len(valores) * FRACCION_DICCIONARIO
+    textos = list(distintos) if diccionario else valores
+    offsets = array('q', [0])
+    codificados = []
+    for texto in textos:
+        codificado = texto.encode()
+        codificados.append(codificado)
+        offsets.append(offsets[-1] + len(codificado))
+    columna = {
+        'codificacion': 'diccionario' if diccionario else 'plana',
+        'texto': escritor.bloque(b''.join(codificados)),
+        'offsets': escritor.bloque(_nativo(offsets).tobytes()),
+    }
+    if diccionario:
+        columna['codigos'] = escritor.bloque(_nativo(array('i', (distintos[valor] for valor in valores))).tobytes())
+    return columna
+
+
+def _volcar_modelo(escritor, modelo, using, chunk_size):
+    campos = modelo._meta.concrete_fields
+    tipos = [_tipo(campo) for campo in campos]
+    columnas = [[] for _ in campos]
+    filas = 0
+    valores = modelo.objects.using(using).order_by('pk').values_list(*(campo.attname for campo in campos))
+    for fila in valores.iterator(chunk_size=chunk_size):
+        for columna, valor in zip(columnas, fila):
+            columna.append(valor)
+        filas += 1
+
+    descripcion = []
+    for campo, tipo, valores in zip(campos, tipos, columnas):
+        columna = {'nombre': campo.attname, 'columna': campo.column, 'tipo': tipo, 'nulos': None}
+        if any(valor is None for valor in valores):
+            columna['nulos'] = escritor.bloque(bytes(valor is None for valor in valores))
+        if tipo == 'texto':
+            columna.update(_columna_texto(escritor, ['' if valor is None else valor for valor in valores]))
+        else:
+            if tipo == 'centavos':
+                columna['decimales'] = campo.decimal_places
+                escala = 10 ** campo.decimal_places
+                enteros = (0 if valor is None else int((valor * escala).to_integral_value()) for valor in valores)
+            elif tipo == 'microsegundos':
+                enteros = (0 if valor is None else (_aware(valor) - EPOCA) // MICROSEGUNDO for valor in valores)
+            else:
+                enteros = (0 if valor is None else int(valor) for valor in valores)
+            columna['datos'] = escritor.bloque(_nativo(array('q', enteros)).tobytes())
+        descripcion.append(columna)
+    return {'modelo': _etiqueta(modelo), 'tabla': modelo._meta.db_table, 'filas': filas, 'columnas': descripcion}
+
+
+def _aware(valor):
+    return valor if timezone.is_aware(valor) else timezone.make_aware(valor)
+
+
+def volcar(ruta, using=DEFAULT_DB_ALIAS, chunk_size=5000):
+    """Escribe el snapshot en ``ruta``; devuelve {modelo: filas}"""
+    for modelo in MODELOS:
+        for campo in modelo._meta.concrete_fields:
+            _tipo(campo)
+    manifiesto = {'version': VERSION, 'creado': timezone.now().isoformat(), 'modelos': []}
+    conexion = connections[using]
+    externa = conexion.in_atomic_block
+    # Una sola transacción para leer todas las tablas en el mismo estado. En
+    # SQLite la transacción de lectura ya ve una sola versión de la base; en
+    # PostgreSQL (READ COMMITTED por omisión) cada consulta vería lo
+    # confirmado hasta ese momento, así que se pide REPEATABLE READ. Dentro
+    # de una transacción ya abierta rige el aislamiento de quien llama.
+    with open(ruta, 'wb') as archivo, transaction.atomic(using=using):
+        if conexion.vendor == 'postgresql' and not externa:
+            with conexion.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        escritor = _Escritor(archivo)
+        for modelo in MODELOS:
+            manifiesto['modelos'].append(_volcar_modelo(escritor, modelo, using, chunk_size))
+        escritor.terminar(manifiesto)
+    return {modelo['modelo']: modelo['filas'] for modelo in manifiesto['modelos']}
+
+
+class Lector:
+    """Snapshot abierto con mmap; usar como context manager"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+
+    def __enter__(self):
+        self.archivo = open(self.ruta, 'rb')
+        try:
+            self.mapa = mmap.mmap(self.archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.archivo.close()
+            raise ErrorSnapshot(f'{self.ruta}: archivo vacío')
+        self.vista = memoryview(self.mapa)
+        try:
+            self.manifiesto = self._manifiesto()
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self.vista.release()
+        self.mapa.close()
+        self.archivo.close()
+
+    def _manifiesto(self):
+        if len(self.mapa) < 32 or self.mapa[:8] != MAGIA or self.mapa[-8:] != MAGIA:
+            raise ErrorSnapshot(f'{self.ruta} no es un snapshot de ventas')
+        version, = struct.unpack('<I', self.mapa[8:12])
+        if version != VERSION:
+            raise ErrorSnapshot(f'Versión de snapshot {version} no soportada (se espera {VERSION})')
+        largo, = struct.unpack('<Q', self.mapa[-16:-8])
+        return json.loads(bytes(self.mapa[-16 - largo:-16]))
+
+    def bloque(self, posicion, formato=None):
+        offset, largo = posicion
+        vista = self.vista[offset:offset + largo]
+        if formato is None:
+            return vista
+        if sys.byteorder != 'little':
+            arreglo = array(formato, vista)
+            arreglo.byteswap()
+            return memoryview(arreglo)
+        return vista.cast(formato)
+
+    def textos(self, columna):
+        """Los textos distintos (diccionario) o todos los de la columna (plana)"""
+        datos = self.bloque(columna['texto'])
+        offsets = self.bloque(columna['offsets'], 'q').tolist()
+        return [str(datos[inicio:fin], 'utf-8') for inicio, fin in zip(offsets, offsets[1:])]
+
+
+def _convertidor(columna, ops, campo):
+    """Función (lector, desde, hasta) -> valores listos para el driver"""
+    tipo = columna['tipo']
+    if tipo == 'texto':
+        cache = {}
+
+        def texto(lector, desde, hasta):
+            if 'textos' not in cache:
+                cache['textos'] = lector.textos(columna)
+            textos = cache['textos']
+            if columna['codificacion'] == 'plana':
+                return textos[desde:hasta]
+            return [textos[codigo] for codigo in lector.bloque(columna['codigos'], 'i')[desde:hasta].tolist()]
+        return texto
+
+    def enteros(lector, desde, hasta):
+        return lector.bloque(columna['datos'], 'q')[desde:hasta].tolist()
+
+    if tipo == 'centavos':
+        decimales = columna['decimales']
+        return lambda lector, desde, hasta: [
+            ops.adapt_decimalfield_value(Decimal(valor).scaleb(-decimales), campo.max_digits, decimales)
+            for valor in enteros(lector, desde, hasta)
+        ]
+    if tipo == 'microsegundos':
+        return lambda lector, desde, hasta: [
+            ops.adapt_datetimefield_value(EPOCA + valor * MICROSEGUNDO) for valor in enteros(lector, desde, hasta)
+        ]
+    if tipo == 'booleano':
+        return lambda lector, desde, hasta: [bool(valor) for valor in enteros(lector, desde, hasta)]
+    return enteros
+
+
+def vaciar(using=DEFAULT_DB_ALIAS):
+    """
+    Borra los datos de MODELOS y de las tablas que dependen de ellos. Las
+    tablas de MODELOS se vacían con DELETE directo: el borrado del ORM
+    cargaría cada fila para sus señales y cascadas. El índice de búsqueda
+    queda desactualizado hasta reindexar (restaurar lo hace).
+    """
+    dependientes = {
+        relacion.related_model
+        for modelo in MODELOS
+        for relacion in modelo._meta.related_objects
+        if relacion.related_model not in MODELOS
+    }
+    for modelo in sorted(dependientes, key=lambda modelo: modelo._meta.label):
+        modelo.objects.using(using).all().delete()
+    # Sin resúmenes diarios, su marca de agua debe volver a cero
+    MarcaResumen.objects.using(using).all().delete()
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for modelo in reversed(MODELOS):
+            cursor.execute(f'DELETE FROM {connection.ops.quote_name(modelo._meta.db_table)}')
+
+
+def restaurar(ruta, using=DEFAULT_DB_ALIAS, lote=5000, limpiar=False, progreso=None):
+    """
+    Inserta el snapshot de ``ruta`` en una transacción. Las tablas deben
+    estar vacías, o se vacían antes con ``limpiar``. Devuelve {modelo: filas}.
+    """
+    connection = connections[using]
+    modelos = {_etiqueta(modelo): modelo for modelo in MODELOS}
+    restaurados = {}
+    with Lector(ruta) as lector, transaction.atomic(using=using):
+        if limpiar:
+            vaciar(using)
+        else:
+            ocupados = [modelo._meta.verbose_name_plural for modelo in MODELOS if modelo.objects.using(using).exists()]
+            if ocupados:
+                raise ErrorSnapshot(f'Hay datos en: {", ".join(map(str, ocupados))} (use limpiar)')
+        for tabla in lector.manifiesto['modelos']:
+            modelo = modelos.get(tabla['modelo'])
+            if modelo is None:
+                raise ErrorSnapshot(f'Modelo desconocido en el snapshot: {tabla["modelo"]}')
+            campos = {campo.attname: campo for campo in modelo._meta.concrete_fields}
+            faltantes = set(campos) - {columna['nombre'] for columna in tabla['columnas']}
+            if faltantes or any(columna['nombre'] not in campos for columna in tabla['columnas']):
+                raise ErrorSnapshot(f'Las columnas de {tabla["modelo"]} no coinciden con el modelo actual')
+            convertidores = []
+            for columna in tabla['columnas']:
+                convertidor = _convertidor(columna, connection.ops, campos[columna['nombre']])
+                if columna['nulos'] is not None:
+                    convertidor = _con_nulos(convertidor, columna['nulos'])
+                convertidores.append(convertidor)
+
+            sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+                connection.ops.quote_name(modelo._meta.db_table),
+                ', '.join(connection.ops.quote_name(columna['columna']) for columna in tabla['columnas']),
+                ', '.join(['%s'] * len(tabla['columnas'])),
+            )
+            with connection.cursor() as cursor:
+                for desde in range(0, tabla['filas'], lote):
+                    hasta = min(desde + lote, tabla['filas'])
+                    cursor.executemany(sql, list(zip(*(convertir(lector, desde, hasta) for convertir in convertidores))))
+            restaurados[tabla['modelo']] = tabla['filas']
+            if progreso:
+                progreso(tabla['modelo'], tabla['filas'])
+
+        # Los ids vienen del snapshot: las secuencias deben continuar desde el mayor
+        with connection.cursor() as cursor:
+            for sentencia in connection.ops.sequence_reset_sql(no_style(), list(MODELOS)):
+                cursor.execute(sentencia)
+        # executemany no envía señales
+        busqueda.reindexar(using=using)
+        if using == DEFAULT_DB_ALIAS:
+            resumen_clientes.reconstruir()
+        # Las fechas de modificado vienen del snapshot: los demás procesos no verían el cambio
+        catalogo.nueva_generacion(using)
+    catalogo.reiniciar()
+    return restaurados
+
+
+def _con_nulos(convertidor, posicion):
+    def convertir(lector, desde, hasta):
+        nulos = lector.bloque(posicion)[desde:hasta]
+        return [None if nulo else valor for nulo, valor in zip(nulos, convertidor(lector, desde, hasta))]
+    return convertir
@@ -0,0 +1,124 @@
+"""
+Operaciones de stock seguras ante concurrencia.
+
+Todas las restas son UPDATE condicionales (``stock >= cantidad``) con
+expresiones F(), de modo que dos ventas simultáneas nunca dejan el stock en
+negativo: la base de datos decide cuál llega primero y la otra no actualiza
+ninguna fila.
+
+Los productos muy vendidos pueden repartir su stock en varias FraccionStock.
+Cada resta intenta primero una fracción al azar, así las peticiones
+simultáneas actualizan filas distintas en vez de esperar por la misma.
+El stock total es Producto.stock más la suma de sus fracciones.
+"""
+import random
+
+from django.db import transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import FraccionStock, Producto
+
+
+class StockInsuficiente(Exception):
+    """No hay stock para la cantidad pedida; ``errores`` es una lista de mensajes"""
+
+    def __init__(self, errores):
+        super().__init__('; '.join(errores))
+        self.errores = errores
+
+
+def _descontar_fracciones(producto_id, cantidad):
+    fracciones = list(FraccionStock.objects.filter(producto_id=producto_id, stock__gt=0).values_list('pk', 'stock'))
+    if not fracciones:
+        return False
+    # Camino rápido: una sola fracción al azar cubre la cantidad
+    pk, _ = random.choice(fracciones)
+    if FraccionStock.objects.filter(pk=pk, stock__gte=cantidad).update(stock=F('stock') - cantidad):
+        return True
+    # Si no, se toma de varias fracciones; cada resta sigue siendo condicional,
+    # y si alguna falla la transacción del llamador se revierte completa
+    if sum(stock for _, stock in fracciones) < cantidad:
+        return False
+    random.shuffle(fracciones)
+    pendiente = cantidad
+    for pk, stock in fracciones:
+        tomar = min(stock, pendiente)
+        if not FraccionStock.objects.filter(pk=pk, stock__gte=tomar).update(stock=F('stock') - tomar):
+            return False
+        pendiente -= tomar
+        if not pendiente:
+            return True
+    return False
+
+
+def descontar(producto_id, cantidad):
+    """
+    Resta unidades de un producto. Devuelve False si no alcanzan; en ese caso
+    el llamador debe revertir la transacción (puede haber restas parciales
+    en las fracciones).
+    """
+    if Producto.objects.filter(pk=producto_id, stock__gte=cantidad).update(stock=F('stock') - cantidad):
+        return True
+    return _descontar_fracciones(producto_id, cantidad)
+
+
+def descontar_stock(cantidades):
+    """
+    Resta ``{producto_id: cantidad}`` del stock: un UPDATE condicional por
+    producto. Debe llamarse dentro de una transacción: si algún producto no
+    alcanza se lanza StockInsuficiente y la transacción se revierte.
+    Los productos se recorren en orden de id para evitar bloqueos cruzados.
+    """
+    faltantes = []
+    for producto_id in sorted(cantidades):
+        if not descontar(producto_id, cantidades[producto_id]):
+            faltantes.append(f'Stock insuficiente para el producto {producto_id} (se piden {cantidades[producto_id]})')
+    if faltantes:
+        raise StockInsuficiente(faltantes)
+
+
+def devolver(producto_id, cantidad):
+    """Suma unidades al producto (a una fracción al azar si está fraccionado)"""
+    fracciones = list(FraccionStock.objects.filter(producto_id=producto_id).values_list('pk', flat=True))
+    if fracciones:
+        FraccionStock.objects.filter(pk=random.choice(fracciones)).update(stock=F('stock') + cantidad)
+    else:
+        Producto.objects.filter(pk=producto_id).update(stock=F('stock') + cantidad)
+
+
+def stock_total(producto_ids):
+    """Diccionario {producto_id: stock} sumando las fracciones, en una consulta"""
+    productos = Producto.objects.filter(pk__in=producto_ids).annotate(
+        total=F('stock') + Coalesce(Sum('fracciones__stock'), Value(0))
+    )
+    return dict(productos.values_list('pk', 'total'))
+
+
+@transaction.atomic
+def fraccionar(producto_id, fracciones=8):
+    """
+    Reparte el stock del producto en ``fracciones`` filas. Si ya estaba
+    fraccionado, primero junta el stock y luego lo vuelve a repartir.
+    """
+    total = unificar(producto_id)
+    if Producto.objects.filter(pk=producto_id, stock=total).update(stock=0) != 1:
+        raise StockInsuficiente([f'El stock del producto {producto_id} cambió durante el fraccionamiento'])
+    base, resto = divmod(total, fracciones)
+    FraccionStock.objects.bulk_create([
+        FraccionStock(producto_id=producto_id, indice=i, stock=base + (1 if i < resto else 0))
+        for i in range(fracciones)
+    ])
+    return total
+
+
+@transaction.atomic
+def unificar(producto_id):
+    """Devuelve el stock de las fracciones a Producto.stock y las elimina"""
+    # select_for_update bloquea las fracciones en las bases que lo soportan
+    fracciones = FraccionStock.objects.select_for_update().filter(producto_id=producto_id)
+    suma = sum(fracciones.values_list('stock', flat=True))
+    fracciones.delete()
+    if suma:
+        Producto.objects.filter(pk=producto_id).update(stock=F('stock') + suma)
+    return Producto.objects.values_list('stock', flat=True).get(pk=producto_id)
@@ -1,3 +1,1256 @@
-from django.test import TestCase
+from django.contrib import admin
+from django.contrib.auth.models import Permission, User
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from decimal import Decimal
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipIf
+import csv
+import json
+import os
+import tempfile
 
-# Create your tests here.
+from .models import (
+    Cliente,
+    Producto,
+    Venta,
+    DetalleVenta,
+    ResumenVentaProducto,
+    ResumenVentaCategoria,
+    ResumenVentaCliente,
+    Categoria,
+    Ciudad,
+    Comuna,
+    Direccion,
+    FraccionStock,
+    HistorialPrecio,
+    ReservaStock,
+    VentaArchivada,
+    DetalleVentaArchivada,
+    ResumenMensualArchivo,
+    ResumenCliente,
+    Proveedor
+)
+from . import resumenes, resumen_clientes
+from .importacion import importar
+from .ingesta import ErrorIngesta, StockInsuficiente, ingresar_ventas
+from . import analitica, archivo, busqueda, catalogo, direcciones, ingesta, paginacion, precios, reservas, snapshot, stock
+from .paginacion import PaginadorConteoEstimado, PaginadorKeyset, codificar_cursor
+
+
+def poblar(escala=1, **opciones):
+    call_command('poblar_datos', escala=escala, semilla=7, stdout=StringIO(), **opciones)
+
+
+class PoblarDatosTests(TestCase):
+    def test_escala_uno_crea_datos_base(self):
+        poblar()
+        self.assertEqual(Cliente.objects.count(), 10)
+        self.assertEqual(Producto.objects.count(), 15)
+        self.assertEqual(Venta.objects.count(), 10)
+        self.assertTrue(Producto.proveedores.through.objects.exists())
+
+    def test_escala_con_lotes_pequenos(self):
+        poblar(escala=3, lote=7)
+        self.assertEqual(Cliente.objects.count(), 30)
+        self.assertEqual(Venta.objects.count(), 30)
+        self.assertEqual(Venta.objects.values('fecha').distinct().count(), 30)
+
+        # El monto guardado coincide con las líneas menos el descuento
+        for venta in Venta.objects.annotate(subtotal=Sum('detalleventa__monto_total')):
+            esperado = venta.subtotal - venta.subtotal * venta.descuento / 100
+            self.assertEqual(venta.monto, esperado.quantize(Decimal('0.01')))
+        for detalle in DetalleVenta.objects.all():
+            self.assertEqual(detalle.monto_total, detalle.precio_momento * detalle.cantidad)
+
+
+class ExportarVentasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        poblar()
+
+    def test_csv_una_fila_por_detalle(self):
+        salida = StringIO()
+        call_command('exportar_ventas', formato='csv', chunk=3, stdout=salida)
+        filas = list(csv.reader(StringIO(salida.getvalue())))
+        self.assertEqual(filas[0][0], 'numero_factura')
+        self.assertEqual(len(filas) - 1, DetalleVenta.objects.count())
+
+    def test_jsonl_una_linea_por_venta(self):
+        salida = StringIO()
+        call_command('exportar_ventas', formato='jsonl', stdout=salida)
+        ventas = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+        self.assertEqual(len(ventas), Venta.objects.count())
+        venta = Venta.objects.get(numero_factura=ventas[0]['numero_factura'])
+        self.assertEqual(len(ventas[0]['detalles']), venta.detalleventa_set.count())
+        self.assertEqual(Decimal(ventas[0]['monto']), venta.monto)
+
+    def test_descarga_en_streaming_solo_para_staff(self):
+        url = '/ventas/exportar/csv/'
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        staff = User.objects.create_user('staff', password='x', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        contenido = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(contenido.splitlines()) - 1, DetalleVenta.objects.count())
+        self.assertEqual(self.client.get('/ventas/exportar/xml/').status_code, 404)
+        for fecha in ('2024-02-30', 'ayer'):
+            self.assertEqual(self.client.get(url, {'desde': fecha}).status_code, 400)
+
+
+class ResumenesTests(TestCase):
+    def setUp(self):
+        poblar(escala=2)
+
+    def refrescar(self, **opciones):
+        return resumenes.refrescar(margen=timedelta(0), **opciones)
+
+    def assertResumenesCuadran(self):
+        total_lineas = DetalleVenta.objects.aggregate(monto=Sum('monto_total'), cantidad=Sum('cantidad'))
+        for modelo in (ResumenVentaProducto, ResumenVentaCategoria):
+            totales = modelo.objects.aggregate(monto=Sum('monto'), cantidad=Sum('cantidad'))
+            self.assertEqual(totales, total_lineas)
+        self.assertEqual(
+            ResumenVentaCliente.objects.aggregate(monto=Sum('monto'))['monto'],
+            Venta.objects.aggregate(monto=Sum('monto'))['monto'],
+        )
+
+    def test_refresco_incremental(self):
+        self.assertEqual(self.refrescar(ventas_por_ventana=3), 20)
+        self.assertResumenesCuadran()
+        self.assertEqual(self.refrescar(), 0)
+
+        producto = Producto.objects.first()
+        venta = Venta.objects.create(
+            numero_factura='FAC999999', cliente=Cliente.objects.first(), monto=producto.precio * 2
+        )
+        DetalleVenta.objects.create(venta=venta, producto=producto, precio_momento=producto.precio, cantidad=2)
+        self.assertEqual(self.refrescar(), 1)
+        self.assertResumenesCuadran()
+
+    def test_ventas_recientes_esperan_el_margen(self):
+        self.refrescar()
+        Venta.objects.create(numero_factura='FAC999999', cliente=Cliente.objects.first(), monto=0)
+        self.assertEqual(resumenes.refrescar(), 0)
+
+    def test_reconstruccion_completa(self):
+        self.refrescar()
+        ResumenVentaCliente.objects.update(monto=0)
+        call_command('refrescar_resumenes', completo=True, margen=0, stdout=StringIO())
+        self.assertResumenesCuadran()
+
+
+class MontosVentaTests(TestCase):
+    def setUp(self):
+        poblar(escala=2)
+
+    def test_calcular_monto_total_en_una_consulta(self):
+        venta = Venta.objects.first()
+        with self.assertNumQueries(1):
+            monto = venta.calcular_monto_total()
+        self.assertEqual(monto.quantize(Decimal('0.01')), venta.monto)
+
+    def test_montos_poblados_cuadran(self):
+        self.assertFalse(Venta.objects.con_monto_descuadrado().exists())
+
+    def test_recalcular_montos_descuadrados(self):
+        esperados = dict(Venta.objects.values_list('pk', 'monto'))
+        Venta.objects.filter(pk__in=list(esperados)[:5]).update(monto=1)
+        self.assertEqual(Venta.objects.con_monto_descuadrado().count(), 5)
+
+        salida = StringIO()
+        call_command('verificar_montos', corregir=True, stdout=salida)
+        self.assertIn('5 ventas con monto descuadrado', salida.getvalue())
+        self.assertFalse(Venta.objects.con_monto_descuadrado().exists())
+        for pk, monto in Venta.objects.values_list('pk', 'monto'):
+            self.assertLessEqual(abs(monto - esperados[pk]), Decimal('0.01'))
+
+    def test_benchmark_no_modifica_datos(self):
+        Venta.objects.update(monto=1)
+        call_command('verificar_montos', benchmark=10, stdout=StringIO())
+        self.assertEqual(Venta.objects.con_monto_descuadrado().count(), 20)
+
+
+class AdminConsultasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        poblar(escala=3)
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def consultas_changelist(self, modelo, por_pagina, query=''):
+        model_admin = admin.site._registry[modelo]
+        url = f'/admin/ventas/{modelo._meta.model_name}/{query}'
+        with mock.patch.object(model_admin, 'list_per_page', por_pagina):
+            with CaptureQueriesContext(connection) as consultas:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(consultas)
+
+    def test_changelists_con_consultas_constantes(self):
+        for modelo in admin.site._registry:
+            if modelo._meta.app_label != 'ventas':
+                continue
+            with self.subTest(modelo=modelo.__name__):
+                self.assertEqual(
+                    self.consultas_changelist(modelo, 2),
+                    self.consultas_changelist(modelo, 100),
+                )
+
+    def test_filtro_por_codigo_de_cliente(self):
+        cliente = Cliente.objects.get(codigo='CLI001')
+        response = self.client.get('/admin/ventas/venta/', {'cliente_codigo': 'CLI001'})
+        self.assertEqual(
+            response.context['cl'].result_count,
+            Venta.objects.filter(cliente=cliente).count(),
+        )
+
+    def test_filtro_por_rango_de_cantidad(self):
+        response = self.client.get('/admin/ventas/detalleventa/', {'cantidad_rango': '2-5'})
+        self.assertEqual(
+            response.context['cl'].result_count,
+            DetalleVenta.objects.filter(cantidad__gte=2, cantidad__lt=6).count(),
+        )
+
+    def test_paginador_estimado_solo_sin_filtros(self):
+        ids = list(DetalleVenta.objects.order_by('pk').values_list('pk', flat=True))
+        DetalleVenta.objects.filter(pk=ids[len(ids) // 2]).delete()
+        total = DetalleVenta.objects.count()
+        # Tabla chica: la estimación por rango de ids se corrige contando
+        with mock.patch.object(PaginadorConteoEstimado, 'umbral', 0):
+            self.assertEqual(PaginadorConteoEstimado(DetalleVenta.objects.order_by('pk'), 10).count, total)
+        with mock.patch.object(PaginadorConteoEstimado, 'umbral', 0), mock.patch.object(paginacion, 'CONTEO_EXACTO', 0):
+            paginador = PaginadorConteoEstimado(DetalleVenta.objects.order_by('pk'), 10)
+            self.assertEqual(paginador.count, ids[-1] - ids[0] + 1)
+            filtrado = PaginadorConteoEstimado(DetalleVenta.objects.filter(cantidad__gte=1).order_by('pk'), 10)
+            self.assertEqual(filtrado.count, total)
+
+
+class BenchmarkIndicesTests(TestCase):
+    def test_benchmark_restaura_los_indices(self):
+        salida = StringIO()
+        call_command('benchmark_indices', poblar=1, repeticiones=1, stdout=salida)
+        self.assertIn('venta_fecha_idx', salida.getvalue())
+        with connection.cursor() as cursor:
+            indices = connection.introspection.get_constraints(cursor, Venta._meta.db_table)
+        self.assertIn('venta_cliente_fecha_idx', indices)
+        # Las claves foráneas cubiertas por un índice compuesto no llevan índice propio
+        for modelo, columna in ((Venta, 'cliente_id'), (DetalleVenta, 'producto_id')):
+            with connection.cursor() as cursor:
+                indices = connection.introspection.get_constraints(cursor, modelo._meta.db_table)
+            self.assertNotIn([columna], [indice['columns'] for indice in indices.values() if indice['index']])
+
+
+class IngestaVentasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        poblar()
+        cls.producto = Producto.objects.order_by('pk').first()
+        cls.otro = Producto.objects.order_by('pk')[1]
+        Producto.objects.filter(pk__in=[cls.producto.pk, cls.otro.pk]).update(stock=10)
+
+    def setUp(self):
+        catalogo.reiniciar()
+
+    def facturas(self, cantidad=2, numero='POS-'):
+        return [
+            {
+                'numero_factura': f'{numero}{i}',
+                'cliente': 'CLI001',
+                'descuento': '10',
+                'lineas': [
+                    {'producto': self.producto.pk, 'cantidad': cantidad},
+                    {'producto': self.otro.pk, 'cantidad': 1},
+                ],
+            }
+            for i in range(2)
+        ]
+
+    def test_ingresa_lote_y_descuenta_stock(self):
+        # Validación (ventas vigentes y archivadas, clientes y carga del catálogo con su generación) + 2 UPDATE de stock + 2 INSERT, más el savepoint de la transacción
+        # y 6 del resumen de clientes (totales y categorías vigentes y archivadas, clientes y el upsert)
+        with self.assertNumQueries(17):
+            ventas = ingresar_ventas(self.facturas())
+        self.assertEqual(len(ventas), 2)
+        for venta in Venta.objects.filter(numero_factura__startswith='POS-'):
+            self.assertEqual(venta.detalleventa_set.count(), 2)
+            self.assertEqual(venta.monto, venta.calcular_monto_total().quantize(Decimal('0.01')))
+        self.assertEqual(Producto.objects.get(pk=self.producto.pk).stock, 6)
+        self.assertEqual(Producto.objects.get(pk=self.otro.pk).stock, 8)
+
+    def test_sobreventa_revierte_todo(self):
+        with self.assertRaises(StockInsuficiente):
+            ingresar_ventas(self.facturas(cantidad=6))
+        self.assertFalse(Venta.objects.filter(numero_factura__startswith='POS-').exists())
+        self.assertEqual(Producto.objects.get(pk=self.otro.pk).stock, 10)
+
+    def test_errores_de_validacion(self):
+        facturas = self.facturas()
+        facturas[1]['numero_factura'] = facturas[0]['numero_factura']
+        facturas[0]['cliente'] = 'NOEXISTE'
+        with self.assertRaises(ErrorIngesta) as contexto:
+            ingresar_ventas(facturas)
+        self.assertEqual(len(contexto.exception.errores), 2)
+
+    def test_endpoint_requiere_permiso(self):
+        url = '/ventas/ingresar/'
+        cuerpo = json.dumps({'facturas': self.facturas()})
+        usuario = User.objects.create_user('pos', password='x')
+        self.client.force_login(usuario)
+        self.assertEqual(self.client.post(url, cuerpo, content_type='application/json').status_code, 403)
+
+        usuario.user_permissions.add(Permission.objects.get(codename='add_venta'))
+        response = self.client.post(url, cuerpo, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['ventas']), 2)
+        response = self.client.post(url, cuerpo, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        # Valores que antes terminaban en 500
+        facturas = self.facturas(numero='NAN-')
+        facturas[0]['descuento'] = 'NaN'
+        facturas[1]['lineas'][0]['cantidad'] = '²'
+        response = self.client.post(url, json.dumps({'facturas': facturas}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()['errores']), 2)
+
+        # Otra solicitud ingresó el mismo número entre la validación y la escritura
+        facturas = self.facturas(numero='CONC-')
+        validar = ingesta.validar_facturas
+
+        def validar_y_competir(lote):
+            resultado = validar(lote)
+            Venta.objects.create(numero_factura=lote[0]['numero_factura'], cliente=resultado[0][lote[0]['cliente']], monto=0)
+            return resultado
+
+        with mock.patch.object(ingesta, 'validar_facturas', validar_y_competir):
+            response = self.client.post(url, json.dumps({'facturas': facturas}), content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+
+
+class ReservasStockTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Pruebas')
+        cls.producto = Producto.objects.create(nombre='Popular', precio=10, stock=10, categoria=categoria)
+
+    def disponible(self):
+        return stock.stock_total([self.producto.pk])[self.producto.pk]
+
+    def test_reservar_confirmar_y_liberar(self):
+        primera = reservas.reservar(self.producto.pk, 4)
+        segunda = reservas.reservar(self.producto.pk, 4)
+        self.assertEqual(self.disponible(), 2)
+        with self.assertRaises(StockInsuficiente):
+            reservas.reservar(self.producto.pk, 3)
+
+        reservas.confirmar(primera.pk)
+        reservas.liberar(segunda.pk)
+        self.assertEqual(self.disponible(), 6)
+        with self.assertRaises(reservas.ReservaNoVigente):
+            reservas.liberar(segunda.pk)
+        with self.assertRaises(reservas.ReservaNoVigente):
+            reservas.liberar(primera.pk)
+        self.assertEqual(self.disponible(), 6)
+
+    def test_liberar_expiradas(self):
+        vencida = reservas.reservar(self.producto.pk, 3, duracion=timedelta(0))
+        reservas.reservar(self.producto.pk, 2)
+        self.assertEqual(reservas.liberar_expiradas(), 1)
+        self.assertEqual(self.disponible(), 8)
+        self.assertEqual(ReservaStock.objects.get(pk=vencida.pk).estado, ReservaStock.EXPIRADA)
+        with self.assertRaises(reservas.ReservaNoVigente):
+            reservas.confirmar(vencida.pk)
+
+    def test_reservar_y_comando_liberan_las_vencidas(self):
+        vencida = reservas.reservar(self.producto.pk, 8, duracion=timedelta(0))
+        # Sin stock libre: antes de fallar se devuelven las unidades vencidas
+        reservas.reservar(self.producto.pk, 5)
+        self.assertEqual(ReservaStock.objects.get(pk=vencida.pk).estado, ReservaStock.EXPIRADA)
+        self.assertEqual(self.disponible(), 5)
+
+        reservas.reservar(self.producto.pk, 5, duracion=timedelta(0))
+        salida = StringIO()
+        call_command('liberar_reservas', stdout=salida)
+        self.assertIn('Liberadas 1 reservas', salida.getvalue())
+        self.assertEqual(self.disponible(), 5)
+
+    def test_reintento_no_conserva_restas_parciales(self):
+        stock.fraccionar(self.producto.pk, 4)
+        reservas.reservar(self.producto.pk, 2, duracion=timedelta(0))
+        vendido = []
+
+        def otra_venta(fracciones):
+            # Otra venta vacía la segunda fracción después de leerlas: el primer intento ya restó de la primera
+            if not vendido:
+                fracciones.sort()
+                pk, cantidad = fracciones[1]
+                FraccionStock.objects.filter(pk=pk).update(stock=0)
+                vendido.append(cantidad)
+
+        with mock.patch.object(stock.random, 'shuffle', side_effect=otra_venta):
+            reservas.reservar(self.producto.pk, 7)
+        # La "otra venta" corre en la misma conexión y se deshace con el savepoint;
+        # sin él quedaban también la resta parcial y la venta, y el reintento no alcanzaba
+        self.assertTrue(vendido)
+        self.assertEqual(self.disponible(), 10 - 7)
+
+    def test_stock_fraccionado(self):
+        stock.fraccionar(self.producto.pk, 4)
+        self.assertEqual(FraccionStock.objects.filter(producto=self.producto).count(), 4)
+        self.assertEqual(self.disponible(), 10)
+        # 7 unidades no caben en una fracción (3, 3, 2, 2): se toman de varias
+        reserva = reservas.reservar(self.producto.pk, 7)
+        self.assertEqual(self.disponible(), 3)
+        with self.assertRaises(StockInsuficiente):
+            reservas.reservar(self.producto.pk, 4)
+        reservas.liberar(reserva.pk)
+        self.assertEqual(stock.unificar(self.producto.pk), 10)
+        self.assertFalse(FraccionStock.objects.exists())
+
+
+class EstresReservasTests(TransactionTestCase):
+    def test_hilos_concurrentes_sin_sobreventa(self):
+        salida = StringIO()
+        call_command('estres_reservas', hilos=4, operaciones=30, stock=100, fracciones=4, stdout=salida)
+        self.assertIn('Sin sobreventa', salida.getvalue())
+        self.assertFalse(Producto.objects.exists())
+
+
+class CatalogoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        poblar()
+
+    def setUp(self):
+        catalogo.reiniciar()
+        self.catalogo = catalogo.obtener_catalogo()
+
+    def test_busquedas_sin_consultas(self):
+        producto = Producto.objects.select_related('categoria').order_by('pk').first()
+        # Generación y productos
+        with self.assertNumQueries(2):
+            self.catalogo.cargar()
+        with self.assertNumQueries(0):
+            encontrado = self.catalogo.obtener(producto.pk)
+            por_nombre = self.catalogo.por_nombre(producto.nombre.upper())
+        self.assertEqual(encontrado.precio, producto.precio)
+        self.assertEqual(encontrado.categoria, producto.categoria.nombre)
+        self.assertEqual(set(encontrado.proveedores), set(producto.proveedores.values_list('pk', flat=True)))
+        self.assertIn(encontrado, por_nombre)
+
+    def test_senales_actualizan_el_catalogo(self):
+        self.catalogo.cargar()
+        producto = Producto.objects.order_by('pk').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.precio = Decimal('1.50')
+            producto.save()
+        self.assertEqual(self.catalogo.obtener(producto.pk).precio, Decimal('1.50'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.proveedores.clear()
+        self.assertEqual(self.catalogo.obtener(producto.pk).proveedores, ())
+
+        nuevo = Producto.objects.create(nombre='Nuevo', precio=3, stock=1, categoria=producto.categoria)
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo.delete()
+        self.assertEqual(self.catalogo.por_nombre('Nuevo'), [])
+
+    def test_refresco_incremental_por_version(self):
+        self.catalogo.cargar()
+        producto = Producto.objects.order_by('pk').first()
+        # Cambio hecho "en otro proceso": sin señales en este catálogo
+        Producto.objects.filter(pk=producto.pk).update(precio=Decimal('9.99'), modificado=timezone.now())
+        self.catalogo.refrescar(forzar=True)
+        self.assertEqual(self.catalogo.obtener(producto.pk).precio, Decimal('9.99'))
+        self.assertEqual(self.catalogo.estadisticas()['refrescos'], 1)
+
+    def test_relee_confirmados_tarde_dentro_del_margen(self):
+        self.catalogo.cargar()
+        primero, segundo = Producto.objects.order_by('pk')[:2]
+        ahora = timezone.now()
+        Producto.objects.filter(pk=primero.pk).update(modificado=ahora)
+        self.catalogo.refrescar(forzar=True)
+        # Guardado antes que el primero, pero confirmado después
+        Producto.objects.filter(pk=segundo.pk).update(precio=Decimal('7.77'), modificado=ahora - timedelta(seconds=5))
+        self.catalogo.refrescar(forzar=True)
+        self.assertEqual(self.catalogo.obtener(segundo.pk).precio, Decimal('7.77'))
+
+    def test_nueva_generacion_recarga_otros_procesos(self):
+        otro = catalogo.Catalogo(intervalo=0)
+        otro.cargar()
+        producto = Producto.objects.order_by('pk').first()
+        # Como al restaurar un snapshot: misma versión, datos distintos
+        Producto.objects.filter(pk=producto.pk).update(precio=Decimal('8.88'))
+        catalogo.nueva_generacion()
+        otro.refrescar()
+        self.assertEqual(otro.obtener(producto.pk).precio, Decimal('8.88'))
+        self.assertEqual(otro.estadisticas()['cargas'], 2)
+
+    def test_detalle_sin_precio_usa_el_catalogo(self):
+        venta = Venta.objects.order_by('pk').first()
+        producto = Producto.objects.order_by('pk').first()
+        detalle = DetalleVenta.objects.create(venta=venta, producto=producto, cantidad=2)
+        self.assertEqual(detalle.precio_momento, producto.precio)
+        self.assertEqual(detalle.monto_total, producto.precio * 2)
+
+
+class BusquedaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        poblar()
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        direccion = Direccion.objects.first()
+        cls.perez = Cliente.objects.create(codigo='BUS001', nombre='Ana Pérez', direccion=direccion)
+        cls.lampara = Producto.objects.get(nombre='Lámpara LED')
+
+    def test_indice_disponible(self):
+        self.assertIsNotNone(busqueda.backend())
+
+    def test_prefijo_sin_acentos(self):
+        self.assertEqual(busqueda.buscar('producto', 'lamp'), [self.lampara.pk])
+        self.assertEqual(busqueda.buscar('cliente', 'PEREZ ana'), [self.perez.pk])
+        self.assertIn(self.perez.pk, busqueda.buscar('cliente', 'BUS0'))
+
+    def test_senales_mantienen_el_indice(self):
+        self.perez.nombre = 'Ana Núñez'
+        self.perez.save()
+        self.assertNotIn(self.perez.pk, busqueda.buscar('cliente', 'perez'))
+        self.assertEqual(busqueda.buscar('cliente', 'ana nunez'), [self.perez.pk])
+        pk = self.perez.pk
+        self.perez.delete()
+        self.assertNotIn(pk, busqueda.buscar('cliente', 'ana'))
+
+    def test_reindexar_tras_bulk_create(self):
+        Producto.objects.bulk_create([
+            Producto(nombre='Lámpara de Pie', precio=10, stock=1, categoria=self.lampara.categoria)
+        ])
+        self.assertEqual(len(busqueda.buscar('producto', 'lampara')), 1)
+        busqueda.reindexar(['producto'])
+        self.assertEqual(len(busqueda.buscar('producto', 'lampara')), 2)
+
+    def test_admin_usa_el_indice(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/admin/ventas/producto/', {'q': 'lampara'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.lampara])
+        venta = Venta.objects.create(numero_factura='BUS-1', cliente=self.perez, monto=0)
+        response = self.client.get('/admin/ventas/venta/', {'q': 'perez'})
+        self.assertEqual(list(response.context['cl'].result_list), [venta])
+        response = self.client.get('/admin/ventas/venta/', {'q': 'BUS-'})
+        self.assertEqual(list(response.context['cl'].result_list), [venta])
+
+    def test_autocompletar_productos(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/admin/autocomplete/', {
+            'term': 'lámp', 'app_label': 'ventas', 'model_name': 'detalleventa', 'field_name': 'producto',
+        })
+        self.assertEqual([r['id'] for r in response.json()['results']], [str(self.lampara.pk)])
+
+
+class PaginacionKeysetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        poblar(escala=3)
+        # Fechas repetidas para probar el desempate por id
+        Venta.objects.filter(pk__in=Venta.objects.order_by('pk').values('pk')[:10]).update(
+            fecha=Venta.objects.order_by('pk').first().fecha
+        )
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+
+    def test_recorre_todo_en_ambas_direcciones(self):
+        paginador = PaginadorKeyset(Venta.objects.all(), ('-fecha', '-id'), tamano=7)
+        esperado = list(Venta.objects.order_by('-fecha', '-id'))
+        paginas, pagina = [], paginador.pagina()
+        while True:
+            paginas.append(pagina)
+            if not pagina.siguiente:
+                break
+            pagina = paginador.pagina(pagina.siguiente)
+        self.assertEqual([venta for pagina in paginas for venta in pagina], esperado)
+        self.assertIsNone(paginas[0].anterior)
+
+        anterior = paginador.pagina(paginas[-1].anterior)
+        self.assertEqual(anterior.objetos, paginas[-2].objetos)
+
+    def test_pagina_profunda_sin_offset_ni_count(self):
+        paginador = PaginadorKeyset(DetalleVenta.objects.all(), ('venta_id', 'id'), tamano=5)
+        pagina = paginador.pagina(paginador.pagina().siguiente)
+        with CaptureQueriesContext(connection) as consultas:
+            paginador.pagina(pagina.siguiente)
+        self.assertEqual(len(consultas), 1)
+        self.assertNotIn('OFFSET', consultas[0]['sql'])
+        self.assertNotIn('COUNT', consultas[0]['sql'])
+
+    def test_cursor_invalido(self):
+        with self.assertRaises(ValueError):
+            PaginadorKeyset(Venta.objects.all(), ('-fecha', '-id')).pagina('no-es-un-cursor')
+        for valores in ([{}, 1], [[2024], 1], ['2024-01-01T00:00:00', [1]]):
+            with self.subTest(valores=valores), self.assertRaises(ValueError):
+                PaginadorKeyset(Venta.objects.all(), ('-fecha', '-id')).pagina(codificar_cursor(valores))
+
+    def test_endpoint_json(self):
+        self.client.force_login(self.admin)
+        datos = self.client.get('/ventas/api/ventas/', {'tamano': 20}).json()
+        self.assertEqual(len(datos['resultados']), 20)
+        segunda = self.client.get('/ventas/api/ventas/', {'tamano': 20, 'cursor': datos['siguiente']}).json()
+        self.assertEqual(len(segunda['resultados']), 10)
+        self.assertIsNone(segunda['siguiente'])
+        ids = [fila['id'] for fila in datos['resultados'] + segunda['resultados']]
+        self.assertEqual(ids, list(Venta.objects.order_by('-fecha', '-id').values_list('id', flat=True)))
+        self.assertEqual(self.client.get('/ventas/api/ventas/', {'cursor': 'x'}).status_code, 400)
+
+        venta = Venta.objects.order_by('pk').first()
+        detalles = self.client.get('/ventas/api/detalles/', {'venta': venta.pk}).json()['resultados']
+        self.assertEqual({fila['venta_id'] for fila in detalles}, {venta.pk})
+        # '²' pasa isdigit() pero no es un id: se ignora el filtro
+        self.assertEqual(self.client.get('/ventas/api/detalles/', {'venta': '²'}).status_code, 200)
+
+    def test_admin_pagina_con_cursor(self):
+        self.client.force_login(self.admin)
+        model_admin = admin.site._registry[Venta]
+        with mock.patch.object(model_admin, 'list_per_page', 20):
+            response = self.client.get('/admin/ventas/venta/')
+            cl = response.context['cl']
+            self.assertEqual(len(cl.result_list), 20)
+            self.assertContains(response, 'Siguiente')
+            response = self.client.get('/admin/ventas/venta/' + cl.url_siguiente)
+        resto = response.context['cl'].result_list
+        self.assertEqual(len(resto), 10)
+        self.assertContains(response, 'Anterior')
+        self.assertNotContains(response, 'Siguiente')
+
+
+@skipIf(analitica.np is None, 'requiere numpy')
+class AnaliticaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        poblar(escala=3)
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+
+    def test_reportes_coinciden_con_el_orm(self):
+        datos = analitica.ColumnasVentas(chunk_size=7)
+        self.assertEqual(len(datos.venta_id), Venta.objects.count())
+        self.assertEqual(len(datos.producto_id), DetalleVenta.objects.count())
+        self.assertEqual(analitica.verificar(datos), {
+            'top_productos': [], 'categorias': [], 'rfm': [], 'descuentos': [],
+        })
+
+    def test_totales(self):
+        datos = analitica.ColumnasVentas()
+        bruto = DetalleVenta.objects.aggregate(total=Sum('monto_total'))['total']
+        categorias = analitica.ingresos_por_categoria(datos)
+        self.assertEqual(sum(fila['bruto'] for fila in categorias), bruto)
+        descuentos = analitica.impacto_descuentos(datos)
+        self.assertEqual(sum(fila['ventas'] for fila in descuentos), Venta.objects.count())
+        self.assertEqual(sum(fila['bruto'] for fila in descuentos), bruto)
+        self.assertEqual(sum(fila['monto'] for fila in descuentos), Venta.objects.aggregate(total=Sum('monto'))['total'])
+        clientes = analitica.rfm(datos)
+        self.assertEqual(len(clientes), Venta.objects.values('cliente_id').distinct().count())
+        self.assertTrue(all(1 <= fila[puntaje] <= 5 for fila in clientes for puntaje in 'rfm'))
+
+    def test_venta_creada_entre_las_dos_lecturas(self):
+        ventas = list(Venta.objects.order_by('pk').values_list('pk', flat=True))
+        hueco = Venta.objects.get(pk=ventas[len(ventas) // 2])
+        pk = hueco.pk
+        lineas = list(hueco.detalleventa_set.values('producto_id', 'precio_momento', 'cantidad', 'monto_total'))
+        hueco.delete()
+        filtrar = analitica.ColumnasVentas.filtrar
+
+        def otra_transaccion(columnas, queryset, campo):
+            # Una venta confirmada tarde con un id dentro del rango ya leído
+            if queryset.model is DetalleVenta and not Venta.objects.filter(pk=pk).exists():
+                venta = Venta.objects.create(pk=pk, numero_factura='TARDE-1', cliente=hueco.cliente, monto=0)
+                DetalleVenta.objects.bulk_create([DetalleVenta(venta=venta, **linea) for linea in lineas])
+            return filtrar(columnas, queryset, campo)
+
+        with mock.patch.object(analitica.ColumnasVentas, 'filtrar', otra_transaccion):
+            datos = analitica.ColumnasVentas()
+        self.assertNotIn(pk, datos.venta_id)
+        self.assertEqual(len(datos.producto_id), DetalleVenta.objects.exclude(venta_id=pk).count())
+        subtotales = dict(zip(datos.venta_id.tolist(), datos.subtotal.tolist()))
+        esperado = DetalleVenta.objects.exclude(venta_id=pk).values('venta_id').annotate(total=Sum('monto_total'))
+        self.assertEqual(subtotales, {fila['venta_id']: int(fila['total'] * 100) for fila in esperado})
+
+    def test_periodo_sin_ventas(self):
+        datos = analitica.ColumnasVentas(desde=timezone.now() + timedelta(days=1))
+        self.assertEqual(analitica.top_productos(datos), [])
+        self.assertEqual(analitica.rfm(datos), [])
+        self.assertEqual([fila['ventas'] for fila in analitica.impacto_descuentos(datos)], [0, 0, 0, 0])
+
+    def test_comando_y_endpoint(self):
+        salida = StringIO()
+        call_command('analitica_ventas', verificar=True, n=3, stdout=salida)
+        self.assertIn('coinciden', salida.getvalue())
+
+        url = '/ventas/analitica/top_productos/'
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.admin)
+        datos = self.client.get(url, {'n': 5}).json()
+        self.assertEqual(len(datos['resultados']), 5)
+        self.assertEqual(self.client.get('/ventas/analitica/otro/').status_code, 404)
+        self.assertEqual(self.client.get(url, {'hasta': '2024-02-30'}).status_code, 400)
+        # '²' es un dígito para isdigit() pero int() no lo acepta
+        self.assertEqual(len(self.client.get(url, {'n': '²'}).json()['resultados']), 10)
+
+
+class ArchivoVentasTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        poblar(escala=3)
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+
+    def corte(self):
+        # La mitad más antigua de las ventas
+        fechas = list(Venta.objects.order_by('fecha').values_list('fecha', flat=True))
+        return fechas[len(fechas) // 2]
+
+    def test_archiva_por_lotes_y_resume_por_mes(self):
+        corte = self.corte()
+        antiguas = Venta.objects.filter(fecha__lt=corte)
+        esperado = {
+            'ventas': antiguas.count(),
+            'lineas': DetalleVenta.objects.filter(venta__in=antiguas).count(),
+            'monto': antiguas.aggregate(total=Sum('monto'))['total'],
+            'bruto': DetalleVenta.objects.filter(venta__in=antiguas).aggregate(total=Sum('monto_total'))['total'],
+        }
+        total = Venta.objects.count()
+
+        resultado = archivo.archivar(corte, lote=4)
+        self.assertEqual(resultado['ventas'], esperado['ventas'])
+        self.assertEqual(resultado['lineas'], esperado['lineas'])
+        self.assertEqual(resultado['lotes'], -(-esperado['ventas'] // 4))
+        self.assertFalse(Venta.objects.filter(fecha__lt=corte).exists())
+        self.assertEqual(Venta.objects.count() + VentaArchivada.objects.count(), total)
+        self.assertEqual(DetalleVentaArchivada.objects.count(), esperado['lineas'])
+
+        resumen = ResumenMensualArchivo.objects.aggregate(
+            ventas=Sum('ventas'), lineas=Sum('lineas'), monto=Sum('monto'), bruto=Sum('bruto')
+        )
+        self.assertEqual(resumen, esperado)
+        for venta in VentaArchivada.objects.all():
+            self.assertEqual(venta.mes, archivo.mes_de(venta.fecha))
+
+        # Repetir no mueve nada más
+        self.assertEqual(archivo.archivar(corte)['ventas'], 0)
+
+    def test_buscar_factura_vigente_y_archivada(self):
+        corte = self.corte()
+        antigua = Venta.objects.filter(fecha__lt=corte).first()
+        lineas = antigua.detalleventa_set.count()
+        reciente = Venta.objects.filter(fecha__gte=corte).first()
+        call_command('archivar_ventas', antes=corte, stdout=StringIO())
+
+        venta = archivo.buscar_factura(antigua.numero_factura)
+        self.assertIsInstance(venta, VentaArchivada)
+        self.assertIsNotNone(venta.archivada)
+        self.assertEqual(venta.detalleventa_set.count(), lineas)
+        venta = archivo.buscar_factura(reciente.numero_factura)
+        self.assertIsInstance(venta, Venta)
+        self.assertIsNone(venta.archivada)
+        self.assertIsNone(archivo.buscar_factura('NO-EXISTE'))
+
+        self.client.force_login(self.admin)
+        datos = self.client.get(f'/ventas/factura/{antigua.numero_factura}/').json()
+        self.assertEqual(datos['id'], antigua.pk)
+        self.assertEqual(len(datos['detalles']), lineas)
+        self.assertEqual(self.client.get('/ventas/factura/NO-EXISTE/').status_code, 404)
+
+    def test_factura_ya_archivada_no_bloquea_el_archivo(self):
+        corte = self.corte()
+        antigua = Venta.objects.filter(fecha__lt=corte).order_by('pk').first()
+        archivo.archivar_lote([antigua.pk])
+        # Mismo número que una archivada (por ejemplo tras volver a poblar)
+        repetida = Venta.objects.create(
+            numero_factura=antigua.numero_factura, cliente=antigua.cliente, monto=0,
+        )
+        Venta.objects.filter(pk=repetida.pk).update(fecha=antigua.fecha)
+        pendientes = Venta.objects.filter(fecha__lt=corte).count()
+
+        resultado = archivo.archivar(corte, lote=2)
+        self.assertEqual(resultado['rechazadas'], [antigua.numero_factura])
+        self.assertEqual(resultado['ventas'], pendientes - 1)
+        self.assertEqual(list(Venta.objects.filter(fecha__lt=corte).values_list('pk', flat=True)), [repetida.pk])
+
+        with self.assertRaisesMessage(ErrorIngesta, 'ya existe en el archivo'):
+            ingresar_ventas([{
+                'numero_factura': antigua.numero_factura, 'cliente': antigua.cliente.codigo,
+                'lineas': [{'producto': Producto.objects.first().pk, 'cantidad': 1}],
+            }])
+
+    def test_fecha_corte_y_router(self):
+        corte = archivo.fecha_corte(14)
+        hoy = timezone.localdate()
+        self.assertEqual(corte.day, 1)
+        self.assertEqual((hoy.year * 12 + hoy.month) - (corte.year * 12 + corte.month), 14)
+
+        from .routers import ArchivoRouter
+        router = ArchivoRouter()
+        with self.settings(VENTAS_ARCHIVO_DB='archivo'):
+            self.assertEqual(router.db_for_read(VentaArchivada), 'archivo')
+            self.assertIsNone(router.db_for_read(Venta))
+            self.assertTrue(router.allow_migrate('archivo', 'ventas', 'detalleventaarchivada'))
+            self.assertFalse(router.allow_migrate('default', 'ventas', 'ventaarchivada'))
+            self.assertFalse(router.allow_migrate('archivo', 'ventas', 'venta'))
+
+
+class ResumenClienteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        poblar(escala=2)
+
+    def esperado(self, cliente):
+        ventas = Venta.objects.filter(cliente=cliente)
+        return {
+            'ventas': ventas.count(),
+            'monto_total': (ventas.aggregate(total=Sum('monto'))['total'] or Decimal('0')).quantize(Decimal('0.01')),
+        }
+
+    def resumen(self, cliente):
+        resumen = ResumenCliente.objects.get(cliente=cliente)
+        return {'ventas': resumen.ventas, 'monto_total': resumen.monto_total.quantize(Decimal('0.01'))}
+
+    def test_poblar_construye_resumen(self):
+        cliente = Cliente.objects.filter(venta__isnull=False).first()
+        self.assertEqual(self.resumen(cliente), self.esperado(cliente))
+        self.assertEqual(ResumenCliente.objects.count(), Cliente.objects.filter(venta__isnull=False).distinct().count())
+        ventas = Venta.objects.filter(cliente=cliente)
+        resumen = ResumenCliente.objects.get(cliente=cliente)
+        self.assertEqual(resumen.primera_compra, ventas.order_by('fecha').first().fecha)
+        self.assertEqual(resumen.ultima_compra, ventas.order_by('-fecha').first().fecha)
+        favorita = DetalleVenta.objects.filter(venta__cliente=cliente).values('producto__categoria').annotate(
+            total=Sum('monto_total')
+        ).order_by('-total', 'producto__categoria').first()['producto__categoria']
+        self.assertEqual(resumen.categoria_favorita_id, favorita)
+
+    def test_se_mantiene_al_guardar_cambiar_y_borrar(self):
+        cliente = Cliente.objects.create(codigo='RES001', nombre='Cliente resumen', direccion=Direccion.objects.first())
+        otro = Cliente.objects.filter(venta__isnull=False).exclude(pk=cliente.pk).first()
+        producto = Producto.objects.first()
+
+        venta = Venta.objects.create(numero_factura='RES-1', cliente=cliente, monto=0)
+        DetalleVenta.objects.create(venta=venta, producto=producto, precio_momento=10, cantidad=3, monto_total=30)
+        venta.actualizar_monto()
+        self.assertEqual(self.resumen(cliente), {'ventas': 1, 'monto_total': Decimal('30.00')})
+        self.assertEqual(ResumenCliente.objects.get(cliente=cliente).categoria_favorita_id, producto.categoria_id)
+
+        # Segunda venta: suma sin recalcular (un solo UPDATE)
+        with CaptureQueriesContext(connection) as consultas:
+            Venta.objects.create(numero_factura='RES-2', cliente=cliente, monto=Decimal('5.50'))
+        self.assertEqual(len(consultas), 2)
+        self.assertEqual(self.resumen(cliente), {'ventas': 2, 'monto_total': Decimal('35.50')})
+
+        # Cambiar de cliente recalcula a los dos
+        venta.cliente = otro
+        venta.save()
+        self.assertEqual(self.resumen(cliente), self.esperado(cliente))
+        self.assertEqual(self.resumen(otro), self.esperado(otro))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Venta.objects.filter(numero_factura='RES-2').delete()
+        self.assertFalse(ResumenCliente.objects.filter(cliente=cliente).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            venta.delete()
+        self.assertEqual(self.resumen(otro), self.esperado(otro))
+
+    def test_borrado_masivo_recalcula_una_vez(self):
+        self.assertGreater(Venta.objects.count(), 10)
+        with CaptureQueriesContext(connection) as consultas:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                Venta.objects.all().delete()
+        # Antes: un recálculo (seis consultas) por venta
+        self.assertEqual(len(callbacks), 1)
+        self.assertLess(len(consultas), 15)
+        self.assertFalse(ResumenCliente.objects.exists())
+
+    def test_archivo_e_ingesta_y_comando(self):
+        cliente = Cliente.objects.filter(venta__isnull=False).first()
+        antes = self.resumen(cliente)
+        archivo.archivar(timezone.now() + timedelta(days=1))
+        self.assertFalse(Venta.objects.exists())
+        # Las ventas archivadas siguen contando, también al recalcular
+        self.assertEqual(self.resumen(cliente), antes)
+        call_command('reconstruir_resumen_clientes', stdout=StringIO())
+        self.assertEqual(self.resumen(cliente), antes)
+
+        producto = Producto.objects.filter(stock__gte=2).first()
+        ingresar_ventas([{
+            'numero_factura': 'RES-ING', 'cliente': cliente.codigo,
+            'lineas': [{'producto': producto.pk, 'cantidad': 2}],
+        }])
+        self.assertEqual(self.resumen(cliente)['ventas'], antes['ventas'] + 1)
+
+    def test_admin_ordena_por_resumen(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(admin_user)
+        columnas = admin.site._registry[Cliente].list_display
+        orden = columnas.index('monto_total') + 1
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(f'/admin/ventas/cliente/?o=-{orden}')
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(consultas), 10)
+        primero = response.context['cl'].result_list[0]
+        self.assertEqual(primero.resumen.monto_total, ResumenCliente.objects.order_by('-monto_total').first().monto_total)
+
+
+class ImportacionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        poblar()
+
+    def test_proveedores_y_productos_con_upsert_y_errores(self):
+        proveedores = StringIO(
+            'codigo,nombre,telefono,web,calle,numero,comuna,ciudad\n'
+            'IMP01,Importado Uno,+56911111111,,Av. Nueva,1,Ñuñoa,Santiago\n'
+            'IMP02,Importado Dos,+56922222222,https://dos.cl,Av. Nueva,1,Ñuñoa,Santiago\n'
+            ',Sin código,+5690,,Calle,2,Comuna,Ciudad\n'
+        )
+        resultado = importar(proveedores, 'proveedores', lote=2, procesos=1)
+        self.assertEqual(resultado['importados'], 2)
+        self.assertEqual([linea for linea, _ in resultado['errores']], [4])
+        uno, dos = Proveedor.objects.filter(codigo__in=['IMP01', 'IMP02']).order_by('codigo')
+        self.assertEqual(uno.direccion_id, dos.direccion_id)
+        self.assertCountEqual(busqueda.buscar('proveedor', 'IMP0'), [uno.pk, dos.pk])
+
+        existente = Producto.objects.first()
+        productos = StringIO(
+            'id,nombre,precio,stock,categoria,proveedores\n'
+            f'{existente.pk},{existente.nombre},1.50,7,{existente.categoria.nombre},IMP01|IMP02\n'
+            ',Producto importado,10,3,Categoría importada,IMP01\n'
+            ',Otro,abc,3,Categoría importada,\n'
+            ',Tercero,5,1,Categoría importada,NO-EXISTE\n'
+            ',Cuarto,NaN,1,Categoría importada,\n'
+        )
+        resultado = importar(productos, 'productos', procesos=1)
+        self.assertEqual(resultado['importados'], 2)
+        self.assertEqual([linea for linea, _ in resultado['errores']], [4, 5, 6])
+        existente.refresh_from_db()
+        self.assertEqual((existente.precio, existente.stock), (Decimal('1.50'), 7))
+        self.assertEqual(set(existente.proveedores.values_list('codigo', flat=True)), {'IMP01', 'IMP02'})
+        nuevo = Producto.objects.get(nombre='Producto importado')
+        self.assertEqual(nuevo.categoria.nombre, 'Categoría importada')
+
+        # Reimportar por nombre actualiza en vez de duplicar
+        resultado = importar(StringIO('nombre,precio,stock,categoria\nProducto importado,12,3,Categoría importada\n'), 'productos', procesos=1)
+        self.assertEqual(resultado['importados'], 1)
+        self.assertEqual(Producto.objects.get(nombre='Producto importado').precio, Decimal('12.00'))
+
+    def test_ventas_exportadas_se_reimportan_en_paralelo(self):
+        csv_exportado = StringIO()
+        call_command('exportar_ventas', formato='csv', stdout=csv_exportado)
+        esperado = {
+            venta.numero_factura: (venta.monto, venta.detalleventa_set.count())
+            for venta in Venta.objects.prefetch_related('detalleventa_set')
+        }
+        resumenes_antes = dict(ResumenCliente.objects.values_list('cliente_id', 'ventas'))
+        DetalleVenta.objects.all().delete()
+        Venta.objects.all().delete()
+
+        csv_exportado.seek(0)
+        resultado = importar(csv_exportado, 'ventas', lote=3, procesos=2)
+        self.assertEqual(resultado['errores'], [])
+        self.assertEqual(resultado['importados'], len(esperado))
+        obtenido = {
+            venta.numero_factura: (venta.monto, venta.detalleventa_set.count())
+            for venta in Venta.objects.prefetch_related('detalleventa_set')
+        }
+        self.assertEqual(obtenido, esperado)
+        self.assertEqual(dict(ResumenCliente.objects.values_list('cliente_id', 'ventas')), resumenes_antes)
+
+        # JSONL de las mismas ventas: actualiza sin duplicar, y reporta las inválidas
+        jsonl = StringIO()
+        call_command('exportar_ventas', formato='jsonl', stdout=jsonl)
+        jsonl = StringIO(jsonl.getvalue() + '{"numero_factura": "X-1", "cliente": "NO-EXISTE", "fecha": "2024-01-01",'
+                         ' "detalles": [{"producto_id": 1, "precio_momento": "1", "cantidad": 1}]}\nno es json\n')
+        resultado = importar(jsonl, 'ventas', 'jsonl', procesos=1)
+        self.assertEqual(resultado['importados'], len(esperado))
+        self.assertEqual([linea for linea, _ in resultado['errores']], [len(esperado) + 1, len(esperado) + 2])
+        self.assertEqual(Venta.objects.count(), len(esperado))
+        self.assertEqual(DetalleVenta.objects.count(), sum(lineas for _, lineas in esperado.values()))
+
+    def test_reimportar_ventas_resumidas_reconstruye_resumenes_diarios(self):
+        resumenes.refrescar(margen=timedelta(0))
+        venta = Venta.objects.order_by('pk').first()
+        detalle = venta.detalleventa_set.order_by('pk').first()
+        archivo_csv = StringIO(
+            'numero_factura,fecha,cliente_codigo,descuento,producto_id,precio_momento,cantidad\n'
+            f'{venta.numero_factura},{venta.fecha.isoformat()},{venta.cliente.codigo},0,'
+            f'{detalle.producto_id},{detalle.precio_momento},{detalle.cantidad + 5}\n'
+        )
+        resultado = importar(archivo_csv, 'ventas', procesos=1)
+        self.assertEqual(resultado['errores'], [])
+        self.assertTrue(resultado['resumenes_reconstruidos'])
+        self.assertEqual(
+            ResumenVentaProducto.objects.aggregate(total=Sum('cantidad'))['total'],
+            DetalleVenta.objects.aggregate(total=Sum('cantidad'))['total'],
+        )
+
+    def test_comando(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'productos.csv')
+            with open(ruta, 'w', encoding='utf-8') as archivo:
+                archivo.write('nombre,precio\nX,1\n')
+            with self.assertRaisesMessage(CommandError, 'Faltan columnas'):
+                call_command('importar_datos', 'productos', ruta, stdout=StringIO())
+            with open(ruta, 'w', encoding='utf-8') as archivo:
+                archivo.write('nombre,precio,stock,categoria\nX,1,1,C\nY,-1,1,C\n')
+            errores = os.path.join(directorio, 'errores.csv')
+            salida = StringIO()
+            call_command('importar_datos', 'productos', ruta, procesos=1, errores=errores, stdout=salida)
+            self.assertIn('Importados 1 de 2 registros (1 errores)', salida.getvalue())
+            with open(errores, encoding='utf-8') as archivo:
+                self.assertEqual(list(csv.reader(archivo))[1][0], '3')
+
+
+class SnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        poblar(escala=2)
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.ruta = os.path.join(directorio.name, 'ventas.snap')
+
+    def datos(self):
+        return {
+            modelo._meta.label_lower: list(modelo.objects.order_by('pk').values_list())
+            for modelo in snapshot.MODELOS
+        }
+
+    def test_volcar_y_restaurar_conserva_los_datos(self):
+        antes = self.datos()
+        resumenes = list(ResumenCliente.objects.order_by('pk').values_list('cliente_id', 'ventas', 'monto_total'))
+        filas = snapshot.volcar(self.ruta)
+        self.assertEqual(filas['ventas.detalleventa'], DetalleVenta.objects.count())
+
+        with snapshot.Lector(self.ruta) as lector:
+            columnas = {
+                columna['nombre']: columna
+                for tabla in lector.manifiesto['modelos'] if tabla['modelo'] == 'ventas.direccion'
+                for columna in tabla['columnas']
+            }
+        self.assertEqual(columnas['calle']['codificacion'], 'diccionario')
+
+        with self.assertRaises(snapshot.ErrorSnapshot):
+            snapshot.restaurar(self.ruta)
+        snapshot.restaurar(self.ruta, limpiar=True)
+        self.assertEqual(self.datos(), antes)
+        self.assertEqual(list(ResumenCliente.objects.order_by('pk').values_list('cliente_id', 'ventas', 'monto_total')), resumenes)
+        cliente = Cliente.objects.first()
+        self.assertIn(cliente.pk, busqueda.buscar('cliente', cliente.codigo))
+
+        # Las secuencias siguen después de los ids restaurados
+        venta = Venta.objects.create(numero_factura='SNAP-1', cliente=cliente, monto=0)
+        self.assertGreater(venta.pk, max(fila[0] for fila in antes['ventas.venta']))
+
+    def test_archivo_invalido(self):
+        with open(self.ruta, 'wb') as archivo:
+            archivo.write(b'no es un snapshot' * 4)
+        with self.assertRaisesMessage(snapshot.ErrorSnapshot, 'no es un snapshot'):
+            snapshot.restaurar(self.ruta, limpiar=True)
+        self.assertTrue(Venta.objects.exists())
+        with self.assertRaises(CommandError):
+            call_command('restaurar_snapshot', self.ruta, stdout=StringIO())
+
+
+class DireccionesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        poblar()
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+
+    def test_internar_reutiliza_direcciones_y_comunas(self):
+        existente = Direccion.objects.select_related('comuna__ciudad').first()
+        ids = direcciones.internar_varias([
+            (existente.calle, existente.numero, existente.comuna.nombre, existente.comuna.ciudad.nombre),
+            (f' {existente.calle}  ', existente.numero, existente.comuna.nombre, existente.comuna.ciudad.nombre),
+            ('Av. Nueva', '1', 'Ñuñoa', 'Santiago'),
+            ('Av.  Nueva', '1 ', ' Ñuñoa', 'Santiago'),
+        ])
+        self.assertEqual(len(set(ids.values())), 2)
+        self.assertIn(existente.pk, ids.values())
+        self.assertEqual(Ciudad.objects.count(), 1)
+        nueva = Direccion.objects.get(pk=direcciones.internar('Av. Nueva', '1', 'Ñuñoa', 'Santiago'))
+        self.assertEqual(str(nueva), 'Av. Nueva 1, Ñuñoa, Santiago')
+        self.assertEqual(Comuna.objects.filter(nombre='Ñuñoa').count(), 1)
+
+    def test_fusionar_duplicadas(self):
+        original = Direccion.objects.first()
+        copia = Direccion.objects.create(calle=f'{original.calle}  ', numero=original.numero, comuna=original.comuna)
+        cliente = Cliente.objects.first()
+        cliente.direccion = copia
+        cliente.save()
+        clientes = Cliente.objects.count()
+
+        salida = StringIO()
+        call_command('normalizar_direcciones', stdout=salida)
+        self.assertIn('fusionadas 1 repetidas', salida.getvalue())
+        self.assertFalse(Direccion.objects.filter(pk=copia.pk).exists())
+        cliente.refresh_from_db()
+        self.assertEqual(cliente.direccion_id, original.pk)
+        self.assertEqual(Cliente.objects.count(), clientes)
+
+    def test_formularios_sin_una_consulta_por_direccion(self):
+        self.client.force_login(self.admin)
+        direcciones.internar_varias([(f'Calle {i}', '1', 'Centro', 'Temuco') for i in range(30)])
+        for url in ('/admin/ventas/cliente/add/', '/admin/ventas/proveedor/add/'):
+            with self.subTest(url=url), CaptureQueriesContext(connection) as consultas:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertLess(len(consultas), 15)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get('/admin/autocomplete/', {
+                'app_label': 'ventas', 'model_name': 'cliente', 'field_name': 'direccion', 'term': 'Calle',
+            })
+        self.assertEqual(len(response.json()['results']), 20)
+        self.assertLess(len(consultas), 10)
+
+    def test_editar_en_el_admin_interna_y_no_mueve_a_nadie(self):
+        self.client.force_login(self.admin)
+        compartida = Cliente.objects.first().direccion
+        clientes = set(Cliente.objects.filter(direccion=compartida).values_list('pk', flat=True))
+        url = f'/admin/ventas/direccion/{compartida.pk}/change/'
+        response = self.client.post(url, {'calle': 'Av. Otra', 'numero': '5', 'comuna': compartida.comuna_id})
+        self.assertEqual(response.status_code, 302)
+        compartida.refresh_from_db()
+        self.assertNotEqual(compartida.calle, 'Av. Otra')
+        self.assertEqual(set(Cliente.objects.filter(direccion=compartida).values_list('pk', flat=True)), clientes)
+        nueva = Direccion.objects.get(calle='Av. Otra', numero='5')
+
+        # Sin referencias la fila original se reemplaza; repetir una existente la reutiliza
+        response = self.client.post(f'/admin/ventas/direccion/{nueva.pk}/change/', {
+            'calle': compartida.calle, 'numero': f' {compartida.numero}', 'comuna': compartida.comuna_id,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Direccion.objects.filter(pk=nueva.pk).exists())
+
+        # Agregar una que ya existe tampoco crea otra fila
+        antes = Direccion.objects.count()
+        response = self.client.post('/admin/ventas/direccion/add/', {
+            'calle': f'{compartida.calle}  ', 'numero': compartida.numero, 'comuna': compartida.comuna_id,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Direccion.objects.count(), antes)
+
+        # Borrar una dirección en uso no arrastra a sus clientes
+        response = self.client.post(f'/admin/ventas/direccion/{compartida.pk}/delete/', {'post': 'yes'})
+        self.assertTrue(Direccion.objects.filter(pk=compartida.pk).exists())
+        self.assertEqual(Cliente.objects.filter(pk__in=clientes).count(), len(clientes))
+
+    def test_filtro_de_ciudad_por_clave(self):
+        self.client.force_login(self.admin)
+        ciudad = Ciudad.objects.get()
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get('/admin/ventas/cliente/', {'direccion__comuna__ciudad__id__exact': ciudad.pk})
+        self.assertEqual(response.context['cl'].result_count, Cliente.objects.count())
+        # Se compara la clave entera de la ciudad, no su nombre
+        self.assertTrue(any('"ventas_comuna"."ciudad_id" = ' in consulta['sql'] for consulta in consultas))
+        self.assertFalse(any('"ventas_ciudad"."nombre" = ' in consulta['sql'] for consulta in consultas))
+
+
+class HistorialPrecioTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        poblar()
+
+    def setUp(self):
+        catalogo.reiniciar()
+
+    def test_guardar_registra_solo_cambios_de_precio(self):
+        producto = Producto.objects.order_by('pk').first()
+        self.assertEqual(producto.historial_precios.count(), 1)
+        producto.stock += 1
+        producto.save()
+        producto.precio = Decimal('12.34')
+        producto.save()
+        self.assertEqual(
+            list(producto.historial_precios.order_by('vigente_desde').values_list('precio', flat=True))[-1],
+            Decimal('12.34'),
+        )
+        self.assertEqual(producto.historial_precios.count(), 2)
+
+    def test_ajuste_por_categoria_y_precio_momento(self):
+        categoria = Categoria.objects.order_by('pk').first()
+        antes = dict(Producto.objects.filter(categoria=categoria).values_list('pk', 'precio'))
+        venta_anterior = Venta.objects.order_by('pk').first()
+        salida = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('actualizar_precios', '5', categoria=categoria.nombre, stdout=salida)
+        self.assertIn(f'Actualizados {len(antes)} precios', salida.getvalue())
+        despues = dict(Producto.objects.filter(categoria=categoria).values_list('pk', 'precio'))
+        for pk, precio in antes.items():
+            self.assertEqual(despues[pk], (precio * Decimal('1.05')).quantize(Decimal('0.01')))
+        self.assertEqual(HistorialPrecio.objects.filter(producto__categoria=categoria).count(), 2 * len(antes))
+        self.assertEqual(HistorialPrecio.objects.exclude(producto__categoria=categoria).count(), Producto.objects.count() - len(antes))
+
+        # Una venta anterior al ajuste toma el precio de entonces; una nueva, el actual
+        pk = next(iter(antes))
+        self.assertEqual(precios.precio_en(pk, venta_anterior.fecha), antes[pk])
+        catalogo.obtener_catalogo().precio_en(pk, venta_anterior.fecha)
+        with self.assertNumQueries(0):
+            self.assertEqual(catalogo.obtener_catalogo().precio_en(pk, venta_anterior.fecha), antes[pk])
+            self.assertEqual(catalogo.obtener_catalogo().precio_en(pk, timezone.now()), despues[pk])
+        detalle = DetalleVenta.objects.create(venta=venta_anterior, producto_id=pk, cantidad=1)
+        self.assertEqual(detalle.precio_momento, antes[pk])
+        nueva = Venta.objects.create(numero_factura='HIST-1', cliente=venta_anterior.cliente, monto=0)
+        self.assertEqual(DetalleVenta.objects.create(venta=nueva, producto_id=pk, cantidad=1).precio_momento, despues[pk])
+
+        with self.assertRaises(CommandError):
+            call_command('actualizar_precios', '-100', stdout=StringIO())
+
+    def test_catalogo_lee_el_historial_de_cada_producto_al_pedirlo(self):
+        primero, segundo = Producto.objects.order_by('pk').values_list('pk', flat=True)[:2]
+        cat = catalogo.obtener_catalogo()
+        ayer = timezone.now() - timedelta(days=1)
+        cat.precio_en(primero)
+        with CaptureQueriesContext(connection) as consultas:
+            cat.precio_en(primero, ayer)
+        self.assertEqual(len(consultas), 1)
+        self.assertIn('"ventas_historialprecio"."producto_id" = ', consultas[0]['sql'])
+        self.assertEqual(list(cat._historial), [primero])
+        with self.assertNumQueries(0):
+            cat.precio_en(primero, ayer)
+        with self.assertNumQueries(1):
+            cat.precio_en(segundo, ayer)
+
+        # Un cambio de precio descarta solo el historial de ese producto
+        producto = Producto.objects.get(pk=primero)
+        producto.precio += 1
+        with self.captureOnCommitCallbacks(execute=True):
+            producto.save()
+        self.assertEqual(list(cat._historial), [segundo])
+        with self.assertNumQueries(1):
+            self.assertEqual(cat.precio_en(primero, timezone.now()), producto.precio)
+
+    def test_ajuste_registra_solo_los_productos_ajustados(self):
+        ahora = timezone.now()
+        categoria = Categoria.objects.order_by('pk').first()
+        ajustados = list(Producto.objects.filter(categoria=categoria).values_list('pk', flat=True))
+        # Otro producto modificado en el mismo instante no es parte del ajuste
+        otro = Producto.objects.exclude(categoria=categoria).order_by('pk').first()
+        Producto.objects.filter(pk=otro.pk).update(modificado=ahora)
+        antes = HistorialPrecio.objects.count()
+        with mock.patch('ventas.precios.timezone.now', return_value=ahora):
+            actualizados = precios.ajustar(Producto.objects.filter(categoria=categoria), 5, lote=2)
+        self.assertEqual(actualizados, len(ajustados))
+        self.assertEqual(HistorialPrecio.objects.count(), antes + len(ajustados))
+        self.assertEqual(
+            sorted(HistorialPrecio.objects.filter(vigente_desde=ahora).values_list('producto_id', flat=True)),
+            sorted(ajustados),
+        )
+
+    @skipIf(connection.vendor != 'sqlite', 'el plan depende del motor')
+    def test_consulta_por_fecha_usa_el_indice(self):
+        producto = Producto.objects.order_by('pk').first()
+        consulta = HistorialPrecio.objects.filter(
+            producto=producto, vigente_desde__lte=timezone.now()
+        ).order_by('-vigente_desde').values_list('precio', flat=True)[:1]
+        self.assertIn('historial_precio_vigencia_idx', consulta.explain())
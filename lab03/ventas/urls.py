@@ -0,0 +1,14 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'ventas'
+
+urlpatterns = [
+    path('exportar/<str:formato>/', views.exportar_ventas, name='exportar'),
+    path('ingresar/', views.ingresar, name='ingresar'),
+    path('api/ventas/', views.listar_ventas, name='listar_ventas'),
+    path('api/detalles/', views.listar_detalles, name='listar_detalles'),
+    path('factura/<str:numero_factura>/', views.detalle_factura, name='factura'),
+    path('analitica/<str:reporte>/', views.reporte_analitica, name='analitica'),
+]
@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+from datetime import datetime, time
+
+from django.utils import timezone
+
+
+@contextmanager
+def fecha_manual(modelo, campo='fecha'):
+    """
+    Desactiva temporalmente auto_now_add de un campo de fecha.
+    Permite insertar en bloque filas con fechas históricas sin tener que
+    actualizarlas después con un segundo UPDATE.
+    """
+    field = modelo._meta.get_field(campo)
+    auto_now_add = field.auto_now_add
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = auto_now_add
+
+
+def en_lotes(iterable, tamano):
+    """Agrupa un iterable en listas de a lo más ``tamano`` elementos"""
+    lote = []
+    for elemento in iterable:
+        lote.append(elemento)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def normalizar_espacios(texto):
+    """Quita espacios al inicio y al final y deja uno solo entre palabras"""
+    return ' '.join(str(texto).split())
+
+
+def inicio_del_dia(fecha):
+    """Datetime con zona horaria al comienzo de una fecha (o None)"""
+    if fecha is None:
+        return None
+    return timezone.make_aware(datetime.combine(fecha, time.min))
@@ -1,3 +1,150 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.contrib.auth.decorators import permission_required
+from django.db import IntegrityError
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import require_POST
+import json
+
+from . import analitica
+from .archivo import buscar_factura
+from .exportacion import CONTENT_TYPES, GENERADORES, filas_detalle
+from .ingesta import ErrorIngesta, StockInsuficiente, ingresar_ventas
+from .models import DetalleVenta, Venta
+from .paginacion import PaginadorKeyset
+from .utils import inicio_del_dia
+
+def _rango_fechas(request):
+    """
+    (desde, hasta) de ?desde= y ?hasta= (AAAA-MM-DD, opcionales). Lanza
+    ValueError si alguno no es una fecha válida, como 2024-02-30.
+    """
+    fechas = []
+    for parametro in ('desde', 'hasta'):
+        texto = request.GET.get(parametro, '')
+        fecha = parse_date(texto) if texto else None
+        if texto and fecha is None:
+            raise ValueError(f'Fecha inválida en {parametro}: {texto}')
+        fechas.append(inicio_del_dia(fecha))
+    return fechas
+
 
 # Create your views here.
+@staff_member_required
+def exportar_ventas(request, formato):
+    """Descarga de ventas en streaming (CSV o JSON Lines)"""
+    if formato not in GENERADORES:
+        raise Http404('Formato no soportado')
+    try:
+        desde, hasta = _rango_fechas(request)
+    except ValueError as error:
+        return JsonResponse({'errores': [str(error)]}, status=400)
+    filas = filas_detalle(desde, hasta)
+    response = StreamingHttpResponse(GENERADORES[formato](filas), content_type=CONTENT_TYPES[formato])
+    response['Content-Disposition'] = f'attachment; filename="ventas.{formato}"'
+    return response
+
+
+@require_POST
+@permission_required('ventas.add_venta', raise_exception=True)
+def ingresar(request):
+    """
+    Ingreso de un lote de facturas en JSON: {"facturas": [...]}.
+    Responde 201 con las ventas creadas, 400 si el lote no es válido y
+    409 si falta stock o si otra solicitud ingresó a la vez el mismo número
+    de factura (en todos los casos no se guarda nada).
+    """
+    try:
+        facturas = json.loads(request.body).get('facturas')
+    except (ValueError, AttributeError):
+        return JsonResponse({'errores': ['JSON inválido']}, status=400)
+    try:
+        ventas = ingresar_ventas(facturas)
+    except StockInsuficiente as error:
+        return JsonResponse({'errores': error.errores}, status=409)
+    except ErrorIngesta as error:
+        return JsonResponse({'errores': error.errores}, status=400)
+    except IntegrityError:
+        # La validación de números repetidos corre antes de la transacción de escritura
+        return JsonResponse({'errores': ['Alguna factura del lote ya fue ingresada por otra solicitud']}, status=409)
+    return JsonResponse(
+        {'ventas': [
+            {'id': venta.pk, 'numero_factura': venta.numero_factura, 'monto': str(venta.monto)}
+            for venta in ventas
+        ]},
+        status=201,
+    )
+
+
+def _pagina_json(request, queryset, campos):
+    """Respuesta JSON de una página keyset; ?cursor= y ?tamano= (máximo 500)"""
+    try:
+        tamano = min(max(int(request.GET.get('tamano', 50)), 1), 500)
+        pagina = PaginadorKeyset(queryset, campos, tamano).pagina(request.GET.get('cursor'))
+    except ValueError:
+        return JsonResponse({'errores': ['Parámetros de paginación inválidos']}, status=400)
+    return JsonResponse({
+        'resultados': pagina.objetos,
+        'siguiente': pagina.siguiente,
+        'anterior': pagina.anterior,
+    })
+
+
+@staff_member_required
+def listar_ventas(request):
+    """Ventas de la más reciente a la más antigua, paginadas por (fecha, id)"""
+    ventas = Venta.objects.values('id', 'numero_factura', 'fecha', 'cliente_id', 'descuento', 'monto')
+    return _pagina_json(request, ventas, ('-fecha', '-id'))
+
+
+@staff_member_required
+def listar_detalles(request):
+    """Líneas de venta paginadas por (venta_id, id); ?venta= filtra una venta"""
+    detalles = DetalleVenta.objects.values(
+        'id', 'venta_id', 'producto_id', 'precio_momento', 'cantidad', 'monto_total'
+    )
+    if request.GET.get('venta', '').isdecimal():
+        detalles = detalles.filter(venta_id=request.GET['venta'])
+    return _pagina_json(request, detalles, ('venta_id', 'id'))
+
+
+@staff_member_required
+def reporte_analitica(request, reporte):
+    """
+    Reporte de analítica en JSON (ver ventas.analitica); acepta ?desde= y
+    ?hasta= (AAAA-MM-DD) y ?n= para el top de productos.
+    """
+    if reporte not in analitica.REPORTES:
+        raise Http404('Reporte no disponible')
+    opciones = {}
+    if reporte == 'top_productos':
+        opciones['n'] = min(max(int(request.GET['n']), 1), 1000) if request.GET.get('n', '').isdecimal() else 10
+    try:
+        desde, hasta = _rango_fechas(request)
+    except ValueError as error:
+        return JsonResponse({'errores': [str(error)]}, status=400)
+    try:
+        datos = analitica.ColumnasVentas(desde, hasta)
+    except ImportError as error:
+        return JsonResponse({'errores': [str(error)]}, status=501)
+    return JsonResponse({'reporte': reporte, 'resultados': analitica.calcular(reporte, datos, **opciones)})
+
+
+@staff_member_required
+def detalle_factura(request, numero_factura):
+    """Venta y sus líneas por número de factura, esté vigente o archivada"""
+    venta = buscar_factura(numero_factura)
+    if venta is None:
+        raise Http404('Factura no encontrada')
+    return JsonResponse({
+        'id': venta.pk,
+        'numero_factura': venta.numero_factura,
+        'fecha': venta.fecha,
+        'cliente_id': venta.cliente_id,
+        'descuento': venta.descuento,
+        'monto': venta.monto,
+        'archivada': venta.archivada,
+        'detalles': list(venta.detalleventa_set.order_by('id').values(
+            'id', 'producto_id', 'precio_momento', 'cantidad', 'monto_total'
+        )),
+    })